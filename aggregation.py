@@ -0,0 +1,415 @@
+"""
+AGGREGATION PIPELINE
+Builds product_aggregate_insights / vendor_strategic_insights from raw purchase_history + product_view_events
+Streams events in chunks from a watermark, numpy group-bys per chunk, merges into the
+stored partial aggregates and upserts in bulk - a run costs the new events, not the full history
+"""
+
+import argparse
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from db import Database
+
+# job names double as the insights table each job writes
+PRODUCT_INSIGHTS_JOB = "product_aggregate_insights"
+VENDOR_INSIGHTS_JOB = "vendor_strategic_insights"
+
+UNKNOWN_SEGMENT = "unknown"
+
+
+class PartialAggregate:
+    """
+    Mergeable sums/counts behind one aggregate row
+    Partials of two disjoint event sets merge into the partial of their union
+    """
+
+    def __init__(self, purchases: int = 0, views: int = 0, revenue: float = 0.0, weighted: int = 0,
+                 weight_sums: Optional[Dict[str, float]] = None, segments: Optional[Dict[str, float]] = None):
+        self.purchases = purchases
+        self.views = views
+        self.revenue = revenue
+        self.weighted = weighted  # purchases by users with stored criteria weights
+        self.weight_sums = dict(weight_sums or {})
+        self.segments = dict(segments or {})  # segment -> purchase count
+
+    def merge(self, other: "PartialAggregate") -> "PartialAggregate":
+        self.purchases += other.purchases
+        self.views += other.views
+        self.revenue += other.revenue
+        self.weighted += other.weighted
+        for c, v in other.weight_sums.items():
+            self.weight_sums[c] = self.weight_sums.get(c, 0.0) + v
+        for s, n in other.segments.items():
+            self.segments[s] = self.segments.get(s, 0) + n
+        return self
+
+    @property
+    def conversion_rate(self) -> Optional[float]:
+        """None when no views are known (nothing to divide by, not a 0% conversion)"""
+        # views are tracked separately from purchases, clip so missing views can't push it past 100%
+        return min(self.purchases / self.views, 1.0) if self.views else None
+
+    @property
+    def avg_weights(self) -> Dict[str, float]:
+        if not self.weighted:
+            return {}
+        return {c: v / self.weighted for c, v in self.weight_sums.items()}
+
+    @property
+    def segment_breakdown(self) -> Dict[str, float]:
+        total = sum(self.segments.values())
+        return {s: n / total for s, n in self.segments.items()} if total else {}
+
+    @property
+    def primary_segment(self) -> str:
+        known = {s: n for s, n in self.segments.items() if s != UNKNOWN_SEGMENT}
+        # ties go to the alphabetically first segment so the result doesn't depend on merge order
+        return max(sorted(known), key=known.get) if known else UNKNOWN_SEGMENT
+
+    def to_dict(self) -> Dict:
+        return {
+            "purchases": self.purchases,
+            "views": self.views,
+            "revenue": self.revenue,
+            "weighted": self.weighted,
+            "weight_sums": self.weight_sums,
+            "segments": self.segments
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "PartialAggregate":
+        return cls(**(data or {}))
+
+    @classmethod
+    def from_insight_row(cls, row: Dict) -> "PartialAggregate":
+        """Stored partials, or reconstructed from the averages for rows written without them (seed data)"""
+        if row.get("partial_aggregates"):
+            return cls.from_dict(row["partial_aggregates"])
+        purchases = row.get("total_purchases") or 0
+        return cls(
+            purchases=purchases,
+            views=row.get("total_views") or 0,
+            weighted=purchases,
+            weight_sums={c: w * purchases for c, w in (row.get("avg_criteria_weights") or {}).items()},
+            segments={s: p * purchases for s, p in (row.get("segment_breakdown") or {}).items()}
+        )
+
+    @classmethod
+    def from_vendor_row(cls, row: Dict) -> "PartialAggregate":
+        """vendor_strategic_insights counterpart of from_insight_row (views recovered from the conversion rate)"""
+        if row.get("partial_aggregates"):
+            return cls.from_dict(row["partial_aggregates"])
+        purchases = row.get("total_sales") or 0
+        conversion = float(row.get("avg_conversion_rate") or 0)
+        return cls(
+            purchases=purchases,
+            views=round(purchases / conversion) if conversion else 0,
+            weighted=purchases,
+            weight_sums={c: w * purchases for c, w in (row.get("avg_customer_criteria") or {}).items()},
+            segments={s: p * purchases for s, p in (row.get("customer_segments") or {}).items()}
+        )
+
+
+def _rank(values: np.ndarray, descending: bool = False) -> np.ndarray:
+    """1-based competition-free rank, ties keep input order"""
+    order = np.argsort(-values if descending else values, kind="stable")
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[order] = np.arange(1, len(values) + 1)
+    return ranks
+
+
+def _encode(keys: Iterable) -> Tuple[List, np.ndarray]:
+    """Distinct keys (first-seen order) + integer code per row"""
+    index: Dict = {}
+    codes = np.fromiter((index.setdefault(k, len(index)) for k in keys), dtype=np.intp)
+    return list(index), codes
+
+
+def group_purchases(keys: List[tuple], amounts: np.ndarray, weights: List[Optional[Dict[str, float]]],
+                    segments: List[str]) -> Dict[tuple, PartialAggregate]:
+    """
+    Vectorized group-by of one chunk of purchase events from a single category
+    keys[i] is the group of event i, weights[i] / segments[i] describe its buyer
+    """
+    groups, codes = _encode(keys)
+    k = len(groups)
+
+    purchases = np.bincount(codes, minlength=k)
+    revenue = np.bincount(codes, weights=amounts, minlength=k)
+
+    # criteria weights: only events whose buyer has stored weights
+    has_weights = np.fromiter((w is not None for w in weights), dtype=bool, count=len(weights))
+    criteria = sorted({c for w in weights if w for c in w})
+    weighted = np.bincount(codes[has_weights], minlength=k)
+    weight_sums = np.zeros((k, len(criteria)))
+    if criteria and has_weights.any():
+        matrix = np.array([[w.get(c, 0.0) for c in criteria] for w in weights if w is not None])
+        np.add.at(weight_sums, codes[has_weights], matrix)
+
+    # segment tallies: (group, segment) counts
+    segment_names, segment_codes = _encode(segments)
+    tallies = np.zeros((k, len(segment_names)), dtype=np.int64)
+    np.add.at(tallies, (codes, segment_codes), 1)
+
+    partials = {}
+    for g, key in enumerate(groups):
+        partials[key] = PartialAggregate(
+            purchases=int(purchases[g]),
+            revenue=float(revenue[g]),
+            weighted=int(weighted[g]),
+            weight_sums={c: float(weight_sums[g, j]) for j, c in enumerate(criteria)},
+            segments={s: int(tallies[g, j]) for j, s in enumerate(segment_names) if tallies[g, j]}
+        )
+    return partials
+
+
+class EventAggregator:
+    """
+    Shared streaming part of the aggregation jobs
+    Subclasses pick the group key (_group_key) and turn the partials into rows (run)
+    """
+
+    job_name = ""
+
+    def __init__(self, db: Database, chunk_size: int = 5000):
+        self.db = db
+        self.chunk_size = chunk_size
+        # (user_id, category_id) -> (criteria weights or None, segment), loaded per chunk
+        self._users: Set[str] = set()
+        self._user_context: Dict[Tuple[str, str], Tuple[Optional[Dict], str]] = {}
+
+    def _load_users(self, user_ids: Set[str]):
+        missing = sorted(user_ids - self._users)
+        if not missing:
+            return
+        for row in self.db.get_criteria_preferences(missing):
+            self._user_context[(row['user_id'], row['category_id'])] = (
+                row.get('criteria_weights') or None, row.get('user_segment') or UNKNOWN_SEGMENT
+            )
+        self._users.update(missing)
+
+    def _group_key(self, event: Dict) -> tuple:
+        raise NotImplementedError
+
+    def _window(self, full: bool) -> Tuple[Optional[datetime], datetime]:
+        """
+        [start, end) of events to fold in: from the stored watermark (None = everything) to now
+        Without a watermark the rows already in the table (seeded history, which no event table
+        backs) are the baseline and only events after they were computed are folded in
+        """
+        # second resolution so the bound survives the sqlite timestamp format
+        end = datetime.now().replace(microsecond=0)
+        start = None
+        if not full:
+            start = self.db.get_watermark(self.job_name) or self.db.get_last_computed(self.job_name)
+        print(f"📊 Aggregating {self.job_name}: {start or 'beginning'} → {end}")
+        return start, end
+
+    def collect(self, start: Optional[datetime], end: datetime) -> Tuple[Dict[tuple, PartialAggregate], Dict[tuple, str], Dict]:
+        """Partials per group for events in [start, end), the category of each group, event counts"""
+        partials: Dict[tuple, PartialAggregate] = defaultdict(PartialAggregate)
+        categories: Dict[tuple, str] = {}
+        counts = {"purchases": 0, "views": 0}
+
+        for chunk in self.db.iter_purchase_events(start, end, self.chunk_size):
+            counts["purchases"] += len(chunk)
+            self._load_users({e['user_id'] for e in chunk})
+
+            by_category = defaultdict(list)
+            for e in chunk:
+                by_category[e['category_id']].append(e)
+
+            for category_id, events in by_category.items():
+                context = [self._user_context.get((e['user_id'], category_id), (None, UNKNOWN_SEGMENT)) for e in events]
+                keys = [self._group_key(e) for e in events]
+                grouped = group_purchases(
+                    keys,
+                    np.array([float(e['total_paid']) for e in events]),
+                    [w for w, _ in context],
+                    [s for _, s in context]
+                )
+                for key, partial in grouped.items():
+                    partials[key].merge(partial)
+                    categories[key] = category_id
+
+        for chunk in self.db.iter_view_events(start, end, self.chunk_size):
+            counts["views"] += len(chunk)
+            groups, codes = _encode(self._group_key(e) for e in chunk)
+            views = np.bincount(codes, minlength=len(groups))
+            group_category = {self._group_key(e): e['category_id'] for e in chunk}
+            for key, n in zip(groups, views.tolist()):
+                partials[key].views += n
+                categories[key] = group_category[key]
+
+        return dict(partials), categories, counts
+
+
+class ProductAggregator(EventAggregator):
+    """
+    product_aggregate_insights per (product, vendor) from raw events
+    run() folds in events since the stored watermark (everything on the first / full run)
+    """
+
+    job_name = PRODUCT_INSIGHTS_JOB
+
+    def _group_key(self, event: Dict) -> tuple:
+        return (event['product_id'], event['vendor_id'])
+
+    def run(self, full: bool = False) -> Dict:
+        start, end = self._window(full)
+        partials, categories, counts = self.collect(start, end)
+
+        stored = {
+            (row['product_id'], row['vendor_id']): row
+            for row in self.db.get_product_aggregates(sorted({product_id for product_id, _ in partials}))
+        }
+        rows = []
+        for key, partial in partials.items():
+            row = stored.get(key)
+            if row is not None and start is not None:
+                partial = PartialAggregate.from_insight_row(row).merge(partial)
+            elif row is not None and not partial.views:
+                # full run without view events for this product (nothing backfills product_view_events
+                # for seeded history): the stored views are the only ones we have
+                partial.views = PartialAggregate.from_insight_row(row).views
+            rows.append(self._insight_row(key, categories[key], partial, row))
+
+        self.db.save_product_aggregates(rows)
+        self.db.save_watermark(self.job_name, end)
+
+        print(f"   {counts['purchases']} purchases, {counts['views']} views → {len(rows)} product rows upserted")
+        return {**counts, "rows": len(rows), "start": start, "watermark": end}
+
+    @staticmethod
+    def _insight_row(key: tuple, category_id: str, partial: PartialAggregate, stored: Optional[Dict]) -> Dict:
+        product_id, vendor_id = key
+        conversion = partial.conversion_rate
+        if conversion is None and stored:
+            # views unknown: keep the last known rate (None if there never was one)
+            conversion = stored.get('conversion_rate')
+        return {
+            'insight_id': stored['insight_id'] if stored else f"agg_{product_id}_{vendor_id}",
+            'product_id': product_id,
+            'vendor_id': vendor_id,
+            'category_id': category_id,
+            'avg_criteria_weights': partial.avg_weights,
+            'total_views': partial.views,
+            'total_purchases': partial.purchases,
+            'conversion_rate': round(float(conversion), 4) if conversion is not None else None,
+            'segment_breakdown': partial.segment_breakdown,
+            'primary_segment': partial.primary_segment,
+            'partial_aggregates': partial.to_dict()
+        }
+
+
+class VendorAggregator(EventAggregator):
+    """
+    vendor_strategic_insights per (vendor, category) from raw events
+    Shares and ranks are relative to the whole category, so every vendor of a category
+    that saw new events is rewritten; untouched categories are left alone
+    """
+
+    job_name = VENDOR_INSIGHTS_JOB
+
+    def _group_key(self, event: Dict) -> tuple:
+        return (event['vendor_id'], event['category_id'])
+
+    def run(self, full: bool = False) -> Dict:
+        start, end = self._window(full)
+        partials, _, counts = self.collect(start, end)
+        affected = sorted({category_id for _, category_id in partials})
+
+        stored = {(row['vendor_id'], row['category_id']): row for row in self.db.get_vendor_aggregates(affected)}
+        totals = {
+            key: PartialAggregate.from_vendor_row(row) if start is not None else PartialAggregate()
+            for key, row in stored.items()
+        }
+        for key, partial in partials.items():
+            totals.setdefault(key, PartialAggregate()).merge(partial)
+        if start is None:
+            # same as the product job: views no event covers stay as stored
+            for key, row in stored.items():
+                if not totals[key].views:
+                    totals[key].views = PartialAggregate.from_vendor_row(row).views
+
+        catalog = {(row['vendor_id'], row['category_id']): row for row in self.db.get_vendor_catalog_stats(affected)}
+
+        by_category = defaultdict(list)
+        for key in totals:
+            by_category[key[1]].append(key)
+        rows = []
+        for category_id in affected:
+            rows.extend(self._category_rows(sorted(by_category[category_id]), totals, stored, catalog))
+
+        self.db.save_vendor_aggregates(rows)
+        self.db.save_watermark(self.job_name, end)
+
+        print(f"   {counts['purchases']} purchases, {counts['views']} views → {len(rows)} vendor rows "
+              f"upserted across {len(affected)} categories")
+        return {**counts, "rows": len(rows), "categories": affected, "start": start, "watermark": end}
+
+    @staticmethod
+    def _category_rows(keys: List[tuple], totals: Dict[tuple, PartialAggregate], stored: Dict[tuple, Dict],
+                       catalog: Dict[tuple, Dict]) -> List[Dict]:
+        """Rows for every vendor of one category, market share and ranks recomputed across them"""
+        purchases = np.array([totals[k].purchases for k in keys], dtype=float)
+        share = purchases / purchases.sum() if purchases.sum() else np.zeros(len(keys))
+
+        stats = [catalog.get(k, {}) for k in keys]
+        products = np.array([s.get('total_products') or 0 for s in stats], dtype=float)
+        # cheapest average listing first, vendors with nothing listed last
+        prices = np.array([float(s['avg_price']) if s.get('avg_price') is not None else np.inf for s in stats])
+        price_rank = _rank(prices)
+        selection_rank = _rank(products, descending=True)
+
+        rows = []
+        for i, (vendor_id, category_id) in enumerate(keys):
+            partial, row = totals[(vendor_id, category_id)], stored.get((vendor_id, category_id))
+            conversion = partial.conversion_rate
+            if conversion is None:
+                # views unknown: keep the last known rate, VendorProfile needs a number so new vendors start at 0
+                conversion = float(row.get('avg_conversion_rate') or 0) if row else 0.0
+            rows.append({
+                'insight_id': row['insight_id'] if row else f"vsi_{vendor_id}_{category_id}",
+                'vendor_id': vendor_id,
+                'category_id': category_id,
+                'market_share': round(float(share[i]), 4),
+                'total_products': int(products[i]),
+                'total_sales': partial.purchases,
+                'avg_conversion_rate': round(conversion, 4),
+                'customer_segments': partial.segment_breakdown,
+                'price_competitiveness_rank': int(price_rank[i]),
+                'selection_rank': int(selection_rank[i]),
+                'avg_customer_criteria': partial.avg_weights,
+                'partial_aggregates': partial.to_dict()
+            })
+        return rows
+
+
+AGGREGATORS = {
+    "products": ProductAggregator,
+    "vendors": VendorAggregator
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ORBIT aggregation jobs")
+    parser.add_argument("--full", action="store_true", help="ignore the watermark and rescan all events")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--job", choices=sorted(AGGREGATORS), action="append",
+                        help="aggregation job to run (repeatable, default: all)")
+    args = parser.parse_args(argv)
+
+    db = Database()
+    for job in args.job or list(AGGREGATORS):
+        AGGREGATORS[job](db, args.chunk_size).run(full=args.full)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
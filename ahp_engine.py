@@ -1,10 +1,17 @@
-import google.generativeai as genai
+import asyncio
 import json
 import os
-from typing import List, Dict, Optional
+from typing import Callable, Iterator, List, Dict, Optional
 from pydantic import BaseModel, Field
 from models import EnrichedPurchase, UserProfile, CriteriaWeight, Product, RankedProduct, VendorInventory, Vendor
-from collections import Counter
+from collections import Counter, defaultdict
+from spec_scoring import SpecScorer, ScoreMatrix, top_k_indices
+from cache import LLMResponseCache, generate_cached, agenerate_cached
+from llm_provider import LLMProvider, create_provider
+from timing import StageTimer
+from user_profiles import PreferenceStats
+from catalog_index import CatalogIndex
+from robustness import confidence_from_purchases, robustness_analysis
 import numpy as np
 
 # fixed criteria sets per category - never change, only weights change
@@ -53,11 +60,28 @@ CATEGORY_CRITERIA = {
     }
 }
 
+# parsed query category -> db category_id
+CATEGORY_IDS = {
+    "laptops": "cat_laptops",
+    "smartphones": "cat_phones",
+    "coffee": "cat_coffee",
+    "sneakers": "cat_sneakers"
+}
+
 DEFAULT_CRITERIA = {
     "criteria": ["price", "quality", "brand"],
     "cost_criteria": ["price"]
 }
 
+def parse_json_response(text: str) -> Dict:
+    """Strip markdown fences and parse model output as JSON"""
+    return json.loads(text.strip().replace('```json', '').replace('```', ''))
+
+def check_top_k(top_k: Optional[int]):
+    """top_k is None (rank everything) or a positive count"""
+    if top_k is not None and top_k < 1:
+        raise ValueError(f"top_k must be >= 1 or None, got {top_k}")
+
 class ORBITAgent:
     """
     ORBIT Agent: Query-driven AHP product ranking
@@ -72,11 +96,30 @@ class ORBITAgent:
     7. Calculate AHP scores and rank
     """
     
-    def __init__(self, model_name="gemini-2.5-flash", temperature=0.7):
+    def __init__(self, model_name="gemini-2.5-flash", temperature=0.7,
+                 cache: Optional[LLMResponseCache] = None, max_concurrency: int = 8,
+                 provider: Optional[LLMProvider] = None):
         self.model_name = model_name
         self.temperature = temperature
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel(self.model_name)
+        self.provider = provider if provider is not None else create_provider(model_name)
+        self.timer = StageTimer()  # per-stage wall time, read by benchmark.py
+        self.spec_scorer = SpecScorer()
+        self.cache = cache if cache is not None else LLMResponseCache.from_env()
+        self.max_concurrency = max_concurrency
+        self._llm_slots: Optional[asyncio.Semaphore] = None
+    
+    def _generate(self, call_type: str, prompt: str, parse=None, category: Optional[str] = None):
+        """Single entry point for model calls, goes through the response cache (tagged with category)"""
+        return generate_cached(self.cache, self.provider, self.provider.name, self.temperature,
+                               call_type, prompt, parse, category)
+    
+    async def _agenerate(self, call_type: str, prompt: str, parse=None, category: Optional[str] = None):
+        """Async entry point, at most max_concurrency model calls in flight per agent"""
+        if self._llm_slots is None:
+            self._llm_slots = asyncio.Semaphore(self.max_concurrency)
+        async with self._llm_slots:
+            return await agenerate_cached(self.cache, self.provider, self.provider.name, self.temperature,
+                                          call_type, prompt, parse, category)
     
     def parse_query(self, query: str) -> Dict:
         """
@@ -84,7 +127,25 @@ class ORBITAgent:
         Extract: category, constraints, use case, preferences
         """
         
-        prompt = f"""
+        try:
+            parsed = self._generate("parse_query", self._parse_query_prompt(query), parse_json_response)
+            return parsed
+        except Exception as e:
+            print(f"Query parsing failed: {e}")
+            return self._fallback_query()
+    
+    def _fallback_query(self) -> Dict:
+        return {
+            "category": "general",
+            "budget_max": None,
+            "use_case": "general",
+            "must_have_features": [],
+            "preferences": [],
+            "brand_preference": None
+        }
+    
+    def _parse_query_prompt(self, query: str) -> str:
+        return f"""
 Parse this product search query and extract structured information.
 
 Query: "{query}"
@@ -109,68 +170,14 @@ Return ONLY valid JSON:
     "brand_preference": null
 }}
 """
-        
-        try:
-            response = self.model.generate_content(prompt)
-            parsed = json.loads(response.text.strip().replace('```json', '').replace('```', ''))
-            return parsed
-        except Exception as e:
-            print(f"Query parsing failed: {e}")
-            return {
-                "category": "general",
-                "budget_max": None,
-                "use_case": "general",
-                "must_have_features": [],
-                "preferences": [],
-                "brand_preference": None
-            }
     
     def analyze_user_history(self, purchases: List[EnrichedPurchase], category: str) -> Dict:
         """
         Step 2: Analyze purchase history to understand user preferences
         Returns base preference profile
+        Same running stats as the stored PreferenceStats, just built from the raw list
         """
-        
-        if not purchases:
-            return {
-                "price_sensitivity": 0.5,
-                "brand_loyalty": {},
-                "avg_price": 0,
-                "spec_preferences": {}
-            }
-        
-        prices = [p.purchase.total_paid for p in purchases]
-        brands = [p.product.brand for p in purchases]
-        specs = [p.product.specs for p in purchases]
-        
-        avg_price = sum(prices) / len(prices)
-        price_variance = np.std(prices) if len(prices) > 1 else 0
-        
-        # price sensitivity, inversing this because --> low variance = consistent budget = high sensitivity, so more cheaper the better
-        price_sensitivity = 1 - min(price_variance / avg_price, 1.0) if avg_price > 0 else 0.5
-        
-        brand_counts = Counter(brands)
-        total = len(brands)
-        brand_loyalty = {brand: count/total for brand, count in brand_counts.items()}
-        
-        # extract common spec patterns
-        spec_preferences = {}
-        if category == "laptops":
-            rams = [s.get('ram_gb', 0) for s in specs if 'ram_gb' in s]
-            if rams:
-                spec_preferences['avg_ram'] = sum(rams) / len(rams)
-        elif category == "smartphones":
-            cameras = [s.get('camera_mp', 0) for s in specs if 'camera_mp' in s]
-            if cameras:
-                spec_preferences['avg_camera'] = sum(cameras) / len(cameras)
-        
-        return {
-            "price_sensitivity": price_sensitivity,
-            "brand_loyalty": brand_loyalty,
-            "avg_price": avg_price,
-            "spec_preferences": spec_preferences,
-            "total_purchases": len(purchases)
-        }
+        return PreferenceStats.from_purchases(purchases).to_profile(category)
     
     def get_criteria_set(self, category: str) -> tuple[List[str], List[str]]:
         """
@@ -188,7 +195,28 @@ Return ONLY valid JSON:
         Blend: user history preferences + query requirements
         """
         
-        prompt = f"""
+        try:
+            result = self._generate("criteria_weights",
+                                    self._criteria_weights_prompt(criteria, query_parsed, user_profile),
+                                    parse_json_response, query_parsed.get('category'))
+            return self._normalize_weights(result)
+        except Exception as e:
+            print(f"Weight calculation failed: {e}")
+            # equal weights fallback
+            return {c: 1.0/len(criteria) for c in criteria}
+    
+    def _normalize_weights(self, result: Dict) -> Dict[str, float]:
+        weights = result['weights']
+        
+        # normalize to ensure sum = 1
+        total = sum(weights.values())
+        normalized = {k: v/total for k, v in weights.items()}
+        
+        print(f"   💡 Reasoning: {result.get('reasoning', 'Weights calculated')}")
+        return normalized
+    
+    def _criteria_weights_prompt(self, criteria: List[str], query_parsed: Dict, user_profile: Dict) -> str:
+        return f"""
 Calculate AHP criteria weights that balance USER PREFERENCES and QUERY REQUIREMENTS.
 
 CRITERIA: {criteria}
@@ -223,75 +251,93 @@ Return ONLY valid JSON:
     "reasoning": "User is price sensitive but query requires high performance..."
 }}
 """
-        
-        try:
-            response = self.model.generate_content(prompt)
-            result = json.loads(response.text.strip().replace('```json', '').replace('```', ''))
-            weights = result['weights']
-            
-            # normalize to ensure sum = 1
-            total = sum(weights.values())
-            normalized = {k: v/total for k, v in weights.items()}
-            
-            print(f"   💡 Reasoning: {result.get('reasoning', 'Weights calculated')}")
-            return normalized
-            
-        except Exception as e:
-            print(f"Weight calculation failed: {e}")
-            # equal weights fallback
-            return {c: 1.0/len(criteria) for c in criteria}
     
     def score_products_relative(self, products: List[Product], criteria: List[str],
-                                query_parsed: Dict, user_profile: Dict, cost_criteria: List[str]) -> Dict[str, Dict[str, float]]:
+                                query_parsed: Dict, user_profile: Dict, cost_criteria: List[str]) -> ScoreMatrix:
         """
         Step 5: Score products on each criteria
         IMPORTANT: Scores are RELATIVE to other products in the set
+        Spec-derivable criteria (price, RAM, battery...) are scored locally,
+        only the rest go to the LLM
         Cost criteria (like price) will be inverted after scoring
         """
         
+        category = query_parsed.get('category', 'general')
+        spec_criteria, spec_matrix = self.spec_scorer.score(products, category, criteria)
+        llm_criteria = [c for c in criteria if c not in spec_criteria]
+        print(f"   🧮 Spec-derived criteria: {spec_criteria}")
+        
+        llm_scores = {}
+        if llm_criteria:
+            llm_scores = self._score_products_llm(products, llm_criteria, query_parsed, user_profile)
+        
+        return self._merge_scores(products, criteria, cost_criteria, spec_criteria, spec_matrix, llm_scores)
+    
+    def _merge_scores(self, products: List[Product], criteria: List[str], cost_criteria: List[str],
+                      spec_criteria: List[str], spec_matrix: np.ndarray,
+                      llm_scores: Dict[str, Dict[str, float]]) -> ScoreMatrix:
+        """Combine spec and LLM scores in criteria order, then invert cost criteria"""
+        values = np.full((len(products), len(criteria)), 0.5)
+        for j, c in enumerate(criteria):
+            if c in spec_criteria:
+                values[:, j] = spec_matrix[:, spec_criteria.index(c)]
+            elif llm_scores:
+                values[:, j] = [float(llm_scores.get(p.product_id, {}).get(c, 0.5)) for p in products]
+        
+        # invert cost criteria (lower is better, so flip the score)
+        for j, c in enumerate(criteria):
+            if c in cost_criteria:
+                values[:, j] = 1.0 - values[:, j]
+        
+        print(f"   🔄 Inverted cost criteria: {cost_criteria}")
+        return ScoreMatrix([p.product_id for p in products], criteria, values)
+    
+    def _score_products_llm(self, products: List[Product], criteria: List[str],
+                            query_parsed: Dict, user_profile: Dict) -> Dict[str, Dict[str, float]]:
+        """
+        Score products on criteria that can't be derived from specs (brand, display, style...)
+        """
+        
+        try:
+            result = self._generate("product_scores",
+                                    self._product_scores_prompt(products, criteria, query_parsed, user_profile),
+                                    parse_json_response, query_parsed.get('category'))
+            print(f"   🎯 {result.get('reasoning', 'Products scored')}")
+            return result['scores']
+        except Exception as e:
+            print(f"Product scoring failed: {e}")
+            # fallback: neutral scores
+            return {p.product_id: {c: 0.5 for c in criteria} for p in products}
+    
+    def _product_scores_prompt(self, products: List[Product], criteria: List[str],
+                               query_parsed: Dict, user_profile: Dict) -> str:
         products_data = [
             {
                 "product_id": p.product_id,
                 "name": p.product_name,
                 "brand": p.brand,
-                "price": p.base_price,
                 "specs": p.specs
             }
             for p in products
         ]
         
-        prompt = f"""
+        return f"""
 Score products RELATIVE to each other on each criteria (0-1 scale).
 
 CRITERIA: {criteria}
 
 PRODUCTS:
-{json.dumps(products_data, indent=2)}
+{json.dumps(products_data, separators=(',', ':'))}
 
 USER CONTEXT:
 - Avg Past Price: ${user_profile.get('avg_price', 0):.2f}
 - Brand Preferences: {user_profile.get('brand_loyalty', {})}
 
 QUERY CONTEXT:
-- Budget Max: ${query_parsed.get('budget_max', 'none')}
 - Use Case: {query_parsed.get('use_case')}
 
-CRITICAL SCORING RULES:
-
-FOR PRICE CRITERION ONLY:
-- DO NOT consider user budget or preferences when scoring price
-- Simply normalize based on the price range in this product set
-- Formula: price_score = (product_price - min_price) / (max_price - min_price)
-- HIGHER PRICE = HIGHER SCORE (most expensive product = 1.0, cheapest = 0.0)
-- Example: If prices are [$500, $1000, $1500], scores are [0.0, 0.5, 1.0]
-- The code will automatically invert this afterwards so cheaper products rank better
-- Do NOT try to favor cheaper products - just do straight mathematical normalization
-
-FOR ALL OTHER CRITERIA:
+SCORING RULES:
 - Higher score = better performance on that criterion
-- performance: Compare RAM, processor, GPU specs - better specs = higher score
-- battery_life: More hours = higher score
-- portability: Lighter weight = higher score
 - display_quality: Better screen tech/resolution = higher score
 - brand_reputation: Stronger brand or matches user preferences = higher score
 - Normalize all scores 0-1 relative to the products in this set
@@ -299,57 +345,211 @@ FOR ALL OTHER CRITERIA:
 Return ONLY valid JSON:
 {{
     "scores": {{
-        "prod_lap_001": {{"price": 0.93, "performance": 0.6, "battery_life": 0.7, "brand_reputation": 0.9}},
-        "prod_lap_002": {{"price": 0.21, "performance": 0.9, "battery_life": 0.5, "brand_reputation": 0.3}}
+        "prod_lap_001": {{"display_quality": 0.6, "brand_reputation": 0.9}},
+        "prod_lap_002": {{"display_quality": 0.9, "brand_reputation": 0.3}}
     }},
-    "reasoning": "Price scores are pure mathematical normalization. Product A at $1800 scored 0.93, Product B at $700 scored 0.21..."
+    "reasoning": "Product B has the better panel, Product A the stronger brand..."
 }}
 """
-        
+    
+    async def aparse_query(self, query: str) -> Dict:
+        """Async parse_query"""
         try:
-            response = self.model.generate_content(prompt)
-            result = json.loads(response.text.strip().replace('```json', '').replace('```', ''))
-            scores = result['scores']
-            
-            # invert cost criteria (lower is better, so flip the score)
-            for product_id, product_scores in scores.items():
-                for cost_criterion in cost_criteria:
-                    if cost_criterion in product_scores:
-                        product_scores[cost_criterion] = 1.0 - product_scores[cost_criterion]
-            
-            print(f"   🎯 {result.get('reasoning', 'Products scored')}")
-            print(f"   🔄 Inverted cost criteria: {cost_criteria}")
-            return scores
+            return await self._agenerate("parse_query", self._parse_query_prompt(query), parse_json_response)
         except Exception as e:
-            print(f"Product scoring failed: {e}")
-            # fallback: random scores
-            return {p.product_id: {c: 0.5 for c in criteria} for p in products}
+            print(f"Query parsing failed: {e}")
+            return self._fallback_query()
+    
+    async def acalculate_criteria_weights(self, criteria: List[str], query_parsed: Dict,
+                                          user_profile: Dict) -> Dict[str, float]:
+        """Async calculate_criteria_weights"""
+        try:
+            result = await self._agenerate("criteria_weights",
+                                           self._criteria_weights_prompt(criteria, query_parsed, user_profile),
+                                           parse_json_response, query_parsed.get('category'))
+            return self._normalize_weights(result)
+        except Exception as e:
+            print(f"Weight calculation failed: {e}")
+            return {c: 1.0/len(criteria) for c in criteria}
+    
+    async def ascore_products_relative(self, products: List[Product], criteria: List[str],
+                                       query_parsed: Dict, user_profile: Dict,
+                                       cost_criteria: List[str]) -> ScoreMatrix:
+        """Async score_products_relative, spec scoring stays local"""
+        category = query_parsed.get('category', 'general')
+        spec_criteria, spec_matrix = self.spec_scorer.score(products, category, criteria)
+        llm_criteria = [c for c in criteria if c not in spec_criteria]
+        
+        llm_scores = {}
+        if llm_criteria:
+            try:
+                result = await self._agenerate("product_scores",
+                                               self._product_scores_prompt(products, llm_criteria, query_parsed, user_profile),
+                                               parse_json_response, query_parsed.get('category'))
+                llm_scores = result['scores']
+            except Exception as e:
+                print(f"Product scoring failed: {e}")
+        
+        return self._merge_scores(products, criteria, cost_criteria, spec_criteria, spec_matrix, llm_scores)
     
-    def calculate_ahp_scores(self, product_scores: Dict[str, Dict[str, float]],
-                            criteria_weights: Dict[str, float]) -> Dict[str, float]:
+    def calculate_ahp_scores(self, product_scores: ScoreMatrix,
+                            criteria_weights: Dict[str, float]) -> np.ndarray:
         """
         Step 6: Calculate final AHP scores
         Weighted sum: score = Σ(weight[criteria] × product_score[criteria])
+        One matrix-vector product, result is aligned with product_scores rows
         """
+        if not isinstance(product_scores, ScoreMatrix):
+            product_scores = ScoreMatrix.from_dict(product_scores)
+        return product_scores.weighted(criteria_weights)
+    
+    def apply_hard_filters(self, products: List[Product], query_parsed: Dict) -> List[Product]:
+        """
+        Drop products that violate hard constraints (budget, brand)
+        """
+        original_count = len(products)
         
-        final_scores = {}
+        # budget constraint
+        if query_parsed.get('budget_max'):
+            budget_max = query_parsed['budget_max']
+            products = [p for p in products if p.base_price <= budget_max]
+            print(f"   Budget filter (≤${budget_max}): {original_count} → {len(products)} products")
         
-        for product_id, scores in product_scores.items():
-            ahp_score = sum(
-                criteria_weights.get(criteria, 0) * score
-                for criteria, score in scores.items()
-            )
-            final_scores[product_id] = ahp_score
+        if query_parsed.get('budget_min'):
+            budget_min = query_parsed['budget_min']
+            products = [p for p in products if p.base_price >= budget_min]
+            print(f"   Budget min filter (≥${budget_min}): kept {len(products)} products")
         
-        return final_scores
+        # brand constraint
+        if query_parsed.get('brand_preference'):
+            brand = query_parsed['brand_preference']
+            products = [p for p in products if p.brand.lower() == brand.lower()]
+            print(f"   Brand filter ({brand}): kept {len(products)} products")
+        
+        return products
+    
+    def filter_candidates(self, products: Optional[List[Product]], query_parsed: Dict,
+                          catalog_index: Optional[CatalogIndex] = None) -> List[Product]:
+        """
+        Hard-constraint prefilter shared by every workflow
+        With a catalog index the index's products are filtered (budget, brand, must-haves),
+        otherwise products go through apply_hard_filters
+        """
+        if catalog_index is not None:
+            return catalog_index.filter(query_parsed)
+        return self.apply_hard_filters(products or [], query_parsed)
+    
+    def hard_filter_mask(self, prices: np.ndarray, brands: np.ndarray, query_parsed: Dict) -> np.ndarray:
+        """
+        Vectorized version of apply_hard_filters over price / lowercase brand arrays
+        """
+        mask = np.ones(len(prices), dtype=bool)
+        if query_parsed.get('budget_max'):
+            mask &= prices <= query_parsed['budget_max']
+        if query_parsed.get('budget_min'):
+            mask &= prices >= query_parsed['budget_min']
+        if query_parsed.get('brand_preference'):
+            mask &= brands == query_parsed['brand_preference'].lower()
+        return mask
+    
+    def build_ranked_products(self, products: List[Product], ahp_scores,
+                              product_scores: ScoreMatrix, top_k: Optional[int] = None) -> List[RankedProduct]:
+        """
+        Wrap scored products in RankedProduct, best first
+        ahp_scores: array aligned with products (or a product_id -> score dict)
+        Winners are picked on the raw scores, only the top_k (default: all) become pydantic objects
+        """
+        check_top_k(top_k)
+        with self.timer.stage("ranking"):
+            products, ahp_scores = self._aligned_scores(products, ahp_scores)
+            order = top_k_indices(ahp_scores, top_k)
+        
+        with self.timer.stage("model_construction"):
+            return [self._ranked_product(products[idx], float(ahp_scores[idx]), product_scores)
+                    for idx in order.tolist()]
+    
+    def iter_ranked_products(self, products: List[Product], ahp_scores, product_scores: ScoreMatrix,
+                             page_size: int = 20) -> Iterator[List[RankedProduct]]:
+        """
+        Lazy, paginated version of build_ranked_products
+        Ranks the raw scores once, then builds RankedProduct objects one page at a time
+        """
+        products, ahp_scores = self._aligned_scores(products, ahp_scores)
+        order = top_k_indices(ahp_scores)
+        for start in range(0, len(order), page_size):
+            yield [self._ranked_product(products[idx], float(ahp_scores[idx]), product_scores)
+                   for idx in order[start:start + page_size].tolist()]
+    
+    def _aligned_scores(self, products: List[Product], ahp_scores) -> tuple[List[Product], np.ndarray]:
+        if isinstance(ahp_scores, dict):
+            products = [p for p in products if p.product_id in ahp_scores]
+            return products, np.array([ahp_scores[p.product_id] for p in products], dtype=float)
+        return products, np.asarray(ahp_scores)
+    
+    def _ranked_product(self, product: Product, ahp_score: float, product_scores: ScoreMatrix) -> RankedProduct:
+        return RankedProduct(
+            product=product,
+            inventory=VendorInventory(
+                inventory_id="demo",
+                vendor_id="demo",
+                product_id=product.product_id,
+                vendor_price=product.base_price,
+                stock_quantity=10,
+                shipping_days=3,
+                shipping_cost=0,
+                is_available=True
+            ),
+            vendor=Vendor(
+                vendor_id="demo",
+                vendor_name="Demo Vendor",
+                vendor_rating=4.5,
+                avg_shipping_days=3,
+                return_policy_days=30
+            ),
+            ahp_score=ahp_score,
+            criteria_scores=product_scores[product.product_id]
+        )
+    
+    def build_user_profile(self, user_id: str, query_parsed: Dict, user_profile: Dict,
+                           criteria_weights: Dict[str, float]) -> UserProfile:
+        """
+        Build the UserProfile model used for visualization
+        Weight confidence grows with the purchase history the weights were derived from
+        """
+        confidence = round(confidence_from_purchases(user_profile['total_purchases']), 3)
+        return UserProfile(
+            user_id=user_id,
+            category_id=query_parsed.get('category', 'general'),
+            criteria_weights=[
+                CriteriaWeight(criteria_name=c, weight=w, confidence=confidence)
+                for c, w in criteria_weights.items()
+            ],
+            avg_purchase_price=user_profile['avg_price'],
+            brand_preferences=user_profile['brand_loyalty'],
+            total_purchases=user_profile['total_purchases']
+        )
     
-    def run_query(self, user_id: str, query: str, purchase_history: List[EnrichedPurchase],
-                  candidate_products: List[Product]) -> tuple[List[RankedProduct], UserProfile, Dict]:
+    def run_query(self, user_id: str, query: str, purchase_history: Optional[List[EnrichedPurchase]],
+                  candidate_products: Optional[List[Product]],
+                  top_k: Optional[int] = None,
+                  preference_stats: Optional[PreferenceStats] = None,
+                  catalog_index: Optional[CatalogIndex] = None,
+                  robustness_samples: int = 0) -> tuple[List[RankedProduct], UserProfile, Dict]:
         """
         MAIN WORKFLOW: Query-driven AHP ranking
         
+        top_k: only build RankedProduct objects for the k best (default: every candidate), must be >= 1
+               deeper results are available lazily from ahp_matrices['ranked_pages']
+        preference_stats: stored running stats (db.get_preference_stats), used instead of
+                          purchase_history so the raw history never has to be fetched
+        catalog_index: prebuilt index for the category (db.get_catalog_index), replaces
+                       candidate_products - budget/brand/must-haves resolve via the index
+        robustness_samples: > 0 re-ranks under that many Dirichlet weight draws (spread set by the
+                            weights' confidence), see ahp_matrices['robustness']
+        
         Returns: (ranked_products, user_profile_used, ahp_matrices)
         """
+        check_top_k(top_k)
         
         print(f"\n🤖 ORBIT Agent Processing Query")
         print(f"   User: {user_id}")
@@ -358,49 +558,31 @@ Return ONLY valid JSON:
         
         #  parse query
         print("\n📝 Step 1: Parsing query...")
-        query_parsed = self.parse_query(query)
+        with self.timer.stage("parse_query"):
+            query_parsed = self.parse_query(query)
         print(f"   Category: {query_parsed.get('category')}")
         print(f"   Use Case: {query_parsed.get('use_case')}")
         print(f"   Budget: ${query_parsed.get('budget_max', 'no limit')}")
         
         # analyze user history
         print("\n👤 Step 2: Analyzing user purchase history...")
-        user_profile = self.analyze_user_history(purchase_history, query_parsed.get('category', 'general'))
+        with self.timer.stage("history_analysis"):
+            if preference_stats is not None:
+                user_profile = preference_stats.to_profile(query_parsed.get('category', 'general'))
+            else:
+                user_profile = self.analyze_user_history(purchase_history or [], query_parsed.get('category', 'general'))
         print(f"   Total Purchases: {user_profile['total_purchases']}")
         print(f"   Price Sensitivity: {user_profile['price_sensitivity']:.2f}")
         print(f"   Avg Past Price: ${user_profile['avg_price']:.2f}")
         
         # PRE-FILTER: Remove products that violate hard constraints
         print("\n🔍 Step 2.5: Applying hard constraint filters...")
-        original_count = len(candidate_products)
-        
-        # budget constraint
-        if query_parsed.get('budget_max'):
-            budget_max = query_parsed['budget_max']
-            candidate_products = [p for p in candidate_products if p.base_price <= budget_max]
-            print(f"   Budget filter (≤${budget_max}): {original_count} → {len(candidate_products)} products")
-        
-        if query_parsed.get('budget_min'):
-            budget_min = query_parsed['budget_min']
-            candidate_products = [p for p in candidate_products if p.base_price >= budget_min]
-            print(f"   Budget min filter (≥${budget_min}): kept {len(candidate_products)} products")
-        
-        # brand constraint
-        if query_parsed.get('brand_preference'):
-            brand = query_parsed['brand_preference']
-            candidate_products = [p for p in candidate_products if p.brand.lower() == brand.lower()]
-            print(f"   Brand filter ({brand}): kept {len(candidate_products)} products")
+        with self.timer.stage("filtering"):
+            candidate_products = self.filter_candidates(candidate_products, query_parsed, catalog_index)
         
         if len(candidate_products) == 0:
             print("   ⚠️  No products match constraints! Returning empty results.")
-            return [], UserProfile(
-                user_id=user_id,
-                category_id=query_parsed.get('category', 'general'),
-                criteria_weights=[],
-                avg_purchase_price=user_profile['avg_price'],
-                brand_preferences=user_profile['brand_loyalty'],
-                total_purchases=user_profile['total_purchases']
-            ), {}
+            return [], self.build_user_profile(user_id, query_parsed, user_profile, {}), {}
         
         # get fixed criteria set
         print("\n🎯 Step 3: Getting fixed criteria set...")
@@ -410,64 +592,44 @@ Return ONLY valid JSON:
         
         # calculate weights
         print("\n⚖️  Step 4: Calculating criteria weights...")
-        criteria_weights = self.calculate_criteria_weights(criteria, query_parsed, user_profile)
+        with self.timer.stage("criteria_weights"):
+            criteria_weights = self.calculate_criteria_weights(criteria, query_parsed, user_profile)
         for c, w in criteria_weights.items():
             print(f"   {c}: {w:.3f}")
         
         # score products
         print("\n📊 Step 5: Scoring products...")
-        product_scores = self.score_products_relative(candidate_products, criteria, 
-                                                      query_parsed, user_profile, cost_criteria)
+        with self.timer.stage("product_scoring"):
+            product_scores = self.score_products_relative(candidate_products, criteria, 
+                                                          query_parsed, user_profile, cost_criteria)
         
+        return self._finish_ranking(user_id, query_parsed, user_profile, criteria,
+                                    criteria_weights, candidate_products, product_scores, top_k,
+                                    robustness_samples)
+    
+    def _finish_ranking(self, user_id: str, query_parsed: Dict, user_profile: Dict, criteria: List[str],
+                        criteria_weights: Dict[str, float], candidate_products: List[Product],
+                        product_scores: ScoreMatrix,
+                        top_k: Optional[int] = None,
+                        robustness_samples: int = 0) -> tuple[List[RankedProduct], UserProfile, Dict]:
+        """
+        Step 6: aggregate, rank and package results (shared by run_query / arun_query)
+        """
         # calculate AHP scores
         print("\n🏆 Step 6: Calculating final AHP scores...")
-        ahp_scores = self.calculate_ahp_scores(product_scores, criteria_weights)
-        
-        # build ranked results
-        ranked_products = []
-        for product in candidate_products:
-            if product.product_id in ahp_scores:
-                ranked_products.append(RankedProduct(
-                    product=product,
-                    inventory=VendorInventory(
-                        inventory_id="demo",
-                        vendor_id="demo",
-                        product_id=product.product_id,
-                        vendor_price=product.base_price,
-                        stock_quantity=10,
-                        shipping_days=3,
-                        shipping_cost=0,
-                        is_available=True
-                    ),
-                    vendor=Vendor(
-                        vendor_id="demo",
-                        vendor_name="Demo Vendor",
-                        vendor_rating=4.5,
-                        avg_shipping_days=3,
-                        return_policy_days=30
-                    ),
-                    ahp_score=ahp_scores[product.product_id],
-                    criteria_scores=product_scores[product.product_id]
-                ))
-        
-        # sort by score
-        ranked_products.sort(key=lambda x: x.ahp_score, reverse=True)
+        with self.timer.stage("aggregation"):
+            final_scores = self.calculate_ahp_scores(product_scores, criteria_weights)
+            ahp_scores = dict(zip(product_scores.product_ids, final_scores.tolist()))
+        
+        # build ranked results (product_scores rows follow candidate_products)
+        ranked_products = self.build_ranked_products(candidate_products, final_scores, product_scores, top_k)
         
         print(f"\n✅ Ranking complete! Top pick: {ranked_products[0].product.product_name}")
         print(f"   AHP Score: {ranked_products[0].ahp_score:.3f}")
         
         # build user profile for visualization
-        user_profile_obj = UserProfile(
-            user_id=user_id,
-            category_id=query_parsed.get('category', 'general'),
-            criteria_weights=[
-                CriteriaWeight(criteria_name=c, weight=w, confidence=0.8)
-                for c, w in criteria_weights.items()
-            ],
-            avg_purchase_price=user_profile['avg_price'],
-            brand_preferences=user_profile['brand_loyalty'],
-            total_purchases=user_profile['total_purchases']
-        )
+        with self.timer.stage("model_construction"):
+            user_profile_obj = self.build_user_profile(user_id, query_parsed, user_profile, criteria_weights)
         
         # build AHP matrices for visualization
         ahp_matrices = {
@@ -476,7 +638,232 @@ Return ONLY valid JSON:
             'product_scores': product_scores,
             'final_scores': ahp_scores,
             'query_context': query_parsed,
-            'user_profile': user_profile
+            'user_profile': user_profile,
+            # full ranking, built page by page only if someone iterates it
+            'ranked_pages': self.iter_ranked_products(candidate_products, final_scores, product_scores)
         }
         
-        return ranked_products, user_profile_obj, ahp_matrices
\ No newline at end of file
+        if robustness_samples:
+            with self.timer.stage("robustness"):
+                robustness = robustness_analysis(
+                    product_scores, criteria_weights,
+                    {w.criteria_name: w.confidence for w in user_profile_obj.criteria_weights},
+                    samples=robustness_samples
+                )
+            ahp_matrices['robustness'] = robustness
+            top_id = ranked_products[0].product.product_id
+            print(f"   Robustness: #1 in {robustness['p_top1'].get(top_id, 0.0):.0%} of {robustness_samples} weight draws")
+        
+        return ranked_products, user_profile_obj, ahp_matrices
+    
+    async def arun_query(self, user_id: str, query: str,
+                         purchase_history: Optional[List[EnrichedPurchase]] = None,
+                         candidate_products: Optional[List[Product]] = None,
+                         db=None, category_id: Optional[str] = None,
+                         timeout: Optional[float] = None,
+                         top_k: Optional[int] = None,
+                         preference_stats: Optional[PreferenceStats] = None,
+                         catalog_index: Optional[CatalogIndex] = None,
+                         robustness_samples: int = 0) -> tuple[List[RankedProduct], UserProfile, Dict]:
+        """
+        ASYNC WORKFLOW: same result as run_query, independent stages overlap
+        
+        - query parsing runs alongside the purchase history / candidate fetches (db: AsyncDatabase)
+        - criteria weighting and product scoring run concurrently
+        - model calls share the agent's max_concurrency limit
+        - timeout (seconds) cancels the whole pipeline; cancellation propagates to every stage
+        - catalog_index: as in run_query, replaces the candidate fetch
+        
+        Returns: (ranked_products, user_profile_used, ahp_matrices)
+        """
+        check_top_k(top_k)
+        if timeout is not None:
+            async with asyncio.timeout(timeout):
+                return await self.arun_query(user_id, query, purchase_history, candidate_products,
+                                             db=db, category_id=category_id, top_k=top_k,
+                                             preference_stats=preference_stats,
+                                             catalog_index=catalog_index,
+                                             robustness_samples=robustness_samples)
+        
+        print(f"\n🤖 ORBIT Agent Processing Query (async)")
+        print(f"   User: {user_id}")
+        print(f"   Query: '{query}'")
+        
+        try:
+            # stage 1: parse + db fetches
+            async with asyncio.TaskGroup() as tg:
+                parse_task = tg.create_task(self.aparse_query(query))
+                history_task = None
+                products_task = None
+                if purchase_history is None and preference_stats is None and db is not None:
+                    history_task = tg.create_task(db.get_user_purchase_history(user_id))
+                if candidate_products is None and catalog_index is None and db is not None and category_id:
+                    products_task = tg.create_task(db.search_products(category_id))
+            
+            query_parsed = parse_task.result()
+            category = query_parsed.get('category', 'general')
+            if history_task is not None:
+                purchase_history = history_task.result()
+            if products_task is not None:
+                candidate_products = products_task.result()
+            elif candidate_products is None and catalog_index is None and db is not None:
+                # category only known after parsing
+                candidate_products = await db.search_products(CATEGORY_IDS.get(category, category))
+            
+            # stage 2: local work
+            if preference_stats is not None:
+                user_profile = preference_stats.to_profile(category)
+            else:
+                user_profile = self.analyze_user_history(purchase_history or [], category)
+            candidate_products = self.filter_candidates(candidate_products, query_parsed, catalog_index)
+            
+            if len(candidate_products) == 0:
+                print("   ⚠️  No products match constraints! Returning empty results.")
+                return [], self.build_user_profile(user_id, query_parsed, user_profile, {}), {}
+            
+            criteria, cost_criteria = self.get_criteria_set(category)
+            
+            # stage 3: weights and scoring don't depend on each other
+            async with asyncio.TaskGroup() as tg:
+                weights_task = tg.create_task(
+                    self.acalculate_criteria_weights(criteria, query_parsed, user_profile))
+                scores_task = tg.create_task(
+                    self.ascore_products_relative(candidate_products, criteria, query_parsed,
+                                                  user_profile, cost_criteria))
+            
+        except asyncio.CancelledError:
+            print(f"   ⛔ Query cancelled for {user_id}")
+            raise
+        
+        return self._finish_ranking(user_id, query_parsed, user_profile, criteria,
+                                    weights_task.result(), candidate_products, scores_task.result(), top_k,
+                                    robustness_samples)
+    
+    def run_query_batch(self, requests: List[Dict],
+                        candidate_loader: Callable[[str], List[Product]],
+                        top_k: Optional[int] = None,
+                        product_scores: Optional[Dict[str, ScoreMatrix]] = None,
+                        catalog_index: Optional[Dict[str, CatalogIndex]] = None) -> List[tuple[List[RankedProduct], UserProfile, Dict]]:
+        """
+        BATCH WORKFLOW: rank many (user, query) pairs in one pass
+        
+        requests: [{"user_id", "query", "purchase_history" or "preference_stats", optional "category_id"}]
+        candidate_loader: category_id -> candidate products (e.g. db.search_products),
+                          called once per category
+        top_k: RankedProduct objects built per request (default: all)
+        product_scores: precomputed category_id -> ScoreMatrix (rows in candidate order),
+                        skips the scoring pass for those groups (e.g. scored once by a parent process)
+        catalog_index: category_id -> CatalogIndex (db.get_catalog_index), those groups take their
+                       candidates from the index and filter through it like run_query (must-haves included)
+        
+        - identical queries are parsed once
+        - requests are grouped by category: one candidate fetch and one scoring pass per group
+        - identical (query, user profile) pairs share one weights call
+        - all AHP scores of a group come from one (requests x criteria) @ (criteria x products) product
+        
+        NOTE: product scores are relative to the whole category pool, not to each
+        request's filtered set, so values can differ slightly from run_query
+        
+        Returns: one (ranked_products, user_profile_used, ahp_matrices) per request, in order
+        """
+        check_top_k(top_k)
+        
+        print(f"\n🤖 ORBIT Agent Processing Batch of {len(requests)} queries")
+        print("="*60)
+        
+        # parse each distinct query once
+        parsed_queries = {}
+        for r in requests:
+            key = " ".join(r['query'].lower().split())
+            if key not in parsed_queries:
+                parsed_queries[key] = self.parse_query(r['query'])
+        print(f"\n📝 Parsed {len(parsed_queries)} distinct queries")
+        
+        # group by (candidate category, criteria category)
+        groups = defaultdict(list)
+        parsed_for = []
+        for i, r in enumerate(requests):
+            query_parsed = parsed_queries[" ".join(r['query'].lower().split())]
+            parsed_for.append(query_parsed)
+            category = query_parsed.get('category', 'general')
+            category_id = r.get('category_id') or CATEGORY_IDS.get(category, category)
+            groups[(category_id, category)].append(i)
+        
+        results = [None] * len(requests)
+        for (category_id, category), indices in groups.items():
+            print(f"\n📦 Group {category_id} ({category}): {len(indices)} requests")
+            
+            # one candidate fetch + one scoring pass for the whole group
+            index = (catalog_index or {}).get(category_id)
+            candidates = index.products if index is not None else candidate_loader(category_id)
+            criteria, cost_criteria = self.get_criteria_set(category)
+            
+            profiles = [
+                requests[i]['preference_stats'].to_profile(category) if requests[i].get('preference_stats') is not None
+                else self.analyze_user_history(requests[i].get('purchase_history') or [], category)
+                for i in indices
+            ]
+            
+            if not candidates:
+                for i, profile in zip(indices, profiles):
+                    results[i] = ([], self.build_user_profile(requests[i]['user_id'], parsed_for[i], profile, {}), {})
+                continue
+            
+            group_scores = (product_scores or {}).get(category_id)
+            if group_scores is None or group_scores.criteria != criteria:
+                group_scores = self.score_products_relative(
+                    candidates, criteria, {'category': category}, {}, cost_criteria
+                )
+            
+            # weights per distinct (query, profile)
+            weight_cache = {}
+            weights_for = []
+            for i, profile in zip(indices, profiles):
+                key = json.dumps([parsed_for[i], profile], sort_keys=True, default=str)
+                if key not in weight_cache:
+                    weight_cache[key] = self.calculate_criteria_weights(criteria, parsed_for[i], profile)
+                weights_for.append(weight_cache[key])
+            print(f"   ⚖️  {len(weight_cache)} distinct weight vectors")
+            
+            # (requests x criteria) @ (criteria x products)
+            W = np.array([group_scores.weight_vector(w) for w in weights_for])
+            all_scores = W @ group_scores.values.T
+            
+            prices = np.array([p.base_price for p in candidates])
+            brands = np.array([p.brand.lower() for p in candidates])
+            row_of = {p.product_id: k for k, p in enumerate(candidates)} if index is not None else None
+            
+            for row, (i, profile, criteria_weights) in enumerate(zip(indices, profiles, weights_for)):
+                query_parsed = parsed_for[i]
+                user_id = requests[i]['user_id']
+                if index is not None:
+                    keep = np.array([row_of[p.product_id] for p in self.filter_candidates(candidates, query_parsed, index)],
+                                    dtype=np.intp)
+                else:
+                    keep = np.flatnonzero(self.hard_filter_mask(prices, brands, query_parsed))
+                
+                if len(keep) == 0:
+                    results[i] = ([], self.build_user_profile(user_id, query_parsed, profile, {}), {})
+                    continue
+                
+                kept = [candidates[k] for k in keep]
+                kept_scores = all_scores[row, keep]
+                ahp_scores = dict(zip((p.product_id for p in kept), kept_scores.tolist()))
+                ranked_products = self.build_ranked_products(kept, kept_scores, group_scores, top_k)
+                
+                results[i] = (
+                    ranked_products,
+                    self.build_user_profile(user_id, query_parsed, profile, criteria_weights),
+                    {
+                        'criteria': criteria,
+                        'criteria_weights': criteria_weights,
+                        'product_scores': group_scores,
+                        'final_scores': ahp_scores,
+                        'query_context': query_parsed,
+                        'user_profile': profile,
+                        'ranked_pages': self.iter_ranked_products(kept, kept_scores, group_scores)
+                    }
+                )
+        
+        print(f"\n✅ Batch complete! {len(requests)} requests across {len(groups)} groups")
+        return results
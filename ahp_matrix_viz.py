@@ -1,8 +1,8 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
 import numpy as np
 from pathlib import Path
+from chart_cache import cached_chart
+# matplotlib / seaborn / pandas load (and get styled) on the first chart
+from lazy_modules import plt, sns, pd
 
 class AHPMatrixVisualizer:
     """
@@ -14,7 +14,8 @@ class AHPMatrixVisualizer:
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
-    def save_criteria_weights_table(self, ahp_matrices: dict, username: str):
+    @cached_chart
+    def save_criteria_weights_table(self, ahp_matrices: dict, username: str, dpi=300, fmt="png"):
         """
         Save criteria weights as a clean table image
         """
@@ -52,13 +53,14 @@ class AHPMatrixVisualizer:
         plt.title(f"AHP Criteria Weights - {username}", 
                  fontsize=14, fontweight='bold', pad=20)
         
-        filename = self.output_dir / f"{username}_ahp_criteria_weights.png"
-        plt.savefig(filename, bbox_inches='tight', dpi=300)
+        filename = self.output_dir / f"{username}_ahp_criteria_weights.{fmt}"
+        plt.savefig(filename, bbox_inches='tight', dpi=dpi)
         plt.close()
         
         return filename
     
-    def save_product_scores_matrix(self, ahp_matrices: dict, username: str, top_n=10):
+    @cached_chart
+    def save_product_scores_matrix(self, ahp_matrices: dict, username: str, top_n=10, dpi=300, fmt="png"):
         """
         Save product scores as heatmap matrix
         Shows how each product scored on each criteria
@@ -98,13 +100,14 @@ class AHPMatrixVisualizer:
         plt.xticks(rotation=45, ha='right')
         plt.tight_layout()
         
-        filename = self.output_dir / f"{username}_ahp_score_matrix.png"
-        plt.savefig(filename, bbox_inches='tight', dpi=300)
+        filename = self.output_dir / f"{username}_ahp_score_matrix.{fmt}"
+        plt.savefig(filename, bbox_inches='tight', dpi=dpi)
         plt.close()
         
         return filename
     
-    def save_decision_hierarchy(self, ahp_matrices: dict, username: str):
+    @cached_chart
+    def save_decision_hierarchy(self, ahp_matrices: dict, username: str, dpi=300, fmt="png"):
         """
         Visualize the AHP decision hierarchy
         Goal → Criteria → Products
@@ -173,13 +176,14 @@ class AHPMatrixVisualizer:
         ax.add_patch(plt.Rectangle((3.7, 1), 0.3, 0.2, facecolor='#A5A5A5'))
         ax.text(4.1, 1.1, "< 0.15 (Low)", fontsize=8, va='center')
         
-        filename = self.output_dir / f"{username}_ahp_hierarchy.png"
-        plt.savefig(filename, bbox_inches='tight', dpi=300)
+        filename = self.output_dir / f"{username}_ahp_hierarchy.{fmt}"
+        plt.savefig(filename, bbox_inches='tight', dpi=dpi)
         plt.close()
         
         return filename
     
-    def save_criteria_comparison_matrix(self, ahp_matrices: dict, username: str):
+    @cached_chart
+    def save_criteria_comparison_matrix(self, ahp_matrices: dict, username: str, dpi=300, fmt="png"):
         """
         Save simulated pairwise comparison matrix
         This shows how criteria were compared against each other
@@ -222,13 +226,13 @@ class AHPMatrixVisualizer:
         
         plt.tight_layout()
         
-        filename = self.output_dir / f"{username}_ahp_pairwise_matrix.png"
-        plt.savefig(filename, bbox_inches='tight', dpi=300)
+        filename = self.output_dir / f"{username}_ahp_pairwise_matrix.{fmt}"
+        plt.savefig(filename, bbox_inches='tight', dpi=dpi)
         plt.close()
         
         return filename
     
-    def generate_all_matrices(self, ahp_matrices: dict, username: str):
+    def generate_all_matrices(self, ahp_matrices: dict, username: str, dpi=300, fmt="png"):
         """
         Generate all AHP matrix visualizations
         """
@@ -237,22 +241,22 @@ class AHPMatrixVisualizer:
         files = []
         
         # Criteria weights table
-        f = self.save_criteria_weights_table(ahp_matrices, username)
+        f = self.save_criteria_weights_table(ahp_matrices, username, dpi=dpi, fmt=fmt)
         files.append(f)
         print(f"   ✓ Criteria weights table: {f.name}")
         
         # Product scores matrix
-        f = self.save_product_scores_matrix(ahp_matrices, username)
+        f = self.save_product_scores_matrix(ahp_matrices, username, dpi=dpi, fmt=fmt)
         files.append(f)
         print(f"   ✓ Product scores matrix: {f.name}")
         
         # Decision hierarchy
-        f = self.save_decision_hierarchy(ahp_matrices, username)
+        f = self.save_decision_hierarchy(ahp_matrices, username, dpi=dpi, fmt=fmt)
         files.append(f)
         print(f"   ✓ Decision hierarchy: {f.name}")
         
         # Pairwise comparison matrix
-        f = self.save_criteria_comparison_matrix(ahp_matrices, username)
+        f = self.save_criteria_comparison_matrix(ahp_matrices, username, dpi=dpi, fmt=fmt)
         files.append(f)
         print(f"   ✓ Pairwise comparison matrix: {f.name}")
         
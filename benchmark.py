@@ -0,0 +1,331 @@
+"""
+ORBIT BENCHMARKS
+Times every stage of the micro (ORBITAgent.run_query) and macro
+(ORBITMacroAgent.run_strategic_analysis) pipelines on synthetic data
+
+Runs fully offline: SyntheticProvider stands in for Gemini, no database needed
+
+Usage:
+    python benchmark.py                                   # default sizes, prints JSON
+    python benchmark.py --sizes 100 10000 1000000 --repeats 3
+    python benchmark.py --output bench.json               # save results (use as a baseline later)
+    python benchmark.py --compare bench.json              # flag stages that got slower
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from ahp_engine import ORBITAgent, CATEGORY_IDS, CATEGORY_CRITERIA
+from macro_ahp_engine import ORBITMacroAgent
+from llm_provider import SyntheticProvider
+from models import Product, Purchase, Vendor, VendorInventory, EnrichedPurchase, VendorProfile
+from spec_scoring import GPU_TIERS, CUSHIONING_LEVELS
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+DEFAULT_QUERY = "laptop for work under $1500"
+
+BRANDS = {
+    "laptops": ["Dell", "HP", "Lenovo", "Apple", "ASUS", "Acer", "MSI", "Razer"],
+    "smartphones": ["Apple", "Samsung", "Google", "OnePlus", "Motorola", "Xiaomi"],
+    "coffee": ["Morning Brew", "Stumptown", "Blue Bottle", "Lavazza", "Counter Culture"],
+    "sneakers": ["Nike", "Adidas", "New Balance", "ASICS", "Hoka", "Converse", "Vans"]
+}
+
+PRICE_RANGES = {
+    "laptops": (250, 4000),
+    "smartphones": (150, 1600),
+    "coffee": (8, 60),
+    "sneakers": (50, 250)
+}
+
+SEGMENTS = ["budget_conscious", "value_seeker", "balanced", "performance_focused", "premium_buyer", "brand_loyal"]
+
+
+# ----- synthetic data -----
+
+def _synthetic_specs(category: str, rng: random.Random) -> Dict:
+    if category == "laptops":
+        return {
+            "ram_gb": rng.choice([4, 8, 16, 32, 64]),
+            "storage_gb": rng.choice([64, 128, 256, 512, 1024, 2048]),
+            "gpu": rng.choice(list(GPU_TIERS)).upper() if rng.random() < 0.5 else "Integrated",
+            "battery_hours": rng.randint(4, 20),
+            "weight_kg": round(rng.uniform(0.9, 3.5), 2),
+            "screen_size": rng.choice([13.3, 14.0, 15.6, 16.0, 17.3])
+        }
+    if category == "smartphones":
+        return {
+            "camera_mp": rng.choice([12, 48, 50, 64, 108, 200]),
+            "battery_mah": rng.randint(3000, 6000),
+            "ram_gb": rng.choice([4, 6, 8, 12, 16]),
+            "storage_gb": rng.choice([64, 128, 256, 512, 1024])
+        }
+    if category == "coffee":
+        return {
+            "is_organic": rng.random() < 0.4,
+            "flavor_notes": rng.sample(["chocolate", "citrus", "berry", "nutty", "caramel", "floral"], rng.randint(1, 4)),
+            "weight_grams": rng.choice([250, 340, 454, 907])
+        }
+    return {
+        "cushioning": rng.choice(list(CUSHIONING_LEVELS)),
+        "weight_grams": rng.randint(180, 450),
+        "waterproof": rng.random() < 0.2
+    }
+
+
+def synthetic_products(n: int, category: str = "laptops", seed: int = 0) -> List[Product]:
+    """n products with specs shaped like the seed data for this category"""
+    rng = random.Random(seed)
+    low, high = PRICE_RANGES[category]
+    brands = BRANDS[category]
+    products = []
+    for i in range(n):
+        brand = rng.choice(brands)
+        products.append(Product(
+            product_id=f"bench_{category[:3]}_{i:07d}",
+            product_name=f"{brand} Bench {i}",
+            category_id=CATEGORY_IDS[category],
+            brand=brand,
+            model=f"B{i}",
+            base_price=round(rng.uniform(low, high), 2),
+            specs=_synthetic_specs(category, rng)
+        ))
+    return products
+
+
+def synthetic_history(products: List[Product], n: int, user_id: str = "usr_bench",
+                      seed: int = 0) -> List[EnrichedPurchase]:
+    """n purchases of random products from the catalog"""
+    rng = random.Random(seed)
+    vendor = Vendor(vendor_id="vnd_bench", vendor_name="Bench Vendor", vendor_rating=4.2,
+                    avg_shipping_days=3, return_policy_days=30)
+    start = datetime(2023, 1, 1)
+    history = []
+    for i in range(n):
+        product = rng.choice(products)
+        price = round(product.base_price * rng.uniform(0.85, 1.1), 2)
+        inventory = VendorInventory(inventory_id=f"inv_bench_{i}", vendor_id=vendor.vendor_id,
+                                    product_id=product.product_id, vendor_price=price, stock_quantity=10,
+                                    shipping_days=3, shipping_cost=0, is_available=True)
+        history.append(EnrichedPurchase(
+            purchase=Purchase(purchase_id=f"purch_bench_{i}", user_id=user_id,
+                              inventory_id=inventory.inventory_id,
+                              purchase_date=start + timedelta(hours=rng.randint(0, 20000)),
+                              quantity=1, total_paid=price),
+            product=product,
+            vendor=vendor,
+            inventory=inventory
+        ))
+    return history
+
+
+def synthetic_vendor_profiles(n: int, category: str = "laptops", seed: int = 0) -> List[VendorProfile]:
+    """n vendors with random (normalized) criteria weights and segment mixes"""
+    rng = np.random.default_rng(seed)
+    criteria = CATEGORY_CRITERIA[category]["criteria"]
+    profiles = []
+    for i in range(n):
+        weights = rng.dirichlet(np.ones(len(criteria)))
+        segments = rng.dirichlet(np.ones(len(SEGMENTS)))
+        profiles.append(VendorProfile(
+            vendor_id=f"vnd_bench_{i}",
+            vendor_name=f"Bench Vendor {i}",
+            category_id=CATEGORY_IDS[category],
+            market_share=float(rng.uniform(0.01, 0.4)),
+            avg_conversion_rate=float(rng.uniform(0.02, 0.2)),
+            total_products=int(rng.integers(5, 500)),
+            total_sales=int(rng.integers(10, 10000)),
+            avg_customer_criteria={c: float(w) for c, w in zip(criteria, weights)},
+            customer_segments={s: float(w) for s, w in zip(SEGMENTS, segments)}
+        ))
+    return profiles
+
+
+# ----- measurement -----
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples, dtype=float)
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "mean": float(values.mean()),
+        "runs": len(values)
+    }
+
+
+def measure(fn: Callable[[], object], timer, repeats: int) -> Dict:
+    """
+    Run fn repeats times and summarise total + per-stage wall time
+    Peak memory comes from one extra tracemalloc run so tracing doesn't skew the timings
+    """
+    totals = []
+    stages: Dict[str, List[float]] = {}
+    for _ in range(repeats):
+        timer.reset()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        totals.append(time.perf_counter() - start)
+        for stage, seconds in timer.snapshot().items():
+            stages.setdefault(stage, []).append(seconds)
+
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "total": percentiles(totals),
+        "stages": {stage: percentiles(samples) for stage, samples in stages.items()},
+        "peak_memory_mb": peak / 1024 / 1024
+    }
+
+
+def bench_micro(sizes: List[int], repeats: int, history_size: int, category: str,
+                query: str, latency: float, seed: int, top_k: Optional[int] = None) -> List[Dict]:
+    agent = ORBITAgent(provider=SyntheticProvider(latency=latency, seed=seed), cache=None)
+    results = []
+    for n in sizes:
+        print(f"⏱️  micro: {n:,} products", file=sys.stderr)
+        products = synthetic_products(n, category, seed)
+        history = synthetic_history(products, history_size, seed=seed)
+        result = measure(lambda: agent.run_query("usr_bench", query, history, products, top_k=top_k),
+                         agent.timer, repeats)
+        results.append({"size": n, "history_size": history_size, "top_k": top_k, **result})
+    return results
+
+
+def bench_macro(vendor_count: int, repeats: int, category: str, seed: int) -> List[Dict]:
+    agent = ORBITMacroAgent(provider=SyntheticProvider(seed=seed), cache=None)
+    profiles = synthetic_vendor_profiles(vendor_count, category, seed)
+    print(f"⏱️  macro: {vendor_count} vendor profiles", file=sys.stderr)
+
+    def run_all():
+        for profile in profiles:
+            agent.run_strategic_analysis(profile)
+
+    return [{"size": vendor_count, **measure(run_all, agent.timer, repeats)}]
+
+
+def bench_fleet(vendor_count: int, repeats: int, category: str, seed: int) -> List[Dict]:
+    """Same vendors as bench_macro, through the batched run_fleet_analysis"""
+    agent = ORBITMacroAgent(provider=SyntheticProvider(seed=seed), cache=None)
+    profiles = synthetic_vendor_profiles(vendor_count, category, seed)
+    print(f"⏱️  fleet: {vendor_count} vendor profiles", file=sys.stderr)
+    return [{"size": vendor_count, **measure(lambda: agent.run_fleet_analysis(profiles), agent.timer, repeats)}]
+
+
+# ----- baseline comparison -----
+
+def flatten(results: Dict) -> Dict[str, float]:
+    """pipeline/size/stage -> p50 seconds"""
+    flat = {}
+    for pipeline in ("micro", "macro", "fleet"):
+        for entry in results.get(pipeline, []):
+            prefix = f"{pipeline}/{entry['size']}"
+            flat[f"{prefix}/total"] = entry["total"]["p50"]
+            for stage, stats in entry["stages"].items():
+                flat[f"{prefix}/{stage}"] = stats["p50"]
+    return flat
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.10,
+            min_seconds: float = 1e-4) -> List[Dict]:
+    """
+    Stages whose p50 grew by more than threshold (fractional) vs the baseline
+    Stages faster than min_seconds in both runs are ignored (timer noise)
+    """
+    now, before = flatten(current), flatten(baseline)
+    regressions = []
+    for key in sorted(now.keys() & before.keys()):
+        old, new = before[key], now[key]
+        if max(old, new) < min_seconds:
+            continue
+        change = (new - old) / old if old > 0 else float("inf")
+        if change > threshold:
+            regressions.append({"stage": key, "baseline_p50": old, "current_p50": new, "change": change})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ORBIT pipeline benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="catalog sizes for run_query")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--history", type=int, default=50, help="purchases per synthetic user")
+    parser.add_argument("--vendors", type=int, default=100, help="vendor profiles for run_strategic_analysis / run_fleet_analysis")
+    parser.add_argument("--category", default="laptops", choices=sorted(CATEGORY_IDS))
+    parser.add_argument("--query", default=DEFAULT_QUERY)
+    parser.add_argument("--top-k", type=int, default=None, help="run_query top_k (default: rank every candidate)")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated model latency (seconds)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-macro", action="store_true")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed p50 slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeats": args.repeats,
+            "category": args.category,
+            "query": args.query,
+            "latency": args.latency,
+            "top_k": args.top_k,
+            "seed": args.seed
+        },
+        "micro": [],
+        "macro": [],
+        "fleet": []
+    }
+    if not args.skip_micro:
+        results["micro"] = bench_micro(args.sizes, args.repeats, args.history, args.category,
+                                       args.query, args.latency, args.seed, args.top_k)
+    if not args.skip_macro:
+        results["macro"] = bench_macro(args.vendors, args.repeats, args.category, args.seed)
+        results["fleet"] = bench_fleet(args.vendors, args.repeats, args.category, args.seed)
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        results["comparison"] = {"baseline": args.compare, "threshold": args.threshold,
+                                 "regressions": regressions}
+        for r in regressions:
+            print(f"⚠️  {r['stage']}: {r['baseline_p50']*1000:.2f}ms → {r['current_p50']*1000:.2f}ms "
+                  f"(+{r['change']*100:.0f}%)", file=sys.stderr)
+        if regressions:
+            exit_code = 1
+        else:
+            print("✅ No regressions against baseline", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"💾 Results saved to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+RESPONSE CACHE
+Content-addressed cache for Gemini calls
+In-process LRU tier + on-disk SQLite tier, per-call-type TTLs
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Optional
+
+# seconds each kind of response stays valid
+DEFAULT_TTLS = {
+    "parse_query": 7 * 24 * 3600,
+    "criteria_weights": 24 * 3600,
+    "product_scores": 6 * 3600,
+    "strategic_narrative": 24 * 3600,
+    "product_strategy": 24 * 3600
+}
+DEFAULT_TTL = 3600
+
+DEFAULT_CACHE_PATH = ".orbit_cache/llm_responses.sqlite"
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU with optional per-entry TTL
+    Entries carry a tag and a category so callers can drop everything with either
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # key -> (tag, category, value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            tag, category, value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Any, value: Any, ttl: Optional[float] = None, tag: Optional[str] = None,
+            category: Optional[str] = None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (tag, category, value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Any):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, tag: Optional[str] = None, category: Optional[str] = None) -> int:
+        """Drop every entry matching tag and/or category (everything if both are None)"""
+        with self._lock:
+            if tag is None and category is None:
+                count = len(self._entries)
+                self._entries.clear()
+                return count
+            stale = [k for k, (t, c, _, _) in self._entries.items()
+                     if (tag is None or t == tag) and (category is None or c == category)]
+            for k in stale:
+                del self._entries[k]
+            return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so formatting-only differences hit the same entry"""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for raw model responses
+    Key = sha256(model name, temperature, normalized prompt)
+    Entries are tagged with call type and product category for targeted invalidation
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, max_entries: int = 1024,
+                 ttls: Optional[Dict[str, float]] = None):
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.memory = LRUCache(max_entries)
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.counters = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    call_type TEXT NOT NULL,
+                    category TEXT,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            # caches written before category tagging
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(llm_cache)")}
+            if "category" not in columns:
+                self._db.execute("ALTER TABLE llm_cache ADD COLUMN category TEXT")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_type ON llm_cache(call_type)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_category ON llm_cache(category)")
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMResponseCache"]:
+        """ORBIT_LLM_CACHE=0 disables caching, ORBIT_LLM_CACHE_PATH='' keeps it in memory only"""
+        if os.getenv("ORBIT_LLM_CACHE", "1").lower() in ("0", "false", "off"):
+            return None
+        return cls(path=os.getenv("ORBIT_LLM_CACHE_PATH", DEFAULT_CACHE_PATH) or None)
+
+    @staticmethod
+    def make_key(model_name: str, temperature: Optional[float], prompt: str) -> str:
+        payload = json.dumps([model_name, temperature, normalize_prompt(prompt)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, call_type: str) -> float:
+        return self.ttls.get(call_type, DEFAULT_TTL)
+
+    def get(self, call_type: str, key: str, category: Optional[str] = None) -> Optional[str]:
+        text = self.memory.get(key)
+        if text is None and self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT response, expires_at FROM llm_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row and row[1] < time.time():
+                    self._db.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+                    self._db.commit()
+                    row = None
+            if row:
+                text = row[0]
+                # promote to memory tier for the rest of its lifetime
+                self.memory.put(key, text, ttl=max(row[1] - time.time(), 0),
+                                tag=call_type, category=category)
+
+        self.counters[call_type]["hits" if text is not None else "misses"] += 1
+        return text
+
+    def put(self, call_type: str, key: str, text: str, category: Optional[str] = None):
+        ttl = self.ttl_for(call_type)
+        self.memory.put(key, text, ttl=ttl, tag=call_type, category=category)
+        if self._db is not None:
+            now = time.time()
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (cache_key, call_type, category, response, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, call_type, category, text, now, now + ttl)
+                )
+                self._db.commit()
+
+    def invalidate(self, call_type: Optional[str] = None, category: Optional[str] = None) -> int:
+        """
+        Drop cached responses for one call type and/or product category, or everything
+        e.g. invalidate(category="laptops") after the laptop catalog changes
+        """
+        removed = self.memory.invalidate(call_type, category)
+        if self._db is not None:
+            filters = [(column, value) for column, value in (("call_type", call_type), ("category", category))
+                       if value is not None]
+            where = " AND ".join(f"{column} = ?" for column, _ in filters)
+            with self._db_lock:
+                cur = self._db.execute("DELETE FROM llm_cache" + (f" WHERE {where}" if where else ""),
+                                       tuple(value for _, value in filters))
+                self._db.commit()
+                removed = max(removed, cur.rowcount)
+        return removed
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Hit/miss counters per call type"""
+        report = {}
+        for call_type, c in self.counters.items():
+            total = c["hits"] + c["misses"]
+            report[call_type] = {**c, "hit_rate": c["hits"] / total if total else 0.0}
+        return report
+
+
+def generate_cached(cache: Optional[LLMResponseCache], provider, model_name: str,
+                    temperature: Optional[float], call_type: str, prompt: str,
+                    parse: Optional[Callable[[str], Any]] = None, category: Optional[str] = None) -> Any:
+    """
+    Call provider.generate through the cache
+    The response is only stored once parse() succeeds, so bad JSON never gets cached
+    category tags the entry so it can be invalidated with its catalog
+    """
+    parse = parse or (lambda text: text)
+    if cache is None:
+        return parse(provider.generate(prompt, call_type))
+
+    key = cache.make_key(model_name, temperature, prompt)
+    text = cache.get(call_type, key, category)
+    if text is not None:
+        return parse(text)
+
+    text = provider.generate(prompt, call_type)
+    result = parse(text)
+    cache.put(call_type, key, text, category)
+    return result
+
+
+async def agenerate_cached(cache: Optional[LLMResponseCache], provider, model_name: str,
+                           temperature: Optional[float], call_type: str, prompt: str,
+                           parse: Optional[Callable[[str], Any]] = None, category: Optional[str] = None) -> Any:
+    """Async twin of generate_cached, uses provider.agenerate"""
+    parse = parse or (lambda text: text)
+    if cache is None:
+        return parse(await provider.agenerate(prompt, call_type))
+
+    key = cache.make_key(model_name, temperature, prompt)
+    text = cache.get(call_type, key, category)
+    if text is not None:
+        return parse(text)
+
+    text = await provider.agenerate(prompt, call_type)
+    result = parse(text)
+    cache.put(call_type, key, text, category)
+    return result
@@ -0,0 +1,232 @@
+"""
+CATALOG INDEX
+In-memory index over one category's products for hard-constraint prefiltering
+Sorted arrays + bisect for ranges (price, numeric specs), bitmaps for brands and spec values
+A range stays a slice of row ids, it only meets a bitmap when the query also has a brand/value constraint
+Budgets, brand and must-have features resolve to a candidate set before any scoring
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from models import Product
+from spec_scoring import SPEC_PARSERS, _parse_number
+
+# a candidate set: bitmap (python int, bit i = row i) or an array of row ids (range lookups)
+Rows = Union[int, np.ndarray]
+
+# spec keys with more distinct values than this only get a range index, no value bitmaps
+MAX_BITMAP_VALUES = 64
+
+# must-have phrase -> spec constraint
+# (pattern, spec key, op, value): op is "==", ">=" or "<="; value None = use the first capture group
+# numeric ops compare parsed values (gpu tier, cushioning level, ...) via spec_scoring.SPEC_PARSERS
+FEATURE_RULES = [
+    (r"(\d+)\s*gb\s*(?:of\s*)?ram", "ram_gb", ">=", None),
+    (r"(\d+)\s*gb\s*(?:of\s*)?(?:storage|ssd)", "storage_gb", ">=", None),
+    (r"\b(?:dedicated|discrete|good|powerful|strong)\s+(?:gpu|graphics)|\brtx\b|\bnvidia\b", "gpu", ">=", 1.0),
+    (r"\blong(?:er)?[- ]battery|\ball[- ]day battery", "battery_hours", ">=", 10),
+    (r"\blong(?:er)?[- ]battery|\ball[- ]day battery", "battery_mah", ">=", 4500),
+    (r"\blight\s*weight|\bultra\s*light|\bportable", "weight_kg", "<=", 1.6),
+    (r"(\d+)\s*mp\b", "camera_mp", ">=", None),
+    (r"\b(?:great|good|best|pro)\s+camera", "camera_mp", ">=", 48),
+    (r"\borganic\b", "is_organic", "==", True),
+    (r"\bwaterproof\b", "waterproof", "==", True),
+    (r"\b(light|medium|dark)\s+roast\b", "roast_level", "==", None),
+    (r"\b(?:max(?:imum)?|high|plush|extra)\s+cushion", "cushioning", ">=", 3.0)
+]
+
+
+def _rows_to_bitmap(rows: np.ndarray, size: int) -> int:
+    mask = np.zeros(size, dtype=bool)
+    mask[rows] = True
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+
+def _bitmap_mask(bitmap: int, size: int) -> np.ndarray:
+    raw = np.frombuffer(bitmap.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder="little")[:size].view(bool)
+
+
+def _bitmap_to_rows(bitmap: int, size: int) -> np.ndarray:
+    return np.flatnonzero(_bitmap_mask(bitmap, size))
+
+
+def _hashable(value):
+    return value.strip().lower() if isinstance(value, str) else value
+
+
+class CatalogIndex:
+    """
+    Index over a fixed product list (one category)
+    Value lookups return bitmaps (python ints, bit i = products[i]) so they combine with &,
+    range lookups return row-id slices so a budget never touches the whole catalog
+    """
+
+    def __init__(self, products: List[Product]):
+        self.products = list(products)
+        self.size = len(self.products)
+        self.all = (1 << self.size) - 1
+
+        prices = np.array([p.base_price for p in self.products], dtype=float)
+        self._price_order = np.argsort(prices, kind="stable")
+        self._sorted_prices = prices[self._price_order].tolist()
+
+        # brand (lowercase) -> bitmap
+        brand_rows: Dict[str, List[int]] = {}
+        for i, p in enumerate(self.products):
+            brand_rows.setdefault(p.brand.lower(), []).append(i)
+        self.brands = {b: _rows_to_bitmap(np.array(r), self.size) for b, r in brand_rows.items()}
+
+        # specs: value bitmaps for low-cardinality keys, sorted numeric arrays for everything parseable
+        value_rows: Dict[str, Dict] = {}
+        numeric: Dict[str, Tuple[List[int], List[float]]] = {}
+        for i, p in enumerate(self.products):
+            for key, value in p.specs.items():
+                values = value if isinstance(value, list) else [value]
+                for v in values:
+                    v = _hashable(v)
+                    try:
+                        value_rows.setdefault(key, {}).setdefault(v, []).append(i)
+                    except TypeError:
+                        pass  # unhashable (nested dict), not indexed
+                number = SPEC_PARSERS.get(key, _parse_number)(value)
+                if number is not None:
+                    rows, nums = numeric.setdefault(key, ([], []))
+                    rows.append(i)
+                    nums.append(number)
+
+        self.spec_values: Dict[str, Dict] = {
+            key: {v: _rows_to_bitmap(np.array(r), self.size) for v, r in by_value.items()}
+            for key, by_value in value_rows.items()
+            if len(by_value) <= MAX_BITMAP_VALUES
+        }
+        self._spec_numeric: Dict[str, Tuple[np.ndarray, List[float]]] = {}
+        for key, (rows, nums) in numeric.items():
+            order = np.argsort(nums, kind="stable")
+            self._spec_numeric[key] = (np.array(rows)[order], np.array(nums)[order].tolist())
+
+        self._rules = [(re.compile(pattern, re.I), key, op, value) for pattern, key, op, value in FEATURE_RULES]
+
+    # ----- primitive lookups -----
+
+    def _range(self, order: np.ndarray, sorted_values: List[float],
+               low: Optional[float], high: Optional[float]) -> Rows:
+        """O(log n): the matching slice of row ids (in value order), no catalog-sized mask"""
+        lo = bisect_left(sorted_values, low) if low is not None else 0
+        hi = bisect_right(sorted_values, high) if high is not None else len(sorted_values)
+        if lo == 0 and hi == self.size:
+            return self.all
+        return order[lo:hi]
+
+    def price_range(self, low: Optional[float] = None, high: Optional[float] = None) -> Rows:
+        return self._range(self._price_order, self._sorted_prices, low, high)
+
+    def brand(self, brand: str) -> int:
+        return self.brands.get(brand.lower(), 0)
+
+    def spec_equals(self, key: str, value) -> Rows:
+        value = _hashable(value)
+        if key in self.spec_values:
+            return self.spec_values[key].get(value, 0)
+        # high-cardinality key: fall back to numeric equality
+        return self.spec_range(key, value, value) if isinstance(value, (int, float)) else 0
+
+    def spec_range(self, key: str, low: Optional[float] = None, high: Optional[float] = None) -> Rows:
+        if key not in self._spec_numeric:
+            return 0
+        order, sorted_values = self._spec_numeric[key]
+        return self._range(order, sorted_values, low, high)
+
+    def has_spec(self, key: str) -> bool:
+        return key in self.spec_values or key in self._spec_numeric
+
+    def feature(self, phrase: str) -> Optional[Rows]:
+        """
+        Candidate set for a free-text must-have ('16GB RAM', 'dedicated GPU', 'dark roast')
+        None when no rule applies to this catalog (feature is left to scoring)
+        """
+        found = None
+        for pattern, key, op, value in self._rules:
+            match = pattern.search(phrase)
+            if not match or not self.has_spec(key):
+                continue
+            if value is None:
+                value = match.group(1).lower()
+                value = float(value) if value.replace(".", "", 1).isdigit() else value
+            if op == "==":
+                bits = self.spec_equals(key, value)
+            elif op == ">=":
+                bits = self.spec_range(key, low=value)
+            else:
+                bits = self.spec_range(key, high=value)
+            # several rules for the same phrase (e.g. battery hours / mAh) are alternatives
+            found = bits if found is None else self.union(found, bits)
+        return found
+
+    # ----- candidate sets -----
+
+    def intersect(self, a: Rows, b: Rows) -> Rows:
+        """
+        Bitmap & bitmap stays a bitmap; a row slice meeting a bitmap is filtered by that bitmap's bits
+        (unpacking the bitmap is the one catalog-sized step, only taken when both kinds are present)
+        """
+        if isinstance(a, int) and isinstance(b, int):
+            return a & b
+        if isinstance(a, int):
+            a, b = b, a
+        if isinstance(b, int):
+            return a if b == self.all else a[_bitmap_mask(b, self.size)[a]]
+        return np.intersect1d(a, b, assume_unique=True)
+
+    def union(self, a: Rows, b: Rows) -> Rows:
+        if isinstance(a, int) and isinstance(b, int):
+            return a | b
+        if isinstance(a, int) or isinstance(b, int):
+            as_bitmap = [x if isinstance(x, int) else _rows_to_bitmap(x, self.size) for x in (a, b)]
+            return as_bitmap[0] | as_bitmap[1]
+        return np.union1d(a, b)
+
+    def count(self, rows: Rows) -> int:
+        return rows.bit_count() if isinstance(rows, int) else len(rows)
+
+    # ----- query resolution -----
+
+    def rows(self, rows: Rows) -> np.ndarray:
+        """Row ids in catalog order"""
+        return _bitmap_to_rows(rows, self.size) if isinstance(rows, int) else np.sort(rows)
+
+    def select(self, rows: Rows) -> List[Product]:
+        return [self.products[i] for i in self.rows(rows).tolist()]
+
+    def filter(self, query_parsed: Dict) -> List[Product]:
+        """
+        Same constraints as ORBITAgent.apply_hard_filters plus must_have_features
+        Must-haves that would leave nothing are dropped (reported) rather than emptying the results
+        """
+        candidates: Rows = self.all
+
+        budget_min, budget_max = query_parsed.get('budget_min'), query_parsed.get('budget_max')
+        if budget_min or budget_max:
+            candidates = self.price_range(budget_min or None, budget_max or None)
+            print(f"   Budget filter (${budget_min or 0}-${budget_max or '∞'}): {self.size} → {self.count(candidates)} products")
+
+        if query_parsed.get('brand_preference'):
+            candidates = self.intersect(candidates, self.brand(query_parsed['brand_preference']))
+            print(f"   Brand filter ({query_parsed['brand_preference']}): kept {self.count(candidates)} products")
+
+        for phrase in query_parsed.get('must_have_features') or []:
+            bits = self.feature(phrase)
+            if bits is None:
+                continue
+            narrowed = self.intersect(candidates, bits)
+            if self.count(narrowed) == 0 and self.count(candidates) != 0:
+                print(f"   Must-have '{phrase}': no product left, ignoring it")
+                continue
+            candidates = narrowed
+            print(f"   Must-have '{phrase}': kept {self.count(candidates)} products")
+
+        return self.select(candidates)
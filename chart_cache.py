@@ -0,0 +1,187 @@
+"""
+CHART CACHE
+Skips re-rendering charts whose input data + style parameters haven't changed
+One manifest per output directory maps content hash -> file, least recently used files are evicted by total size
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+MANIFEST_NAME = ".chart_manifest.json"
+DEFAULT_MAX_MB = 200
+
+# bump when the drawing code changes so charts rendered by the old code are redrawn
+STYLE_VERSION = 2
+
+# output_dir -> ChartCache (None when disabled)
+_caches: Dict[str, Optional["ChartCache"]] = {}
+
+
+def _canonical(obj):
+    """JSON-able, order-independent form of chart inputs (pydantic models, numpy, ScoreMatrix, dicts)"""
+    if isinstance(obj, BaseModel):
+        return _canonical(obj.model_dump())
+    if isinstance(obj, np.ndarray):
+        array = np.ascontiguousarray(obj)
+        return {"ndarray": hashlib.sha256(array.tobytes()).hexdigest(), "shape": list(array.shape), "dtype": array.dtype.str}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Mapping):
+        if isinstance(getattr(obj, "values", None), np.ndarray):
+            # ScoreMatrix: hash the dense block instead of expanding every row into a dict
+            return {"product_ids": list(obj.product_ids), "criteria": list(obj.criteria), "values": _canonical(obj.values)}
+        return {str(k): _canonical(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        items = [_canonical(v) for v in obj]
+        return sorted(items, key=json.dumps) if isinstance(obj, (set, frozenset)) else items
+    if isinstance(obj, Iterator):
+        # lazy views (e.g. ahp_matrices['ranked_pages']) are never drawn
+        return type(obj).__name__
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    return str(obj)
+
+
+def content_hash(*parts) -> str:
+    payload = json.dumps([_canonical(p) for p in parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ChartCache:
+    """
+    Manifest of rendered charts in one directory: hash -> {file, size, mtime, last_used}
+    Files are stored relative to the directory, a hit needs the file unchanged since it was recorded
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        self.entries = self._read()
+        self._dropped = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, directory: str) -> Optional["ChartCache"]:
+        """ORBIT_CHART_CACHE=0 disables caching, ORBIT_CHART_CACHE_MB caps the directory size (default 200)"""
+        if os.getenv("ORBIT_CHART_CACHE", "1").lower() in ("0", "false", "off"):
+            return None
+        return cls(directory, max_bytes=int(float(os.getenv("ORBIT_CHART_CACHE_MB", DEFAULT_MAX_MB)) * 1024 * 1024))
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self):
+        # render-queue workers share the directory: merge with whatever they wrote since we read it,
+        # a lost race only costs one re-render
+        merged = {k: e for k, e in self._read().items() if k not in self._dropped}
+        merged.update(self.entries)
+        self.entries = {k: e for k, e in merged.items() if os.path.exists(os.path.join(self.directory, e["file"]))}
+        tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def get(self, key: str) -> Optional[str]:
+        """File name of the chart rendered from this hash, or None"""
+        entry = self.entries.get(key)
+        if entry is None or self._stat(entry["file"]) != (entry["size"], entry["mtime"]):
+            self.misses += 1
+            return None
+        entry["last_used"] = time.time()
+        self.hits += 1
+        self._write()
+        return entry["file"]
+
+    def _stat(self, name: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(os.path.join(self.directory, name))
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _drop(self, key: str):
+        del self.entries[key]
+        self._dropped.add(key)
+
+    def put(self, key: str, path: str):
+        name = os.path.relpath(path, self.directory)
+        # the file was overwritten, hashes that pointed at its old content are stale
+        for stale in [k for k, e in self.entries.items() if e["file"] == name]:
+            self._drop(stale)
+        size, mtime = self._stat(name)
+        self.entries[key] = {"file": name, "size": size, "mtime": mtime, "last_used": time.time()}
+        self._dropped.discard(key)
+        self.evict(keep=key)
+        self._write()
+
+    def evict(self, keep: Optional[str] = None):
+        """Delete least recently used charts until the tracked files fit in max_bytes"""
+        total = sum(e["size"] for e in self.entries.values())
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except OSError:
+                pass
+            self._drop(key)
+            total -= entry["size"]
+            self.evictions += 1
+
+
+def get_chart_cache(output_dir) -> Optional[ChartCache]:
+    key = str(output_dir)
+    if key not in _caches:
+        _caches[key] = ChartCache.from_env(key)
+    return _caches[key]
+
+
+def cached_chart(method: Callable) -> Callable:
+    """
+    Decorator for visualizer methods that save one chart and return its path
+    Hashes the bound arguments (defaults included, so dpi/fmt count) + class/method/STYLE_VERSION,
+    returns the existing file instead of rendering when the hash is in the output dir's manifest
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = get_chart_cache(self.output_dir)
+        if cache is None:
+            return method(self, *args, **kwargs)
+
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = {k: v for k, v in bound.arguments.items() if k != "self"}
+        key = content_hash(STYLE_VERSION, type(self).__qualname__, method.__name__, arguments)
+
+        name = cache.get(key)
+        if name is not None:
+            print(f"   ♻️  Unchanged: {os.path.basename(name)}")
+            return self.output_dir / name if isinstance(self.output_dir, Path) else os.path.join(self.output_dir, name)
+
+        path = method(self, *args, **kwargs)
+        if path is not None:
+            cache.put(key, str(path))
+        return path
+
+    return wrapper
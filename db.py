@@ -1,50 +1,264 @@
-from supabase import create_client, Client
-from typing import List, Optional
-from models import User, Product, Purchase, Vendor, VendorInventory, EnrichedPurchase
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from datetime import datetime
+from models import (
+    User, Product, Purchase, Vendor, VendorInventory, EnrichedPurchase,
+    VendorProfile, ProductAggregateInsight
+)
+from cache import LRUCache
+from user_profiles import PreferenceStats
+from catalog_index import CatalogIndex
+import asyncio
 import os
 
-class Database:
-    def __init__(self):
-        self.supabase: Client = create_client(
-            os.getenv("SUPABASE_URL"),
-            os.getenv("SUPABASE_KEY")
+# seconds a cached read stays valid, per table
+DB_CACHE_TTLS = {
+    'products': 600,
+    'vendors': 3600,
+    'vendor_inventory': 60,  # stock moves faster than the catalog
+    'users': 600
+}
+
+# cached reads stored under one table that also embed rows from another
+TABLE_DEPENDENTS = {
+    'products': ['vendor_inventory'],
+    'vendors': ['vendor_inventory']
+}
+
+
+class TableCache:
+    """
+    Read-through cache for catalog reads
+    One LRU per table so a write to a table only drops that table's entries
+    """
+    
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 2048, enabled: bool = True):
+        self.ttls = {**DB_CACHE_TTLS, **(ttls or {})}
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._tables: Dict[str, LRUCache] = {}
+    
+    @classmethod
+    def from_env(cls) -> "TableCache":
+        """ORBIT_DB_CACHE=0 bypasses the cache (e.g. in tests)"""
+        return cls(enabled=os.getenv("ORBIT_DB_CACHE", "1").lower() not in ("0", "false", "off"))
+    
+    def _table(self, table: str) -> LRUCache:
+        if table not in self._tables:
+            self._tables[table] = LRUCache(self.max_entries)
+        return self._tables[table]
+    
+    def get_or_load(self, table: str, key: Any, loader: Callable[[], Any]) -> Any:
+        if not self.enabled:
+            return loader()
+        
+        lru = self._table(table)
+        missing = object()
+        value = lru.get(key, missing)
+        if value is missing:
+            value = loader()
+            lru.put(key, value, ttl=self.ttls.get(table))
+        return value
+    
+    def invalidate(self, table: Optional[str] = None):
+        """Call after writing to a table (None drops everything)"""
+        if table is None:
+            for lru in self._tables.values():
+                lru.invalidate()
+            return
+        for t in [table] + TABLE_DEPENDENTS.get(table, []):
+            if t in self._tables:
+                self._tables[t].invalidate()
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Hit rate per table"""
+        report = {}
+        for table, lru in self._tables.items():
+            total = lru.hits + lru.misses
+            report[table] = {
+                "hits": lru.hits,
+                "misses": lru.misses,
+                "entries": len(lru),
+                "hit_rate": lru.hits / total if total else 0.0
+            }
+        return report
+
+
+PURCHASE_HISTORY_SELECT = '*, vendor_inventory(*, products(*), vendors(*))'
+# inner joins so a filter on the nested product drops the purchase row server-side
+PURCHASE_HISTORY_INNER_SELECT = '*, vendor_inventory!inner(*, products!inner(*), vendors(*))'
+
+# turn a purchase_history row (with nested inventory/product/vendor) into a model
+def to_enriched_purchase(row: dict) -> EnrichedPurchase:
+    return EnrichedPurchase(
+        purchase=Purchase(**{k: v for k, v in row.items() if k != 'vendor_inventory'}),
+        product=Product(**row['vendor_inventory']['products']),
+        vendor=Vendor(**row['vendor_inventory']['vendors']),
+        inventory=VendorInventory(**{k: v for k, v in row['vendor_inventory'].items() 
+                                    if k not in ['products', 'vendors']})
+    )
+
+# vendor_strategic_insights row (+ vendors join) -> VendorProfile
+def to_vendor_profile(row: dict) -> VendorProfile:
+    vendor = row.get('vendors') or {}
+    return VendorProfile(
+        vendor_id=row['vendor_id'],
+        vendor_name=vendor.get('vendor_name') or row['vendor_id'],
+        category_id=row['category_id'],
+        market_share=float(row['market_share']),
+        avg_conversion_rate=float(row['avg_conversion_rate']),
+        total_products=row['total_products'],
+        total_sales=row['total_sales'],
+        avg_customer_criteria=row['avg_customer_criteria'],
+        customer_segments=row['customer_segments'],
+        price_competitiveness_rank=row.get('price_competitiveness_rank'),
+        selection_rank=row.get('selection_rank')
+    )
+
+# product_aggregate_insights row (+ products join) -> ProductAggregateInsight
+def to_product_insight(row: dict) -> ProductAggregateInsight:
+    product = row.get('products') or {}
+    return ProductAggregateInsight(
+        product_id=row['product_id'],
+        product_name=product.get('product_name') or row['product_id'],
+        vendor_id=row['vendor_id'],
+        category_id=row['category_id'],
+        total_views=row['total_views'],
+        total_purchases=row['total_purchases'],
+        conversion_rate=float(row['conversion_rate']) if row.get('conversion_rate') is not None else None,
+        avg_criteria_weights=row['avg_criteria_weights'],
+        segment_breakdown=row.get('segment_breakdown') or {},
+        primary_segment=row.get('primary_segment') or 'unknown'
+    )
+
+
+class DatabaseBackend:
+    """
+    Storage interface behind Database
+    Every backend returns the same pydantic models and supports the same filters
+    """
+    
+    def get_user(self, user_id: str) -> Optional[User]:
+        raise NotImplementedError
+    
+    def get_user_purchase_history(self, user_id: str, category_id: Optional[str] = None,
+                                  start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                                  limit: Optional[int] = None, offset: int = 0) -> List[EnrichedPurchase]:
+        raise NotImplementedError
+    
+    def search_products(self, category_id: str, query: Optional[str] = None,
+                        brand: Optional[str] = None, max_price: Optional[float] = None) -> List[Product]:
+        raise NotImplementedError
+    
+    def get_product_inventory(self, product_id: str) -> List[tuple[VendorInventory, Vendor]]:
+        raise NotImplementedError
+    
+    def get_products_with_inventory(self, product_ids: List[str]) -> List[tuple[Product, List[tuple[VendorInventory, Vendor]]]]:
+        raise NotImplementedError
+    
+    def get_vendor_profile(self, vendor_id: str, category_id: str) -> Optional[VendorProfile]:
+        raise NotImplementedError
+    
+    def get_product_insights(self, vendor_id: str, category_id: str) -> List[ProductAggregateInsight]:
+        raise NotImplementedError
+    
+    def get_vendor_profiles(self, category_id: str) -> List[VendorProfile]:
+        raise NotImplementedError
+    
+    def save_strategy_rankings(self, rows: List[Dict]):
+        raise NotImplementedError
+    
+    # ----- aggregation pipeline (raw events in, aggregate rows out) -----
+    
+    def get_purchase_events(self, start: Optional[datetime], end: Optional[datetime],
+                            limit: int, offset: int = 0) -> List[Dict]:
+        """Flat purchase rows in [start, end): purchase_id, user_id, purchase_date, total_paid, product_id, vendor_id, category_id"""
+        raise NotImplementedError
+    
+    def get_view_events(self, start: Optional[datetime], end: Optional[datetime],
+                        limit: int, offset: int = 0) -> List[Dict]:
+        """Flat view rows in [start, end): event_id, user_id, viewed_at, product_id, vendor_id, category_id"""
+        raise NotImplementedError
+    
+    def get_criteria_preferences(self, user_ids: List[str]) -> List[Dict]:
+        raise NotImplementedError
+    
+    def get_product_aggregates(self, product_ids: List[str]) -> List[Dict]:
+        raise NotImplementedError
+    
+    def save_product_aggregates(self, rows: List[Dict]):
+        raise NotImplementedError
+    
+    def get_vendor_aggregates(self, category_ids: List[str]) -> List[Dict]:
+        raise NotImplementedError
+    
+    def save_vendor_aggregates(self, rows: List[Dict]):
+        raise NotImplementedError
+    
+    def get_vendor_catalog_stats(self, category_ids: List[str]) -> List[Dict]:
+        """Per (vendor, category): total_products (distinct listed products), avg_price (mean listed price)"""
+        raise NotImplementedError
+    
+    def get_last_computed(self, table: str) -> Optional[datetime]:
+        """Newest last_computed in an insights table (product_aggregate_insights / vendor_strategic_insights)"""
+        raise NotImplementedError
+    
+    def get_watermark(self, job_name: str) -> Optional[datetime]:
+        raise NotImplementedError
+    
+    def save_watermark(self, job_name: str, watermark: datetime):
+        raise NotImplementedError
+    
+    def get_preference_stats(self, user_id: str, category_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+    
+    def save_preference_stats(self, user_id: str, category_id: str, stats: Dict):
+        raise NotImplementedError
+
+
+class SupabaseBackend(DatabaseBackend):
+    """Hosted Postgres through the Supabase REST client"""
+    
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None):
+        from supabase import create_client
+        self.supabase = create_client(
+            url or os.getenv("SUPABASE_URL"),
+            key or os.getenv("SUPABASE_KEY")
         )
     
-    # get user by id
     def get_user(self, user_id: str) -> Optional[User]:
         result = self.supabase.table('users').select('*').eq('user_id', user_id).execute()
         if result.data:
             return User(**result.data[0])
         return None
     
-    # get all user purchases with full product/vendor details
-    def get_user_purchase_history(self, user_id: str, category_id: Optional[str] = None) -> List[EnrichedPurchase]:
-        # join purchases -> inventory -> products -> vendors
-        query = self.supabase.table('purchase_history').select(
-            '*, vendor_inventory(*, products(*), vendors(*))'
-        ).eq('user_id', user_id)
+    # category/date filters and pagination all run in postgres (offset only applies with a limit)
+    def get_user_purchase_history(self, user_id: str, category_id: Optional[str] = None,
+                                  start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                                  limit: Optional[int] = None, offset: int = 0) -> List[EnrichedPurchase]:
+        if category_id:
+            query = self.supabase.table('purchase_history').select(
+                PURCHASE_HISTORY_INNER_SELECT
+            ).eq('user_id', user_id).eq('vendor_inventory.products.category_id', category_id)
+        else:
+            query = self.supabase.table('purchase_history').select(
+                PURCHASE_HISTORY_SELECT
+            ).eq('user_id', user_id)
         
-        result = query.execute()
+        if start_date:
+            query = query.gte('purchase_date', start_date.isoformat())
+        if end_date:
+            query = query.lt('purchase_date', end_date.isoformat())
         
-        enriched = []
-        for row in result.data:
-            # filter by category if specified
-            if category_id and row['vendor_inventory']['products']['category_id'] != category_id:
-                continue
-                
-            enriched.append(EnrichedPurchase(
-                purchase=Purchase(**{k: v for k, v in row.items() if k != 'vendor_inventory'}),
-                product=Product(**row['vendor_inventory']['products']),
-                vendor=Vendor(**row['vendor_inventory']['vendors']),
-                inventory=VendorInventory(**{k: v for k, v in row['vendor_inventory'].items() 
-                                            if k not in ['products', 'vendors']})
-            ))
-        
-        return enriched
+        # stable order so pages don't overlap
+        query = query.order('purchase_date', desc=True).order('purchase_id')
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1)
+        
+        result = query.execute()
+        return [to_enriched_purchase(row) for row in result.data]
     
-    # search products by category and optional filters
     def search_products(self, category_id: str, query: Optional[str] = None, 
-                       brand: Optional[str] = None, max_price: Optional[float] = None) -> List[Product]:
+                        brand: Optional[str] = None, max_price: Optional[float] = None) -> List[Product]:
         q = self.supabase.table('products').select('*').eq('category_id', category_id)
         
         if brand:
@@ -58,7 +272,6 @@ class Database:
         result = q.execute()
         return [Product(**p) for p in result.data]
     
-    # get all inventory for a product (different vendors selling it)
     def get_product_inventory(self, product_id: str) -> List[tuple[VendorInventory, Vendor]]:
         result = self.supabase.table('vendor_inventory').select(
             '*, vendors(*)'
@@ -72,14 +285,410 @@ class Database:
         
         return inventory_list
     
-    # get multiple products with their inventory options
+    # one embedded select (products -> vendor_inventory -> vendors) instead of one query per product
     def get_products_with_inventory(self, product_ids: List[str]) -> List[tuple[Product, List[tuple[VendorInventory, Vendor]]]]:
-        products = self.supabase.table('products').select('*').in_('product_id', product_ids).execute()
+        rows = self.supabase.table('products').select(
+            '*, vendor_inventory(*, vendors(*))'
+        ).in_('product_id', product_ids).eq('vendor_inventory.is_available', True).execute()
         
         results = []
-        for p_data in products.data:
-            product = Product(**p_data)
-            inventory = self.get_product_inventory(product.product_id)
+        for p_data in rows.data:
+            inventory_rows = p_data.get('vendor_inventory') or []
+            product = Product(**{k: v for k, v in p_data.items() if k != 'vendor_inventory'})
+            inventory = [
+                (VendorInventory(**{k: v for k, v in row.items() if k != 'vendors'}), Vendor(**row['vendors']))
+                for row in inventory_rows
+            ]
             results.append((product, inventory))
+        return results
+    
+    def get_vendor_profile(self, vendor_id: str, category_id: str) -> Optional[VendorProfile]:
+        result = self.supabase.table('vendor_strategic_insights').select(
+            '*, vendors(*)'
+        ).eq('vendor_id', vendor_id).eq('category_id', category_id).execute()
+        return to_vendor_profile(result.data[0]) if result.data else None
+    
+    def get_product_insights(self, vendor_id: str, category_id: str) -> List[ProductAggregateInsight]:
+        result = self.supabase.table('product_aggregate_insights').select(
+            '*, products(*)'
+        ).eq('vendor_id', vendor_id).eq('category_id', category_id).execute()
+        return [to_product_insight(row) for row in result.data]
+    
+    def get_vendor_profiles(self, category_id: str, page_size: int = 1000) -> List[VendorProfile]:
+        # PostgREST caps rows per response, so page through the category
+        profiles, offset = [], 0
+        while True:
+            result = self.supabase.table('vendor_strategic_insights').select(
+                '*, vendors(*)'
+            ).eq('category_id', category_id).order('vendor_id').range(offset, offset + page_size - 1).execute()
+            profiles.extend(to_vendor_profile(row) for row in result.data)
+            if len(result.data) < page_size:
+                return profiles
+            offset += page_size
+    
+    def save_strategy_rankings(self, rows: List[Dict], chunk_size: int = 500):
+        for i in range(0, len(rows), chunk_size):
+            self.supabase.table('vendor_strategy_rankings').upsert(
+                rows[i:i + chunk_size], on_conflict='vendor_id,category_id,alternative_id'
+            ).execute()
+    
+    def get_purchase_events(self, start: Optional[datetime], end: Optional[datetime],
+                            limit: int, offset: int = 0) -> List[Dict]:
+        query = self.supabase.table('purchase_history').select(
+            'purchase_id, user_id, purchase_date, total_paid, '
+            'vendor_inventory!inner(product_id, vendor_id, products!inner(category_id))'
+        )
+        if start:
+            query = query.gte('purchase_date', start.isoformat())
+        if end:
+            query = query.lt('purchase_date', end.isoformat())
+        result = query.order('purchase_date').order('purchase_id').range(offset, offset + limit - 1).execute()
         
-        return results
\ No newline at end of file
+        events = []
+        for row in result.data:
+            inventory = row.pop('vendor_inventory')
+            events.append({
+                **row,
+                'product_id': inventory['product_id'],
+                'vendor_id': inventory['vendor_id'],
+                'category_id': inventory['products']['category_id']
+            })
+        return events
+    
+    def get_view_events(self, start: Optional[datetime], end: Optional[datetime],
+                        limit: int, offset: int = 0) -> List[Dict]:
+        query = self.supabase.table('product_view_events').select(
+            'event_id, user_id, viewed_at, product_id, vendor_id, products!inner(category_id)'
+        )
+        if start:
+            query = query.gte('viewed_at', start.isoformat())
+        if end:
+            query = query.lt('viewed_at', end.isoformat())
+        result = query.order('viewed_at').order('event_id').range(offset, offset + limit - 1).execute()
+        return [{**row, 'category_id': row.pop('products')['category_id']} for row in result.data]
+    
+    def get_criteria_preferences(self, user_ids: List[str]) -> List[Dict]:
+        result = self.supabase.table('user_criteria_preferences').select(
+            'user_id, category_id, criteria_weights, user_segment'
+        ).in_('user_id', user_ids).execute()
+        return result.data
+    
+    def get_product_aggregates(self, product_ids: List[str]) -> List[Dict]:
+        result = self.supabase.table('product_aggregate_insights').select('*').in_('product_id', product_ids).execute()
+        return result.data
+    
+    def save_product_aggregates(self, rows: List[Dict], chunk_size: int = 500):
+        for i in range(0, len(rows), chunk_size):
+            self.supabase.table('product_aggregate_insights').upsert(
+                rows[i:i + chunk_size], on_conflict='product_id,vendor_id'
+            ).execute()
+    
+    def get_vendor_aggregates(self, category_ids: List[str]) -> List[Dict]:
+        result = self.supabase.table('vendor_strategic_insights').select('*').in_('category_id', category_ids).execute()
+        return result.data
+    
+    def save_vendor_aggregates(self, rows: List[Dict], chunk_size: int = 500):
+        for i in range(0, len(rows), chunk_size):
+            self.supabase.table('vendor_strategic_insights').upsert(
+                rows[i:i + chunk_size], on_conflict='vendor_id,category_id'
+            ).execute()
+    
+    def get_vendor_catalog_stats(self, category_ids: List[str]) -> List[Dict]:
+        result = self.supabase.table('vendor_inventory').select(
+            'vendor_id, product_id, vendor_price, products!inner(category_id)'
+        ).in_('products.category_id', category_ids).execute()
+        
+        # no GROUP BY over PostgREST, reduce client side
+        listed: Dict[tuple, Dict[str, float]] = {}
+        for row in result.data:
+            key = (row['vendor_id'], row['products']['category_id'])
+            listed.setdefault(key, {})[row['product_id']] = float(row['vendor_price'])
+        return [
+            {'vendor_id': vendor_id, 'category_id': category_id,
+             'total_products': len(prices), 'avg_price': sum(prices.values()) / len(prices)}
+            for (vendor_id, category_id), prices in listed.items()
+        ]
+    
+    def get_last_computed(self, table: str) -> Optional[datetime]:
+        result = self.supabase.table(table).select('last_computed').order('last_computed', desc=True).limit(1).execute()
+        return datetime.fromisoformat(result.data[0]['last_computed']) if result.data and result.data[0]['last_computed'] else None
+    
+    def get_watermark(self, job_name: str) -> Optional[datetime]:
+        result = self.supabase.table('aggregation_watermarks').select('watermark').eq('job_name', job_name).execute()
+        return datetime.fromisoformat(result.data[0]['watermark']) if result.data else None
+    
+    def save_watermark(self, job_name: str, watermark: datetime):
+        self.supabase.table('aggregation_watermarks').upsert({
+            'job_name': job_name,
+            'watermark': watermark.isoformat(),
+            'updated_at': datetime.now().isoformat()
+        }, on_conflict='job_name').execute()
+    
+    def get_preference_stats(self, user_id: str, category_id: str) -> Optional[Dict]:
+        result = self.supabase.table('user_criteria_preferences').select(
+            'preference_stats'
+        ).eq('user_id', user_id).eq('category_id', category_id).execute()
+        return result.data[0]['preference_stats'] if result.data else None
+    
+    def save_preference_stats(self, user_id: str, category_id: str, stats: Dict):
+        # update first so existing criteria_weights / segment stay untouched
+        result = self.supabase.table('user_criteria_preferences').update(
+            {'preference_stats': stats, 'last_updated': datetime.now().isoformat()}
+        ).eq('user_id', user_id).eq('category_id', category_id).execute()
+        if not result.data:
+            self.supabase.table('user_criteria_preferences').insert({
+                'preference_id': f'pref_{user_id}_{category_id}',
+                'user_id': user_id,
+                'category_id': category_id,
+                'criteria_weights': {},
+                'preference_stats': stats
+            }).execute()
+
+
+def backend_from_env() -> DatabaseBackend:
+    """ORBIT_DB_BACKEND=sqlite runs against a local seeded database (ORBIT_SQLITE_PATH, default in-memory)"""
+    if os.getenv("ORBIT_DB_BACKEND", "supabase").lower() == "sqlite":
+        from sqlite_backend import SQLiteBackend
+        return SQLiteBackend(os.getenv("ORBIT_SQLITE_PATH", ":memory:"))
+    return SupabaseBackend()
+
+
+class Database:
+    """
+    What the agents and entry points talk to
+    Adds read-through caching and paging on top of a DatabaseBackend
+    """
+    
+    def __init__(self, cache: Optional[TableCache] = None, backend: Optional[DatabaseBackend] = None):
+        self.backend = backend if backend is not None else backend_from_env()
+        self.cache = cache if cache is not None else TableCache.from_env()
+    
+    # raw supabase client, only there when running on the supabase backend
+    @property
+    def supabase(self):
+        return getattr(self.backend, 'supabase', None)
+    
+    # drop cached reads after writing to a table
+    def invalidate(self, table: Optional[str] = None):
+        self.cache.invalidate(table)
+    
+    # get user by id
+    def get_user(self, user_id: str) -> Optional[User]:
+        return self.cache.get_or_load('users', ('get_user', user_id), lambda: self.backend.get_user(user_id))
+    
+    # get user purchases with full product/vendor details, newest first
+    # category/date filters and pagination are pushed down to the backend (offset only applies with a limit)
+    def get_user_purchase_history(self, user_id: str, category_id: Optional[str] = None,
+                                  start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                                  limit: Optional[int] = None, offset: int = 0) -> List[EnrichedPurchase]:
+        return self.backend.get_user_purchase_history(user_id, category_id, start_date, end_date, limit, offset)
+    
+    # stream purchase history page by page so the full history never sits in memory
+    def iter_user_purchase_history(self, user_id: str, category_id: Optional[str] = None,
+                                   start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                                   page_size: int = 500) -> Iterator[EnrichedPurchase]:
+        offset = 0
+        while True:
+            page = self.get_user_purchase_history(user_id, category_id, start_date, end_date,
+                                                  limit=page_size, offset=offset)
+            yield from page
+            if len(page) < page_size:
+                return
+            offset += page_size
+    
+    # search products by category and optional filters
+    def search_products(self, category_id: str, query: Optional[str] = None, 
+                       brand: Optional[str] = None, max_price: Optional[float] = None) -> List[Product]:
+        key = ('search_products', category_id, query, brand, max_price)
+        # copy so callers can filter the list without touching the cached one
+        return list(self.cache.get_or_load(
+            'products', key, lambda: self.backend.search_products(category_id, query, brand, max_price)))
+    
+    # prefilter index over a whole category, built once and dropped with the 'products' cache
+    def get_catalog_index(self, category_id: str) -> CatalogIndex:
+        return self.cache.get_or_load(
+            'products', ('catalog_index', category_id), lambda: CatalogIndex(self.search_products(category_id)))
+    
+    # get all inventory for a product (different vendors selling it)
+    def get_product_inventory(self, product_id: str) -> List[tuple[VendorInventory, Vendor]]:
+        return list(self.cache.get_or_load(
+            'vendor_inventory', ('get_product_inventory', product_id),
+            lambda: self.backend.get_product_inventory(product_id)))
+    
+    # get multiple products with their inventory options, one backend query per chunk
+    def get_products_with_inventory(self, product_ids: List[str],
+                                    chunk_size: Optional[int] = 200) -> List[tuple[Product, List[tuple[VendorInventory, Vendor]]]]:
+        if not product_ids:
+            return []
+        
+        # keep the URL length sane for very large id lists
+        step = chunk_size or len(product_ids)
+        chunks = [product_ids[i:i + step] for i in range(0, len(product_ids), step)]
+        
+        results = []
+        for chunk in chunks:
+            results.extend(self.cache.get_or_load(
+                'vendor_inventory', ('get_products_with_inventory', tuple(chunk)),
+                lambda: self.backend.get_products_with_inventory(chunk)))
+        
+        return results
+    
+    # vendor-level aggregates for the macro layer
+    def get_vendor_profile(self, vendor_id: str, category_id: str,
+                           vendor_name: Optional[str] = None) -> Optional[VendorProfile]:
+        profile = self.backend.get_vendor_profile(vendor_id, category_id)
+        if profile is not None and vendor_name:
+            profile.vendor_name = vendor_name
+        return profile
+    
+    # per-product aggregates for one vendor in one category
+    def get_product_insights(self, vendor_id: str, category_id: str) -> List[ProductAggregateInsight]:
+        return self.backend.get_product_insights(vendor_id, category_id)
+    
+    # every vendor profile in a category, one backend query (fleet mode)
+    def get_vendor_profiles(self, category_id: str) -> List[VendorProfile]:
+        return self.backend.get_vendor_profiles(category_id)
+    
+    # bulk upsert of fleet results (ORBITMacroAgent.strategy_ranking_rows)
+    def save_strategy_rankings(self, rows: List[Dict]):
+        if rows:
+            self.backend.save_strategy_rankings(rows)
+    
+    # raw events for the aggregation jobs, one page (list of flat dicts) at a time
+    def iter_purchase_events(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                             page_size: int = 5000) -> Iterator[List[Dict]]:
+        return self._iter_pages(self.backend.get_purchase_events, start, end, page_size)
+    
+    def iter_view_events(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                         page_size: int = 5000) -> Iterator[List[Dict]]:
+        return self._iter_pages(self.backend.get_view_events, start, end, page_size)
+    
+    @staticmethod
+    def _iter_pages(fetch: Callable, start, end, page_size: int) -> Iterator[List[Dict]]:
+        offset = 0
+        while True:
+            page = fetch(start, end, limit=page_size, offset=offset)
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            offset += page_size
+    
+    # stored criteria weights + segment for these users, all categories
+    def get_criteria_preferences(self, user_ids: List[str], chunk_size: int = 200) -> List[Dict]:
+        rows = []
+        for i in range(0, len(user_ids), chunk_size):
+            rows.extend(self.backend.get_criteria_preferences(user_ids[i:i + chunk_size]))
+        return rows
+    
+    # raw product_aggregate_insights rows (incl. partial_aggregates) for these products
+    def get_product_aggregates(self, product_ids: List[str], chunk_size: int = 200) -> List[Dict]:
+        rows = []
+        for i in range(0, len(product_ids), chunk_size):
+            rows.extend(self.backend.get_product_aggregates(product_ids[i:i + chunk_size]))
+        return rows
+    
+    def save_product_aggregates(self, rows: List[Dict]):
+        if rows:
+            self.backend.save_product_aggregates(rows)
+    
+    # raw vendor_strategic_insights rows (incl. partial_aggregates) for whole categories
+    def get_vendor_aggregates(self, category_ids: List[str]) -> List[Dict]:
+        return self.backend.get_vendor_aggregates(category_ids) if category_ids else []
+    
+    def save_vendor_aggregates(self, rows: List[Dict]):
+        if rows:
+            self.backend.save_vendor_aggregates(rows)
+    
+    def get_vendor_catalog_stats(self, category_ids: List[str]) -> List[Dict]:
+        return self.backend.get_vendor_catalog_stats(category_ids) if category_ids else []
+    
+    def get_watermark(self, job_name: str) -> Optional[datetime]:
+        return self.backend.get_watermark(job_name)
+    
+    # when the stored insight rows were last computed (seeded or by an earlier run), None if the table is empty
+    def get_last_computed(self, table: str) -> Optional[datetime]:
+        return self.backend.get_last_computed(table)
+    
+    def save_watermark(self, job_name: str, watermark: datetime):
+        self.backend.save_watermark(job_name, watermark)
+    
+    # running preference stats for (user, category), built from history once if never stored
+    def get_preference_stats(self, user_id: str, category_id: str, rebuild: bool = True) -> Optional[PreferenceStats]:
+        stored = self.backend.get_preference_stats(user_id, category_id)
+        if stored is not None:
+            return PreferenceStats.from_dict(stored)
+        return self.rebuild_preference_stats(user_id, category_id) if rebuild else None
+    
+    # recompute from the full category history (backfill / repair)
+    def rebuild_preference_stats(self, user_id: str, category_id: str) -> PreferenceStats:
+        stats = PreferenceStats.from_purchases(self.iter_user_purchase_history(user_id, category_id))
+        self.backend.save_preference_stats(user_id, category_id, stats.to_dict())
+        return stats
+    
+    # call once a purchase has been written: O(1) update of the stored stats
+    def record_purchase(self, purchase: EnrichedPurchase) -> PreferenceStats:
+        user_id, category_id = purchase.purchase.user_id, purchase.product.category_id
+        stored = self.backend.get_preference_stats(user_id, category_id)
+        if stored is None:
+            # first time: history already contains this purchase
+            return self.rebuild_preference_stats(user_id, category_id)
+        
+        stats = PreferenceStats.from_dict(stored)
+        stats.add_purchase(purchase)
+        self.backend.save_preference_stats(user_id, category_id, stats.to_dict())
+        return stats
+
+
+class AsyncDatabase:
+    """
+    Async twin of Database for the arun_query serving path
+    Create with: db = await AsyncDatabase.create()
+    Backends without an async client (ORBIT_DB_BACKEND=sqlite) run the sync Database in a worker thread
+    """
+    
+    def __init__(self, client=None, database: Optional[Database] = None):
+        self.supabase = client
+        self.database = database
+    
+    @classmethod
+    async def create(cls) -> "AsyncDatabase":
+        if os.getenv("ORBIT_DB_BACKEND", "supabase").lower() != "supabase":
+            return cls(database=Database())
+        from supabase import acreate_client
+        client = await acreate_client(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_KEY")
+        )
+        return cls(client)
+    
+    async def get_user_purchase_history(self, user_id: str, category_id: Optional[str] = None) -> List[EnrichedPurchase]:
+        if self.database is not None:
+            return await asyncio.to_thread(self.database.get_user_purchase_history, user_id, category_id)
+        if category_id:
+            query = self.supabase.table('purchase_history').select(
+                PURCHASE_HISTORY_INNER_SELECT
+            ).eq('user_id', user_id).eq('vendor_inventory.products.category_id', category_id)
+        else:
+            query = self.supabase.table('purchase_history').select(
+                PURCHASE_HISTORY_SELECT
+            ).eq('user_id', user_id)
+        
+        result = await query.order('purchase_date', desc=True).execute()
+        return [to_enriched_purchase(row) for row in result.data]
+    
+    async def search_products(self, category_id: str, query: Optional[str] = None,
+                              brand: Optional[str] = None, max_price: Optional[float] = None) -> List[Product]:
+        if self.database is not None:
+            return await asyncio.to_thread(self.database.search_products, category_id, query, brand, max_price)
+        q = self.supabase.table('products').select('*').eq('category_id', category_id)
+        
+        if brand:
+            q = q.eq('brand', brand)
+        if max_price:
+            q = q.lte('base_price', max_price)
+        if query:
+            q = q.ilike('product_name', f'%{query}%')
+        
+        result = await q.execute()
+        return [Product(**p) for p in result.data]
@@ -0,0 +1,298 @@
+"""
+PARALLEL EXECUTOR
+Shards batch jobs (fleet strategy refresh, nightly re-ranking) over a process pool
+Workers stay warm: one Database + one model client each, built once by the pool initializer
+Large numpy inputs travel through shared memory instead of being pickled into every task
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from models import VendorProfile
+from spec_scoring import ScoreMatrix
+
+# per-process state, filled by _init_worker
+_worker: Dict = {}
+
+
+class SharedArray:
+    """
+    ndarray backed by a SharedMemory block
+    Pickles as (name, shape, dtype) only, workers attach to the same memory without copying
+    The creating process owns the block and unlinks it (use as a context manager)
+    """
+
+    def __init__(self, name: str, shape: tuple, dtype: str):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._owner = False
+
+    @classmethod
+    def create(cls, array: np.ndarray) -> "SharedArray":
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared = cls(shm.name, array.shape, array.dtype.str)
+        shared._shm, shared._owner = shm, True
+        shared.array[...] = array
+        return shared
+
+    def _attach(self) -> shared_memory.SharedMemory:
+        if sys.version_info >= (3, 13):
+            return shared_memory.SharedMemory(name=self.name, track=False)
+        # pool workers (fork, spawn and forkserver alike) report to the owner's resource tracker,
+        # attaching re-registers a name it already holds; unregistering here would drop the owner's
+        # registration too (KeyError on unlink, and a crashed owner would leak the block)
+        return shared_memory.SharedMemory(name=self.name)
+
+    @property
+    def array(self) -> np.ndarray:
+        if self._shm is None:
+            self._shm = self._attach()
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    def __getstate__(self):
+        return (self.name, self.shape, self.dtype)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ----- worker side -----
+
+def _init_worker(env: Optional[Dict[str, str]], quiet: bool):
+    """Pool initializer: one Database and one model client per process, reused by every task"""
+    os.environ.update(env or {})
+    if quiet:
+        # agents narrate every step, keep the parent's progress lines readable
+        sys.stdout = open(os.devnull, "w")
+
+    from db import Database
+    from llm_provider import create_provider
+    _worker['db'] = Database()
+    _worker['provider'] = create_provider()
+
+
+def _micro_agent():
+    if 'micro' not in _worker:
+        from ahp_engine import ORBITAgent
+        _worker['micro'] = ORBITAgent(provider=_worker['provider'])
+    return _worker['micro']
+
+
+def _macro_agent():
+    if 'macro' not in _worker:
+        from macro_ahp_engine import ORBITMacroAgent
+        _worker['macro'] = ORBITMacroAgent(provider=_worker['provider'])
+    return _worker['macro']
+
+
+def _run_shard(task: Callable, index: int, *args) -> Dict:
+    """Run one shard, returning the error instead of raising so one bad shard doesn't sink the batch"""
+    start = time.perf_counter()
+    try:
+        result, error = task(*args), None
+    except Exception:
+        result, error = None, traceback.format_exc()
+    return {
+        'shard': index,
+        'pid': os.getpid(),
+        'seconds': time.perf_counter() - start,
+        'result': result,
+        'error': error
+    }
+
+
+def _fleet_shard(profiles: List[VendorProfile], write: bool) -> Dict:
+    agent = _macro_agent()
+    fleet = agent.run_fleet_analysis(profiles)
+    rows = agent.strategy_ranking_rows(fleet)
+    if write:
+        _worker['db'].save_strategy_rankings(rows)
+    return {
+        'items': len(profiles),
+        'top_strategy': {
+            vendor_id: fleet['alternatives'][ranking[0]]
+            for vendor_id, ranking in zip(fleet['vendor_ids'], fleet['rankings'])
+        },
+        'ranking_rows': [] if write else rows
+    }
+
+
+def _rerank_shard(requests: List[Dict], shared_scores: Dict[str, tuple], top_k: Optional[int]) -> Dict:
+    db = _worker['db']
+    agent = _micro_agent()
+
+    # stored running stats instead of shipping purchase histories to the worker
+    for r in requests:
+        if r.get('preference_stats') is None and r.get('purchase_history') is None:
+            r['preference_stats'] = db.get_preference_stats(r['user_id'], r['category_id'])
+
+    product_scores = {
+        category_id: ScoreMatrix(product_ids, criteria, shared.array)
+        for category_id, (product_ids, criteria, shared) in shared_scores.items()
+    }
+
+    def load_candidates(category_id: str):
+        products = db.search_products(category_id)
+        if category_id not in product_scores:
+            return products
+        # rows of the shared matrix fix the candidate order
+        scores = product_scores[category_id]
+        by_id = {p.product_id: p for p in products}
+        kept = [pid for pid in scores.product_ids if pid in by_id]
+        if len(kept) < len(scores):
+            # products that left the catalog since scoring: drop their rows (a copy, the shared block stays intact)
+            product_scores[category_id] = ScoreMatrix(kept, scores.criteria, scores.values[scores.rows(kept)])
+        return [by_id[pid] for pid in kept]
+
+    results = agent.run_query_batch(requests, load_candidates, top_k, product_scores=product_scores)
+    # ahp_matrices hold generators and shared-memory views, only send back the picklable part
+    summary = {
+        'items': len(requests),
+        'rankings': [(r['user_id'], r['query'], ranked, profile)
+                     for r, (ranked, profile, _) in zip(requests, results)]
+    }
+
+    # drop every view into the shared blocks before detaching from them
+    del results, product_scores
+    for _, _, shared in shared_scores.values():
+        shared.close()
+    return summary
+
+
+# ----- parent side -----
+
+class ParallelExecutor:
+    """
+    Process pool of warm ORBIT workers
+    env: extra environment for the workers (e.g. ORBIT_DB_BACKEND / ORBIT_SQLITE_PATH)
+    start_method: "fork", "spawn" or "forkserver" (default: the platform's), workers always share
+                  this process' resource tracker, so shared blocks are cleaned up if it crashes
+    """
+
+    def __init__(self, workers: Optional[int] = None, env: Optional[Dict[str, str]] = None, quiet: bool = True,
+                 start_method: Optional[str] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.start_method = start_method or multiprocessing.get_start_method()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(env, quiet),
+                                        mp_context=multiprocessing.get_context(self.start_method))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+    def map_shards(self, task: Callable, shards: List, *args, label: str = "shard") -> List[Dict]:
+        """Run task(shard, *args) for every shard, report progress/failures as shards finish"""
+        futures = {self.pool.submit(_run_shard, task, i, shard, *args): i for i, shard in enumerate(shards)}
+        outcomes: List[Optional[Dict]] = [None] * len(shards)
+
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:  # worker died (BrokenProcessPool) or result didn't unpickle
+                outcome = {'shard': index, 'pid': None, 'seconds': 0.0, 'result': None, 'error': repr(e)}
+            outcomes[index] = outcome
+
+            if outcome['error']:
+                print(f"   ❌ [{done}/{len(shards)}] {label} {index} failed: {outcome['error'].strip().splitlines()[-1]}")
+            else:
+                print(f"   ✅ [{done}/{len(shards)}] {label} {index}: {outcome['result']['items']} items "
+                      f"in {outcome['seconds']:.2f}s (pid {outcome['pid']})")
+
+        failed = sum(1 for o in outcomes if o['error'])
+        if failed:
+            print(f"   ⚠️  {failed}/{len(shards)} {label}s failed")
+        return outcomes
+
+    def run_fleet(self, vendor_profiles: List[VendorProfile], shard_size: int = 500,
+                  write: bool = True) -> List[Dict]:
+        """
+        Fleet strategy refresh sharded by vendor
+        write=True: each worker upserts its own rows (needs a shared backend, not ':memory:' sqlite)
+        write=False: rows come back in result['ranking_rows']
+        """
+        shards = [vendor_profiles[i:i + shard_size] for i in range(0, len(vendor_profiles), shard_size)]
+        print(f"\n🏭 Fleet refresh: {len(vendor_profiles)} vendors in {len(shards)} shards on {self.workers} workers")
+        return self.map_shards(_fleet_shard, shards, write, label="vendor shard")
+
+    def rerank_users(self, requests: List[Dict], product_scores: Optional[Dict[str, ScoreMatrix]] = None,
+                     shard_size: int = 200, top_k: Optional[int] = None) -> List[Dict]:
+        """
+        Nightly re-ranking sharded by user (all of a user's requests land in the same shard)
+        requests: [{"user_id", "query", "category_id"}], preference stats are loaded by the workers
+        product_scores: category_id -> ScoreMatrix scored once here, shared with every worker
+        """
+        by_user: Dict[str, List[Dict]] = {}
+        for r in requests:
+            by_user.setdefault(r['user_id'], []).append(r)
+        users = sorted(by_user)
+
+        shards, current = [], []
+        for user_id in users:
+            current.extend(by_user[user_id])
+            if len(current) >= shard_size:
+                shards.append(current)
+                current = []
+        if current:
+            shards.append(current)
+
+        shared = {
+            category_id: (scores.product_ids, scores.criteria, SharedArray.create(scores.values))
+            for category_id, scores in (product_scores or {}).items()
+        }
+        print(f"\n🔁 Re-ranking {len(requests)} requests for {len(users)} users in {len(shards)} shards "
+              f"on {self.workers} workers")
+        try:
+            return self.map_shards(_rerank_shard, shards, shared, top_k, label="user shard")
+        finally:
+            for _, _, block in shared.values():
+                block.close()
+
+
+def score_categories(agent, db, category_ids: List[str]) -> Dict[str, ScoreMatrix]:
+    """
+    Query-independent product scores per category (same pass run_query_batch does per group)
+    Computed once in the parent so workers don't each repeat the scoring LLM calls
+    """
+    from ahp_engine import CATEGORY_IDS
+    names = {category_id: name for name, category_id in CATEGORY_IDS.items()}
+
+    scores = {}
+    for category_id in category_ids:
+        category = names.get(category_id, category_id)
+        products = db.search_products(category_id)
+        if not products:
+            continue
+        criteria, cost_criteria = agent.get_criteria_set(category)
+        scores[category_id] = agent.score_products_relative(products, criteria, {'category': category}, {}, cost_criteria)
+    return scores
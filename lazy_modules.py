@@ -0,0 +1,52 @@
+"""
+LAZY MODULES
+Stand-ins for heavy imports (matplotlib, seaborn, pandas) that load on first attribute access
+Importing a visualizer costs nothing until a chart is actually drawn
+The shared plt / sns / pd proxies below are what the visualizers import, so styling is applied once per process
+"""
+
+import importlib
+import threading
+from typing import Callable, Optional
+
+
+class LazyModule:
+    """
+    plt = LazyModule("matplotlib.pyplot") then plt.subplots(...) as usual
+    on_load(module) runs once, right after the real import (e.g. global styling)
+    """
+
+    def __init__(self, name: str, on_load: Optional[Callable] = None):
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                module = importlib.import_module(self._name)
+                if self._on_load is not None:
+                    self._on_load(module)
+                self._module = module
+        return self._module
+
+    def __getattr__(self, attr: str):
+        # only reached for names not set in __init__, i.e. the real module's attributes
+        return getattr(self._module or self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def _apply_style(pyplot):
+    # set style (once, on the first chart drawn by any visualizer)
+    sns.set_style("whitegrid")
+    pyplot.rcParams['figure.figsize'] = (12, 8)
+
+
+# one proxy per library for every visualizer, a per-module proxy would load (and skip the style hook) on its own
+plt = LazyModule("matplotlib.pyplot", on_load=_apply_style)
+sns = LazyModule("seaborn")
+pd = LazyModule("pandas")
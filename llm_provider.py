@@ -0,0 +1,241 @@
+"""
+LLM PROVIDERS
+Everything the agents need from a model: prompt in, text out
+Gemini for real runs, record/replay and synthetic providers for offline runs and benchmarks
+"""
+
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from cache import normalize_prompt
+
+DEFAULT_FIXTURE_PATH = "fixtures/llm_responses.json"
+
+
+class LLMProvider:
+    """
+    Base provider
+    call_type ('parse_query', 'criteria_weights', ...) is passed through so
+    offline providers know which response schema the caller expects
+    """
+
+    name = "provider"
+
+    def generate(self, prompt: str, call_type: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str, call_type: Optional[str] = None) -> str:
+        # default: run the blocking call off the event loop
+        return await asyncio.to_thread(self.generate, prompt, call_type)
+
+
+class GeminiProvider(LLMProvider):
+    """google.generativeai, imported and configured on first use"""
+
+    def __init__(self, model_name: str = "gemini-2.5-flash", api_key: Optional[str] = None):
+        self.name = model_name
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key or os.getenv("GEMINI_API_KEY"))
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt: str, call_type: Optional[str] = None) -> str:
+        return self.model.generate_content(prompt).text
+
+    async def agenerate(self, prompt: str, call_type: Optional[str] = None) -> str:
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+
+class RecordReplayProvider(LLMProvider):
+    """
+    Captures responses from another provider into a JSON fixture keyed by prompt hash
+
+    mode='record': always call the inner provider and save the response
+    mode='replay': serve from the fixture only, a missing prompt raises KeyError
+    mode='auto':   replay when recorded, otherwise record
+    """
+
+    def __init__(self, path: str = DEFAULT_FIXTURE_PATH, inner: Optional[LLMProvider] = None,
+                 mode: str = "replay"):
+        if mode not in ("record", "replay", "auto"):
+            raise ValueError(f"Unknown mode '{mode}', use record, replay or auto")
+        if mode != "replay" and inner is None:
+            raise ValueError(f"mode '{mode}' needs an inner provider to record from")
+        self.path = path
+        self.inner = inner
+        self.mode = mode
+        self.name = inner.name if inner is not None else "replay"
+        self._lock = threading.Lock()
+        self.fixtures: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.fixtures = json.load(f)
+
+    def _lookup(self, prompt: str, call_type: Optional[str]) -> Optional[str]:
+        if self.mode == "record":
+            return None
+        entry = self.fixtures.get(prompt_hash(prompt))
+        if entry is not None:
+            return entry["response"]
+        if self.mode == "replay":
+            raise KeyError(f"No recorded response for {call_type or 'prompt'} ({prompt_hash(prompt)[:12]}) in {self.path}")
+        return None
+
+    def _record(self, prompt: str, call_type: Optional[str], text: str):
+        with self._lock:
+            self.fixtures[prompt_hash(prompt)] = {"call_type": call_type, "response": text}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.fixtures, f, indent=2, sort_keys=True)
+
+    def generate(self, prompt: str, call_type: Optional[str] = None) -> str:
+        text = self._lookup(prompt, call_type)
+        if text is None:
+            text = self.inner.generate(prompt, call_type)
+            self._record(prompt, call_type, text)
+        return text
+
+    async def agenerate(self, prompt: str, call_type: Optional[str] = None) -> str:
+        text = self._lookup(prompt, call_type)
+        if text is None:
+            text = await self.inner.agenerate(prompt, call_type)
+            self._record(prompt, call_type, text)
+        return text
+
+
+# keyword -> parsed category for synthetic query parsing
+SYNTHETIC_CATEGORIES = {
+    "laptop": "laptops",
+    "notebook": "laptops",
+    "phone": "smartphones",
+    "coffee": "coffee",
+    "espresso": "coffee",
+    "sneaker": "sneakers",
+    "shoe": "sneakers",
+    "running": "sneakers"
+}
+
+SYNTHETIC_USE_CASES = ["gaming", "work", "school", "travel", "running", "casual"]
+
+
+class SyntheticProvider(LLMProvider):
+    """
+    No model at all: returns schema-valid JSON for each call type
+    Output is deterministic per (seed, prompt), latency is simulated
+    """
+
+    name = "synthetic"
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.seed = seed
+        self.calls = 0
+
+    def _rng(self, prompt: str) -> random.Random:
+        return random.Random(f"{self.seed}:{prompt_hash(prompt)}")
+
+    def _delay(self, rng: random.Random) -> float:
+        return max(self.latency + rng.uniform(-self.jitter, self.jitter), 0.0)
+
+    @staticmethod
+    def _criteria(prompt: str) -> list:
+        match = re.search(r"CRITERIA:\s*(\[.*?\])", prompt)
+        return ast.literal_eval(match.group(1)) if match else []
+
+    def _parse_query(self, prompt: str, rng: random.Random) -> Dict:
+        match = re.search(r'Query:\s*"(.*?)"', prompt, re.S)
+        query = (match.group(1) if match else "").lower()
+        category = next((c for k, c in SYNTHETIC_CATEGORIES.items() if k in query), "general")
+        budget = re.search(r"\$?\b(\d{2,6})\b", query)
+        return {
+            "category": category,
+            "budget_max": float(budget.group(1)) if budget else None,
+            "budget_min": None,
+            "use_case": next((u for u in SYNTHETIC_USE_CASES if u in query), "general"),
+            "must_have_features": [],
+            "preferences": [],
+            "brand_preference": None
+        }
+
+    def _criteria_weights(self, prompt: str, rng: random.Random) -> Dict:
+        criteria = self._criteria(prompt)
+        raw = [rng.random() + 0.1 for _ in criteria]
+        total = sum(raw) or 1.0
+        return {
+            "weights": {c: w / total for c, w in zip(criteria, raw)},
+            "reasoning": "synthetic weights"
+        }
+
+    def _product_scores(self, prompt: str, rng: random.Random) -> Dict:
+        criteria = self._criteria(prompt)
+        product_ids = re.findall(r'"product_id":\s*"([^"]+)"', prompt)
+        return {
+            "scores": {pid: {c: round(rng.random(), 3) for c in criteria} for pid in product_ids},
+            "reasoning": "synthetic scores"
+        }
+
+    def _respond(self, prompt: str, call_type: Optional[str], rng: random.Random) -> str:
+        self.calls += 1
+        builders = {
+            "parse_query": self._parse_query,
+            "criteria_weights": self._criteria_weights,
+            "product_scores": self._product_scores
+        }
+        if call_type in builders:
+            return json.dumps(builders[call_type](prompt, rng))
+        return f"Synthetic {call_type or 'response'} ({len(prompt)} prompt chars)."
+
+    def generate(self, prompt: str, call_type: Optional[str] = None) -> str:
+        rng = self._rng(prompt)
+        delay = self._delay(rng)
+        if delay:
+            time.sleep(delay)
+        return self._respond(prompt, call_type, rng)
+
+    async def agenerate(self, prompt: str, call_type: Optional[str] = None) -> str:
+        rng = self._rng(prompt)
+        delay = self._delay(rng)
+        if delay:
+            await asyncio.sleep(delay)
+        return self._respond(prompt, call_type, rng)
+
+
+def create_provider(model_name: str = "gemini-2.5-flash", kind: Optional[str] = None) -> LLMProvider:
+    """
+    ORBIT_LLM_PROVIDER picks the provider:
+    gemini (default), synthetic, replay, record, auto (record/replay against ORBIT_LLM_FIXTURES)
+    ORBIT_LLM_LATENCY sets the simulated latency (seconds) for synthetic
+    """
+    kind = (kind or os.getenv("ORBIT_LLM_PROVIDER", "gemini")).lower()
+    if kind == "gemini":
+        return GeminiProvider(model_name)
+    if kind == "synthetic":
+        return SyntheticProvider(latency=float(os.getenv("ORBIT_LLM_LATENCY", "0")))
+    if kind in ("replay", "record", "auto"):
+        path = os.getenv("ORBIT_LLM_FIXTURES", DEFAULT_FIXTURE_PATH)
+        inner = GeminiProvider(model_name) if kind != "replay" else None
+        return RecordReplayProvider(path, inner=inner, mode=kind)
+    raise ValueError(f"Unknown ORBIT_LLM_PROVIDER '{kind}'")
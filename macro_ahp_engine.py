@@ -4,17 +4,51 @@ Vendor strategic analysis using AHP
 Uses Gemini (not Claude!) for narrative generation
 """
 
-import google.generativeai as genai
+import operator
 import numpy as np
-import os
 from typing import Dict, List, Tuple, Optional
 from models import (
     VendorProfile, StrategicAlternative, StrategicCriteria,
     RankedAlternative, BOCRAnalysis
 )
+from cache import LLMResponseCache, generate_cached
+from llm_provider import LLMProvider, create_provider
+from timing import StageTimer
+from priority_solver import solve_priorities
+
+# vendor-profile signals the comparison rules can test
+COMPARISON_SIGNALS = {
+    "price_sensitivity": lambda vp: vp.avg_customer_criteria.get('price', 0),
+    "budget_segment": lambda vp: vp.customer_segments.get('budget_conscious', 0),
+    "premium_segment": lambda vp: vp.customer_segments.get('premium_buyer', 0) + vp.customer_segments.get('brand_loyal', 0)
+}
+
+COMPARISON_OPS = {">": operator.gt, "<": operator.lt, ">=": operator.ge, "<=": operator.le}
+
+# criterion -> [(signal, op, threshold, {alternative: score})]; signal None = always applies
+# every matching rule multiplies into the alternatives' scores (unlisted alternatives score 1)
+# the comparison matrix is score_i / score_j, so it is reciprocal by construction
+# criteria without rules (competitive_position) compare everything as equal
+COMPARISON_RULES = {
+    "market_demand": [
+        ("price_sensitivity", ">", 0.3, {"expand_budget": 5, "optimize_midrange": 5 / 3,
+                                         "improve_logistics": 2.5, "increase_selection": 2.5}),
+        ("price_sensitivity", "<", 0.15, {"expand_premium": 5, "optimize_midrange": 5 / 3,
+                                          "improve_logistics": 2.5, "increase_selection": 2.5})
+    ],
+    "segment_opportunity": [
+        ("budget_segment", ">", 0.5, {"expand_budget": 4}),
+        ("premium_segment", ">", 0.4, {"expand_premium": 4})
+    ],
+    "financial_impact": [
+        # midrange 3x everything else; premium keeps a small edge over budget and the rest
+        (None, None, None, {"optimize_midrange": 3, "expand_premium": 1.25})
+    ],
+    "operational_feasibility": [
+        (None, None, None, {"improve_logistics": 3, "increase_selection": 3})
+    ]
+}
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 class ORBITMacroAgent:
     """
@@ -22,8 +56,17 @@ class ORBITMacroAgent:
     Analyzes aggregated user behavior → recommends vendor strategies
     """
     
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+    def __init__(self, model_name: str = 'gemini-2.5-flash', cache: Optional[LLMResponseCache] = None,
+                 provider: Optional[LLMProvider] = None, priority_method: str = "power"):
+        self.model_name = model_name
+        self.priority_method = priority_method  # "power" or "geometric", see priority_solver
+        self.provider = provider if provider is not None else create_provider(model_name)
+        self.cache = cache if cache is not None else LLMResponseCache.from_env()
+        self.timer = StageTimer()  # per-stage wall time, read by benchmark.py
+    
+    def generate(self, call_type: str, prompt: str) -> str:
+        """Free-form model call (cached), for prompts built outside the agent"""
+        return generate_cached(self.cache, self.provider, self.provider.name, None, call_type, prompt)
     
     def run_strategic_analysis(
         self,
@@ -34,51 +77,63 @@ class ORBITMacroAgent:
         Main analysis - same pattern as micro run_query
         """
         # Define alternatives
-        alternatives = self._define_alternatives(vendor_profile.category_id)
+        with self.timer.stage("alternatives"):
+            alternatives = self._define_alternatives(vendor_profile.category_id)
         
         # Derive criteria from aggregated user behavior
-        criteria = self._derive_criteria(vendor_profile)
+        with self.timer.stage("criteria_derivation"):
+            criteria = self._derive_criteria(vendor_profile)
         
         # Build AHP matrices
         comparison_matrices = {}
         priority_vectors = {}
         consistency_ratios = {}
         
-        for criterion in criteria:
-            matrix = self._build_comparison_matrix(alternatives, criterion, vendor_profile)
-            priorities, cr = self._calculate_priorities(matrix)
-            
+        with self.timer.stage("comparison_matrices"):
+            matrices = np.stack([
+                self._build_comparison_matrix(alternatives, criterion, vendor_profile)
+                for criterion in criteria
+            ])
+        
+        # one batched solve over the stacked (k, n, n) matrices
+        with self.timer.stage("priorities"):
+            all_priorities, crs = solve_priorities(matrices, self.priority_method)
+        
+        for criterion, matrix, priorities, cr in zip(criteria, matrices, all_priorities, crs):
             comparison_matrices[criterion.criteria_name] = matrix.tolist()
             priority_vectors[criterion.criteria_name] = priorities.tolist()
-            consistency_ratios[criterion.criteria_name] = cr
+            consistency_ratios[criterion.criteria_name] = float(cr)
         
         # Calculate final scores
-        final_scores = np.zeros(len(alternatives))
-        for criterion in criteria:
-            priorities = np.array(priority_vectors[criterion.criteria_name])
-            final_scores += criterion.weight * priorities
+        with self.timer.stage("aggregation"):
+            final_scores = np.zeros(len(alternatives))
+            for criterion in criteria:
+                priorities = np.array(priority_vectors[criterion.criteria_name])
+                final_scores += criterion.weight * priorities
         
         # Rank
-        ranked_indices = np.argsort(final_scores)[::-1]
+        with self.timer.stage("ranking"):
+            ranked_indices = np.argsort(final_scores)[::-1]
         
         ranked_alternatives = []
-        for i, idx in enumerate(ranked_indices):
-            alt = alternatives[idx]
-            breakdown = {
-                c.criteria_name: priority_vectors[c.criteria_name][idx] * c.weight
-                for c in criteria
-            }
-            
-            ranked_alternatives.append(RankedAlternative(
-                rank=i + 1,
-                alternative=alt,
-                ahp_score=final_scores[idx],
-                criteria_scores={
-                    c.criteria_name: priority_vectors[c.criteria_name][idx]
+        with self.timer.stage("model_construction"):
+            for i, idx in enumerate(ranked_indices):
+                alt = alternatives[idx]
+                breakdown = {
+                    c.criteria_name: priority_vectors[c.criteria_name][idx] * c.weight
                     for c in criteria
-                },
-                score_breakdown=breakdown
-            ))
+                }
+                
+                ranked_alternatives.append(RankedAlternative(
+                    rank=i + 1,
+                    alternative=alt,
+                    ahp_score=final_scores[idx],
+                    criteria_scores={
+                        c.criteria_name: priority_vectors[c.criteria_name][idx]
+                        for c in criteria
+                    },
+                    score_breakdown=breakdown
+                ))
         
         # AHP matrices dict
         ahp_matrices = {
@@ -99,6 +154,76 @@ class ORBITMacroAgent:
         
         return ranked_alternatives, criteria, ahp_matrices
     
+    def run_fleet_analysis(self, vendor_profiles: List[VendorProfile]) -> Dict:
+        """
+        run_strategic_analysis for every vendor of one category in one pass
+        Comparison matrices for all vendors are stacked into one (V * k, n, n) tensor and
+        solved in a single batched call; no narrative / BOCR, just the rankings
+        
+        Returns arrays indexed [vendor, criterion, alternative]: priorities (V, k, n),
+        consistency_ratios (V, k), criteria_weights (V, k), final_scores (V, n), rankings (V, n)
+        """
+        if not vendor_profiles:
+            return {'vendor_ids': [], 'alternatives': [], 'criteria': []}
+        
+        with self.timer.stage("alternatives"):
+            alternatives = self._define_alternatives(vendor_profiles[0].category_id)
+        
+        with self.timer.stage("criteria_derivation"):
+            derived = [self._derive_criteria(vp) for vp in vendor_profiles]
+            criteria_names = [c.criteria_name for c in derived[0]]
+            weights = np.array([[c.weight for c in criteria] for criteria in derived])
+        
+        # (V, k, n) alternative scores -> (V, k, n, n) outer ratios
+        with self.timer.stage("comparison_matrices"):
+            scores = np.array([
+                [self._alternative_scores(alternatives, name, vp) for name in criteria_names]
+                for vp in vendor_profiles
+            ])
+            matrices = scores[..., :, None] / scores[..., None, :]
+        
+        v, k, n = scores.shape
+        with self.timer.stage("priorities"):
+            priorities, crs = solve_priorities(matrices.reshape(v * k, n, n), self.priority_method)
+            priorities, crs = priorities.reshape(v, k, n), crs.reshape(v, k)
+        
+        with self.timer.stage("aggregation"):
+            final_scores = np.einsum('vk,vkn->vn', weights, priorities)
+        
+        with self.timer.stage("ranking"):
+            rankings = np.argsort(-final_scores, axis=1, kind="stable")
+        
+        return {
+            'vendor_ids': [vp.vendor_id for vp in vendor_profiles],
+            'category_id': vendor_profiles[0].category_id,
+            'alternatives': [alt.name for alt in alternatives],
+            'alternative_ids': [alt.alternative_id for alt in alternatives],
+            'criteria': criteria_names,
+            'criteria_weights': weights,
+            'priorities': priorities,
+            'consistency_ratios': crs,
+            'final_scores': final_scores,
+            'rankings': rankings
+        }
+    
+    def strategy_ranking_rows(self, fleet: Dict) -> List[Dict]:
+        """Fleet results as vendor_strategy_rankings rows (db.save_strategy_rankings)"""
+        rows = []
+        for v, vendor_id in enumerate(fleet['vendor_ids']):
+            for rank, idx in enumerate(fleet['rankings'][v], 1):
+                rows.append({
+                    'vendor_id': vendor_id,
+                    'category_id': fleet['category_id'],
+                    'alternative_id': fleet['alternative_ids'][idx],
+                    'strategy_rank': rank,
+                    'ahp_score': float(fleet['final_scores'][v, idx]),
+                    'criteria_scores': {
+                        name: float(fleet['priorities'][v, c, idx])
+                        for c, name in enumerate(fleet['criteria'])
+                    }
+                })
+        return rows
+    
     def _define_alternatives(self, category_id: str) -> List[StrategicAlternative]:
         """Strategic options vendors can pursue"""
         alternatives = [
@@ -204,100 +329,28 @@ class ORBITMacroAgent:
         criterion: StrategicCriteria,
         vendor_profile: VendorProfile
     ) -> np.ndarray:
-        """Build pairwise comparison matrix"""
-        n = len(alternatives)
-        matrix = np.ones((n, n))
-        
-        avg_weights = vendor_profile.avg_customer_criteria
-        segments = vendor_profile.customer_segments
-        
-        if criterion.criteria_name == "market_demand":
-            price_sensitivity = avg_weights.get('price', 0)
-            
-            for i in range(n):
-                for j in range(n):
-                    if i == j:
-                        continue
-                    
-                    alt_i = alternatives[i].name
-                    alt_j = alternatives[j].name
-                    
-                    if alt_i == "expand_budget" and price_sensitivity > 0.3:
-                        if alt_j == "expand_premium":
-                            matrix[i][j] = 5
-                        elif alt_j == "optimize_midrange":
-                            matrix[i][j] = 3
-                        else:
-                            matrix[i][j] = 2
-                    elif alt_i == "expand_premium" and price_sensitivity < 0.15:
-                        if alt_j == "expand_budget":
-                            matrix[i][j] = 5
-                        elif alt_j == "optimize_midrange":
-                            matrix[i][j] = 3
-                        else:
-                            matrix[i][j] = 2
-                    elif matrix[j][i] != 1:
-                        matrix[i][j] = 1 / matrix[j][i]
-        
-        elif criterion.criteria_name == "segment_opportunity":
-            budget_segment = segments.get('budget_conscious', 0)
-            premium_segment = segments.get('premium_buyer', 0) + segments.get('brand_loyal', 0)
-            
-            for i in range(n):
-                for j in range(n):
-                    if i == j:
-                        continue
-                    alt_i = alternatives[i].name
-                    if alt_i == "expand_budget" and budget_segment > 0.5:
-                        matrix[i][j] = 4
-                    elif alt_i == "expand_premium" and premium_segment > 0.4:
-                        matrix[i][j] = 4
-                    elif matrix[j][i] != 1:
-                        matrix[i][j] = 1 / matrix[j][i]
-        
-        elif criterion.criteria_name == "financial_impact":
-            for i in range(n):
-                for j in range(n):
-                    if i == j:
-                        continue
-                    alt_i = alternatives[i].name
-                    alt_j = alternatives[j].name
-                    if alt_i == "expand_premium" and alt_j == "expand_budget":
-                        matrix[i][j] = 5
-                    elif alt_i == "optimize_midrange":
-                        matrix[i][j] = 3
-                    elif matrix[j][i] != 1:
-                        matrix[i][j] = 1 / matrix[j][i]
-        
-        elif criterion.criteria_name == "operational_feasibility":
-            for i in range(n):
-                for j in range(n):
-                    if i == j:
-                        continue
-                    alt_i = alternatives[i].name
-                    if alt_i in ["improve_logistics", "increase_selection"]:
-                        matrix[i][j] = 3
-                    elif matrix[j][i] != 1:
-                        matrix[i][j] = 1 / matrix[j][i]
-        
-        return matrix
+        """Build pairwise comparison matrix from COMPARISON_RULES (outer ratio of alternative scores)"""
+        scores = self._alternative_scores(alternatives, criterion.criteria_name, vendor_profile)
+        return scores[:, None] / scores[None, :]
     
-    def _calculate_priorities(self, matrix: np.ndarray) -> Tuple[np.ndarray, float]:
-        """Calculate priority vector using eigenvalue method"""
-        eigenvalues, eigenvectors = np.linalg.eig(matrix)
-        max_eigenvalue_idx = np.argmax(eigenvalues.real)
-        principal_eigenvector = eigenvectors[:, max_eigenvalue_idx].real
-        priorities = principal_eigenvector / principal_eigenvector.sum()
-        
-        # Consistency ratio
-        n = len(matrix)
-        lambda_max = eigenvalues[max_eigenvalue_idx].real
-        ci = (lambda_max - n) / (n - 1)
-        ri_values = [0, 0, 0.58, 0.9, 1.12, 1.24, 1.32, 1.41, 1.45, 1.49]
-        ri = ri_values[n-1] if n <= 10 else 1.49
-        cr = ci / ri if ri > 0 else 0
-        
-        return priorities, cr
+    def _alternative_scores(
+        self,
+        alternatives: List[StrategicAlternative],
+        criteria_name: str,
+        vendor_profile: VendorProfile
+    ) -> np.ndarray:
+        """Preference score per alternative for one criterion"""
+        index = {alt.name: i for i, alt in enumerate(alternatives)}
+        scores = np.ones(len(alternatives))
+        
+        for signal, op, threshold, rule_scores in COMPARISON_RULES.get(criteria_name, []):
+            if signal is not None and not COMPARISON_OPS[op](COMPARISON_SIGNALS[signal](vendor_profile), threshold):
+                continue
+            for name, score in rule_scores.items():
+                if name in index:
+                    scores[index[name]] *= score
+        
+        return scores
     
     def generate_bocr(
         self,
@@ -409,5 +462,4 @@ Products: {vendor_profile.total_products}
 
 Be specific and actionable."""
         
-        response = self.model.generate_content(prompt)
-        return response.text
\ No newline at end of file
+        return self.generate("strategic_narrative", prompt)
\ No newline at end of file
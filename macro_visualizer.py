@@ -3,16 +3,14 @@ MACRO VISUALIZER
 Add to your existing visualizer setup
 """
 
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
-import pandas as pd
 from typing import Dict, List
 from models import RankedAlternative, VendorProfile, StrategicCriteria, BOCRAnalysis
+from chart_cache import cached_chart
+# loaded on the first chart, styled once
+from lazy_modules import plt, sns, pd
 import os
 
-sns.set_style("whitegrid")
-
 class ORBITMacroVisualizer:
     """Visualizations for vendor strategy"""
     
@@ -20,7 +18,9 @@ class ORBITMacroVisualizer:
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
     
-    def plot_final_rankings(self, ranked_alternatives: List[RankedAlternative], vendor_name: str):
+    @cached_chart
+    def plot_final_rankings(self, ranked_alternatives: List[RankedAlternative], vendor_name: str,
+                            dpi: int = 300, fmt: str = "png"):
         """Bar chart of strategic alternatives"""
         alternatives = [a.alternative.name for a in ranked_alternatives]
         scores = [a.ahp_score for a in ranked_alternatives]
@@ -42,11 +42,15 @@ class ORBITMacroVisualizer:
         bars[0].set_linewidth(3)
         
         plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/{vendor_name}_rankings.png', dpi=300, bbox_inches='tight')
+        filename = f'{self.output_dir}/{vendor_name}_rankings.{fmt}'
+        plt.savefig(filename, dpi=dpi, bbox_inches='tight')
         plt.close()
-        print(f"   📊 Saved: {vendor_name}_rankings.png")
+        print(f"   📊 Saved: {os.path.basename(filename)}")
+        return filename
     
-    def plot_bocr_analysis(self, bocr: BOCRAnalysis, vendor_name: str):
+    @cached_chart
+    def plot_bocr_analysis(self, bocr: BOCRAnalysis, vendor_name: str,
+                           dpi: int = 300, fmt: str = "png"):
         """BOCR quadrants"""
         fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(14, 10))
         
@@ -77,11 +81,15 @@ class ORBITMacroVisualizer:
         plt.suptitle(f'{vendor_name} - BOCR Analysis\n{bocr.alternative_name}',
                     fontsize=16, fontweight='bold')
         plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/{vendor_name}_bocr.png', dpi=300, bbox_inches='tight')
+        filename = f'{self.output_dir}/{vendor_name}_bocr.{fmt}'
+        plt.savefig(filename, dpi=dpi, bbox_inches='tight')
         plt.close()
-        print(f"   📊 Saved: {vendor_name}_bocr.png")
+        print(f"   📊 Saved: {os.path.basename(filename)}")
+        return filename
     
-    def plot_customer_segments(self, vendor_profile: VendorProfile, vendor_name: str):
+    @cached_chart
+    def plot_customer_segments(self, vendor_profile: VendorProfile, vendor_name: str,
+                               dpi: int = 300, fmt: str = "png"):
         """Customer base composition"""
         fig, ax = plt.subplots(figsize=(10, 6))
         
@@ -99,6 +107,8 @@ class ORBITMacroVisualizer:
         
         plt.xticks(rotation=45, ha='right')
         plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/{vendor_name}_segments.png', dpi=300, bbox_inches='tight')
+        filename = f'{self.output_dir}/{vendor_name}_segments.{fmt}'
+        plt.savefig(filename, dpi=dpi, bbox_inches='tight')
         plt.close()
-        print(f"   📊 Saved: {vendor_name}_segments.png")
\ No newline at end of file
+        print(f"   📊 Saved: {os.path.basename(filename)}")
+        return filename
@@ -1,11 +1,70 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from db import Database
+from db import Database, AsyncDatabase
 from ahp_engine import ORBITAgent
 from visualizer import ORBITVisualizer
+from render_queue import RenderQueue
+from sensitivity import analyze_sensitivity
+import asyncio
 import json
 
+# visualizations plot at most 15 products, no need to build more RankedProducts than that
+TOP_K = 15
+
+# demo queries - different users with different needs
+DEMO_SCENARIOS = [
+    {
+        "user_id": "usr_001",
+        "username": "budget_bob",
+        "query": "I need a cheap laptop for basic work and browsing under $800",
+        "category": "cat_laptops",
+        "description": "Price-sensitive buyer, always chooses budget tier"
+    },
+    {
+        "user_id": "usr_002",
+        "username": "performance_paula",
+        "query": "Best laptop for gaming and video editing, need RTX graphics",
+        "category": "cat_laptops",
+        "description": "Performance-focused, willing to pay premium"
+    },
+    {
+        "user_id": "usr_003",
+        "username": "apple_andy",
+        "query": "Looking for a MacBook for college, good battery life",
+        "category": "cat_laptops",
+        "description": "100% Apple ecosystem loyalty"
+    },
+    {
+        "user_id": "usr_008",
+        "username": "runner_rachel",
+        "query": "Need running shoes with great cushioning for marathons",
+        "category": "cat_sneakers",
+        "description": "Running shoe specialist, buys frequently"
+    },
+    {
+        "user_id": "usr_007",
+        "username": "coffee_connoisseur_carlos",
+        "query": "Looking for premium single origin coffee, prefer light roast",
+        "category": "cat_coffee",
+        "description": "Coffee enthusiast, only buys premium beans"
+    },
+    {
+        "user_id": "usr_001",
+        "username": "budget_bob",  
+        "query": "cheap running shoes under $100 for gym",
+        "category": "cat_sneakers",
+        "description": "Same user (Bob) but different category - shows cross-category price sensitivity"
+    },
+    {
+        "user_id": "usr_002",
+        "username": "performance_paula",
+        "query": "flagship smartphone with best camera for content creation",
+        "category": "cat_phones",
+        "description": "Same user (Paula) - consistently prioritizes specs across categories"
+    }
+]
+
 def demo_orbit_system():
     """
     Query-driven ORBIT demo
@@ -21,61 +80,10 @@ def demo_orbit_system():
     db = Database()
     agent = ORBITAgent()
     viz = ORBITVisualizer()
+    # charts render in the background while the next query runs
+    render_queue = RenderQueue()
     
-    # demo queries - different users with different needs
-    demo_scenarios = [
-        {
-            "user_id": "usr_001",
-            "username": "budget_bob",
-            "query": "I need a cheap laptop for basic work and browsing under $800",
-            "category": "cat_laptops",
-            "description": "Price-sensitive buyer, always chooses budget tier"
-        },
-        {
-            "user_id": "usr_002",
-            "username": "performance_paula",
-            "query": "Best laptop for gaming and video editing, need RTX graphics",
-            "category": "cat_laptops",
-            "description": "Performance-focused, willing to pay premium"
-        },
-        {
-            "user_id": "usr_003",
-            "username": "apple_andy",
-            "query": "Looking for a MacBook for college, good battery life",
-            "category": "cat_laptops",
-            "description": "100% Apple ecosystem loyalty"
-        },
-        {
-            "user_id": "usr_008",
-            "username": "runner_rachel",
-            "query": "Need running shoes with great cushioning for marathons",
-            "category": "cat_sneakers",
-            "description": "Running shoe specialist, buys frequently"
-        },
-        {
-            "user_id": "usr_007",
-            "username": "coffee_connoisseur_carlos",
-            "query": "Looking for premium single origin coffee, prefer light roast",
-            "category": "cat_coffee",
-            "description": "Coffee enthusiast, only buys premium beans"
-        },
-        {
-            "user_id": "usr_001",
-            "username": "budget_bob",  
-            "query": "cheap running shoes under $100 for gym",
-            "category": "cat_sneakers",
-            "description": "Same user (Bob) but different category - shows cross-category price sensitivity"
-        },
-        {
-            "user_id": "usr_002",
-            "username": "performance_paula",
-            "query": "flagship smartphone with best camera for content creation",
-            "category": "cat_phones",
-            "description": "Same user (Paula) - consistently prioritizes specs across categories"
-        }
-    ]
-    
-    for scenario in demo_scenarios:
+    for scenario in DEMO_SCENARIOS:
         user_id = scenario["user_id"]
         username = scenario["username"]
         query = scenario["query"]
@@ -109,7 +117,8 @@ def demo_orbit_system():
             user_id=user_id,
             query=query,
             purchase_history=purchase_history,
-            candidate_products=products
+            candidate_products=products,
+            top_k=TOP_K
         )
         
         # display top 5 results
@@ -138,10 +147,18 @@ def demo_orbit_system():
                 print(f"{criteria:<20} {score:<10.3f} {weight:<10.3f} {contribution:.4f}")
             
             print(f"\n{'Total AHP Score:':<20} {top_pick.ahp_score:.4f}")
+            
+            # smallest single-weight change that would dethrone the top pick (exact, all candidates)
+            sensitivity = analyze_sensitivity(ahp_matrices['product_scores'], ahp_matrices['criteria_weights'])
+            flip = sensitivity['min_perturbation']
+            if flip:
+                print(f"   Holds unless {flip['criterion']} weight moves {flip['delta']:+.3f} "
+                      f"(to {flip['new_weight']:.3f}) → {flip['new_top']} takes #1")
+            else:
+                print(f"   No single-weight change dethrones it")
         
-        # generate visualizations
-        print(f"\n📈 Generating visualizations...")
-        viz.generate_full_report(ranked_results, user_profile, username, ahp_matrices)
+        # queue visualizations (rendered by the pool, not inline)
+        viz.generate_full_report(ranked_results, user_profile, username, ahp_matrices, queue=render_queue)
         
         print(f"\n{'='*70}")
         print(f"✅ Results for {username} complete!")
@@ -150,6 +167,11 @@ def demo_orbit_system():
         
         # pause before next user
         input("\nPress Enter to see next user's query...")
+    
+    print(f"\n📈 Waiting for queued visualizations...")
+    files = [f for f in render_queue.wait() if f]
+    render_queue.shutdown()
+    print(f"✅ {len(files)} render jobs done ({render_queue.deduped} duplicates skipped)")
 
 def interactive_mode():
     """
@@ -206,16 +228,20 @@ def interactive_mode():
         else:
             category_id = "cat_laptops"  # default
         
-        # fetch data
-        purchase_history = db.get_user_purchase_history(user_id)
-        products = db.search_products(category_id)
+        # fetch data (stored running stats instead of the full purchase history,
+        # cached category index instead of filtering the product list every query)
+        preference_stats = db.get_preference_stats(user_id, category_id)
+        catalog_index = db.get_catalog_index(category_id)
         
         # run agent
-        ranked_results, user_profile = agent.run_query(
+        ranked_results, user_profile, ahp_matrices = agent.run_query(
             user_id=user_id,
             query=query,
-            purchase_history=purchase_history,
-            candidate_products=products
+            purchase_history=None,
+            candidate_products=None,
+            top_k=TOP_K,
+            preference_stats=preference_stats,
+            catalog_index=catalog_index
         )
         
         # show results
@@ -226,9 +252,69 @@ def interactive_mode():
         # ask if they want visualizations
         viz_choice = input("\nGenerate visualizations? (y/n): ").strip().lower()
         if viz_choice == 'y':
-            viz.generate_full_report(ranked_results, user_profile, f"{username}_custom")
+            viz.generate_full_report(ranked_results, user_profile, f"{username}_custom", ahp_matrices, profile="preview")
             print(f"✅ Saved to ./output/{username}_custom_*.png")
 
+def batch_mode():
+    """
+    Re-rank every demo scenario in one batched pass
+    One candidate fetch per category, one matrix product per category group
+    """
+    print("="*70)
+    print("🛸 ORBIT - Batch Ranking Mode")
+    print("="*70)
+    
+    db = Database()
+    agent = ORBITAgent()
+    
+    requests = [
+        {
+            "user_id": scenario["user_id"],
+            "query": scenario["query"],
+            "category_id": scenario["category"],
+            "purchase_history": db.get_user_purchase_history(scenario["user_id"])
+        }
+        for scenario in DEMO_SCENARIOS
+    ]
+    
+    results = agent.run_query_batch(requests, db.search_products, top_k=3)
+    
+    for scenario, (ranked_results, _, _) in zip(DEMO_SCENARIOS, results):
+        print(f"\n👤 {scenario['username']}: '{scenario['query']}'")
+        for i, result in enumerate(ranked_results[:3], 1):
+            print(f"   {i}. {result.product.product_name} - ${result.product.base_price:.2f} (Score: {result.ahp_score:.3f})")
+
+def nightly_mode(workers=None):
+    """
+    Nightly re-ranking of every demo scenario, sharded by user over a process pool
+    Product scores are computed once per category here and shared with the workers
+    """
+    from executor import ParallelExecutor, score_categories
+    
+    print("="*70)
+    print("🛸 ORBIT - Nightly Parallel Re-ranking")
+    print("="*70)
+    
+    db = Database()
+    agent = ORBITAgent()
+    
+    requests = [
+        {"user_id": s["user_id"], "query": s["query"], "category_id": s["category"]}
+        for s in DEMO_SCENARIOS
+    ]
+    product_scores = score_categories(agent, db, sorted({r["category_id"] for r in requests}))
+    
+    with ParallelExecutor(workers) as executor:
+        outcomes = executor.rerank_users(requests, product_scores, top_k=3)
+    
+    for outcome in outcomes:
+        if outcome['error']:
+            continue
+        for user_id, query, ranked_results, _ in outcome['result']['rankings']:
+            print(f"\n👤 {user_id}: '{query}'")
+            for i, result in enumerate(ranked_results, 1):
+                print(f"   {i}. {result.product.product_name} - ${result.product.base_price:.2f} (Score: {result.ahp_score:.3f})")
+
 def quick_test():
     """Quick test to verify everything works"""
     print("🧪 Running quick test...\n")
@@ -253,6 +339,26 @@ def quick_test():
     print(f"Top pick: {results[0].product.product_name}")
     print(f"Score: {results[0].ahp_score:.3f}")
 
+async def async_quick_test():
+    """Same as quick_test but through the async pipeline (concurrent fetch + LLM stages)"""
+    print("🧪 Running async quick test...\n")
+    
+    db = await AsyncDatabase.create()
+    agent = ORBITAgent()
+    
+    # db fetches overlap with query parsing inside arun_query
+    results, profile, _ = await agent.arun_query(
+        user_id="usr_001",
+        query="I need a cheap laptop under $700",
+        db=db,
+        category_id="cat_laptops",
+        timeout=60
+    )
+    
+    print(f"\n✅ Async test passed!")
+    print(f"Top pick: {results[0].product.product_name}")
+    print(f"Score: {results[0].ahp_score:.3f}")
+
 if __name__ == "__main__":
     import sys
     
@@ -261,6 +367,12 @@ if __name__ == "__main__":
             quick_test()
         elif sys.argv[1] == "interactive":
             interactive_mode()
+        elif sys.argv[1] == "batch":
+            batch_mode()
+        elif sys.argv[1] == "nightly":
+            nightly_mode()
+        elif sys.argv[1] == "async":
+            asyncio.run(async_quick_test())
         else:
             demo_orbit_system()
     else:
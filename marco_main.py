@@ -9,7 +9,12 @@ load_dotenv()
 from db import Database
 from macro_ahp_engine import ORBITMacroAgent
 from macro_visualizer import ORBITMacroVisualizer
-from models import VendorProfile
+
+# categories refreshed by fleet mode when none are given on the command line
+FLEET_CATEGORIES = ["cat_laptops", "cat_phones", "cat_sneakers", "cat_coffee"]
+
+def format_conversion(rate):
+    return f"{rate*100:.1f}%" if rate is not None else "n/a (no view data)"
 
 def demo_macro_system():
     """
@@ -60,24 +65,21 @@ def demo_macro_system():
         print(f"{'='*70}")
         
         # Get product insights
-        product_insights = db.supabase.table('product_aggregate_insights').select(
-            '*, products(*)'
-        ).eq('vendor_id', vendor_id).eq('category_id', category).execute()
-        
-        if product_insights.data:
-            products_sorted = sorted(product_insights.data, 
-                                    key=lambda x: x['conversion_rate'], reverse=True)
-            
+        product_insights = db.get_product_insights(vendor_id, category)
+        # products without view data yet have no conversion rate, they sort last
+        products_sorted = sorted(product_insights, key=lambda x: x.conversion_rate if x.conversion_rate is not None else -1.0,
+                                 reverse=True)
+        
+        if product_insights:
             print(f"\n✅ TOP 5 PERFORMING PRODUCTS:")
             for i, p in enumerate(products_sorted[:5], 1):
-                product_name = p['products']['product_name'] if p.get('products') else p['product_id']
-                print(f"\n{i}. {product_name}")
-                print(f"   📊 Views: {p['total_views']} | Purchases: {p['total_purchases']}")
-                print(f"   💰 Conversion: {p['conversion_rate']*100:.1f}%")
-                print(f"   👥 Primary Buyer: {p['primary_segment'].replace('_', ' ').title()}")
+                print(f"\n{i}. {p.product_name}")
+                print(f"   📊 Views: {p.total_views} | Purchases: {p.total_purchases}")
+                print(f"   💰 Conversion: {format_conversion(p.conversion_rate)}")
+                print(f"   👥 Primary Buyer: {p.primary_segment.replace('_', ' ').title()}")
                 
                 # Show what this segment values
-                criteria_weights = p['avg_criteria_weights']
+                criteria_weights = p.avg_criteria_weights
                 top_criteria = sorted(criteria_weights.items(), key=lambda x: x[1], reverse=True)[:3]
                 print(f"   🎯 This segment values: {', '.join([c[0] for c in top_criteria])}")
         
@@ -86,18 +88,19 @@ def demo_macro_system():
         print("❓ QUESTION 2: Which products are underperforming?")
         print(f"{'='*70}")
         
-        if product_insights.data:
+        if product_insights:
             print(f"\n❌ BOTTOM 5 PRODUCTS (Need Attention):")
             for i, p in enumerate(products_sorted[-5:], 1):
-                product_name = p['products']['product_name'] if p.get('products') else p['product_id']
-                print(f"\n{i}. {product_name}")
-                print(f"   📊 Views: {p['total_views']} | Purchases: {p['total_purchases']}")
-                print(f"   💰 Conversion: {p['conversion_rate']*100:.1f}%")
+                print(f"\n{i}. {p.product_name}")
+                print(f"   📊 Views: {p.total_views} | Purchases: {p.total_purchases}")
+                print(f"   💰 Conversion: {format_conversion(p.conversion_rate)}")
                 
                 # Diagnose the problem
-                if p['total_views'] > 50 and p['conversion_rate'] < 0.10:
+                if p.conversion_rate is None:
+                    print(f"   ⚠️  PROBLEM: No view data yet - can't tell visibility from conversion")
+                elif p.total_views > 50 and p.conversion_rate < 0.10:
                     print(f"   ⚠️  PROBLEM: High traffic, low conversion - likely pricing or positioning issue")
-                elif p['total_views'] < 20:
+                elif p.total_views < 20:
                     print(f"   ⚠️  PROBLEM: Low visibility - needs marketing/SEO")
                 else:
                     print(f"   ⚠️  PROBLEM: Product doesn't match customer needs")
@@ -109,28 +112,12 @@ def demo_macro_system():
         print(f"{'='*70}")
         
         # Get vendor strategic data
-        result = db.supabase.table('vendor_strategic_insights').select(
-            '*, vendors(*)'
-        ).eq('vendor_id', vendor_id).eq('category_id', category).execute()
+        vendor_profile = db.get_vendor_profile(vendor_id, category, vendor_name)
         
-        if not result.data:
+        if vendor_profile is None:
             print(f"   ⚠️  No strategic data found")
             continue
         
-        insight = result.data[0]
-        
-        vendor_profile = VendorProfile(
-            vendor_id=vendor_id,
-            vendor_name=vendor_name,
-            category_id=category,
-            market_share=float(insight['market_share']),
-            avg_conversion_rate=float(insight['avg_conversion_rate']),
-            total_products=insight['total_products'],
-            total_sales=insight['total_sales'],
-            avg_customer_criteria=insight['avg_customer_criteria'],
-            customer_segments=insight['customer_segments']
-        )
-        
         print(f"\n📊 Your Customer Base:")
         for seg, pct in vendor_profile.customer_segments.items():
             print(f"   • {seg.replace('_', ' ').title()}: {pct*100:.0f}%")
@@ -148,7 +135,7 @@ def demo_macro_system():
         for segment, pct in vendor_profile.customer_segments.items():
             if pct > 0.2:  # Significant segment
                 segment_products = [p for p in products_sorted 
-                                  if p['primary_segment'] == segment]
+                                  if p.primary_segment == segment]
                 if len(segment_products) < 3:
                     print(f"   ⚠️  Only {len(segment_products)} products targeting {segment.replace('_', ' ').title()} ({pct*100:.0f}% of customers)")
         
@@ -174,8 +161,8 @@ def demo_macro_system():
 Total Products: {vendor_profile.total_products}
 Average Conversion: {vendor_profile.avg_conversion_rate*100:.1f}%
 
-Top Performers: {', '.join([p['products']['product_name'] for p in products_sorted[:3] if p.get('products')])}
-Underperformers: {', '.join([p['products']['product_name'] for p in products_sorted[-3:] if p.get('products')])}
+Top Performers: {', '.join([p.product_name for p in products_sorted[:3]])}
+Underperformers: {', '.join([p.product_name for p in products_sorted[-3:]])}
 
 ## CUSTOMER DATA
 Segments: {', '.join([f'{k}: {v*100:.0f}%' for k,v in vendor_profile.customer_segments.items()])}
@@ -197,12 +184,12 @@ Answer these questions clearly:
 
 Be specific and actionable. Reference the actual data."""
 
-        response = agent.model.generate_content(product_prompt)
+        recommendations = agent.generate("product_strategy", product_prompt)
         
         print(f"\n{'='*70}")
         print("💡 AI STRATEGIC RECOMMENDATIONS")
         print(f"{'='*70}")
-        print(response.text)
+        print(recommendations)
         
         # Show AHP strategy recommendations
         # print(f"\n{'='*70}")
@@ -263,26 +250,12 @@ def interactive_mode():
     print(f"\n🏢 Analyzing: {vendor_name}")
     
     # Get data
-    result = db.supabase.table('vendor_strategic_insights').select('*').eq(
-        'vendor_id', vendor_id).eq('category_id', category).execute()
+    vendor_profile = db.get_vendor_profile(vendor_id, category, vendor_name)
     
-    if not result.data:
+    if vendor_profile is None:
         print("❌ No data found")
         return
     
-    insight = result.data[0]
-    vendor_profile = VendorProfile(
-        vendor_id=vendor_id,
-        vendor_name=vendor_name,
-        category_id=category,
-        market_share=float(insight['market_share']),
-        avg_conversion_rate=float(insight['avg_conversion_rate']),
-        total_products=insight['total_products'],
-        total_sales=insight['total_sales'],
-        avg_customer_criteria=insight['avg_customer_criteria'],
-        customer_segments=insight['customer_segments']
-    )
-    
     print(f"\n📊 Quick Stats:")
     print(f"   Products: {vendor_profile.total_products}")
     print(f"   Sales: {vendor_profile.total_sales}")
@@ -305,6 +278,57 @@ def interactive_mode():
         for alt in ranked_alternatives[:3]:
             print(f"   {alt.rank}. {alt.alternative.name.replace('_', ' ').title()} ({alt.ahp_score:.3f})")
 
+def fleet_mode(category_ids=None):
+    """
+    Nightly refresh: strategy rankings for every vendor in each category
+    One profile query per category, one batched AHP solve, one bulk write
+    """
+    print("="*70)
+    print("🏢 ORBIT MACRO - Fleet Strategy Refresh")
+    print("="*70)
+    
+    db = Database()
+    agent = ORBITMacroAgent()
+    
+    for category_id in category_ids or FLEET_CATEGORIES:
+        agent.timer.reset()
+        
+        profiles = db.get_vendor_profiles(category_id)
+        if not profiles:
+            print(f"\n⚠️  {category_id}: no vendor profiles")
+            continue
+        
+        fleet = agent.run_fleet_analysis(profiles)
+        rows = agent.strategy_ranking_rows(fleet)
+        db.save_strategy_rankings(rows)
+        
+        elapsed = sum(agent.timer.snapshot().values())
+        print(f"\n📊 {category_id}: {len(profiles)} vendors ranked in {elapsed*1000:.1f}ms, {len(rows)} rows written")
+        for vendor_id, ranking in list(zip(fleet['vendor_ids'], fleet['rankings']))[:5]:
+            print(f"   {vendor_id}: {fleet['alternatives'][ranking[0]].replace('_', ' ').title()}")
+        if len(profiles) > 5:
+            print(f"   ... and {len(profiles) - 5} more")
+
+def parallel_fleet_mode(category_ids=None, workers=None):
+    """
+    Fleet refresh sharded by vendor over a process pool (executor.ParallelExecutor)
+    Each worker writes its own shard, so use Supabase or an on-disk ORBIT_SQLITE_PATH
+    """
+    from executor import ParallelExecutor
+    
+    print("="*70)
+    print("🏢 ORBIT MACRO - Parallel Fleet Strategy Refresh")
+    print("="*70)
+    
+    db = Database()
+    with ParallelExecutor(workers) as executor:
+        for category_id in category_ids or FLEET_CATEGORIES:
+            profiles = db.get_vendor_profiles(category_id)
+            if not profiles:
+                print(f"\n⚠️  {category_id}: no vendor profiles")
+                continue
+            executor.run_fleet(profiles)
+
 def quick_test():
     """Quick test"""
     print("🧪 Testing macro system...\n")
@@ -312,26 +336,12 @@ def quick_test():
     db = Database()
     agent = ORBITMacroAgent()
     
-    result = db.supabase.table('vendor_strategic_insights').select('*').eq(
-        'vendor_id', 'vnd_techbuy').eq('category_id', 'cat_laptops').execute()
+    vendor_profile = db.get_vendor_profile('vnd_techbuy', 'cat_laptops', 'TechBuy Electronics')
     
-    if not result.data:
+    if vendor_profile is None:
         print("❌ No data")
         return
     
-    insight = result.data[0]
-    vendor_profile = VendorProfile(
-        vendor_id='vnd_techbuy',
-        vendor_name='TechBuy Electronics',
-        category_id='cat_laptops',
-        market_share=float(insight['market_share']),
-        avg_conversion_rate=float(insight['avg_conversion_rate']),
-        total_products=insight['total_products'],
-        total_sales=insight['total_sales'],
-        avg_customer_criteria=insight['avg_customer_criteria'],
-        customer_segments=insight['customer_segments']
-    )
-    
     ranked_alternatives, _, _ = agent.run_strategic_analysis(vendor_profile)
     
     print(f"✅ Test passed!")
@@ -345,6 +355,10 @@ if __name__ == "__main__":
             quick_test()
         elif sys.argv[1] == "interactive":
             interactive_mode()
+        elif sys.argv[1] == "fleet":
+            fleet_mode(sys.argv[2:])
+        elif sys.argv[1] == "fleet-parallel":
+            parallel_fleet_mode(sys.argv[2:])
         else:
             demo_macro_system()
     else:
@@ -141,7 +141,7 @@ class ProductAggregateInsight(BaseModel):
     category_id: str
     total_views: int
     total_purchases: int
-    conversion_rate: float
+    conversion_rate: Optional[float]  # None until views are known
     avg_criteria_weights: Dict[str, float]
     segment_breakdown: Dict[str, float]
     primary_segment: str
@@ -0,0 +1,87 @@
+"""
+PRIORITY SOLVER
+Priority vectors + consistency ratios for AHP comparison matrices
+Power iteration or geometric mean, one (n, n) matrix or a stacked (k, n, n) batch in one call
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+# Saaty random consistency index by matrix size (n = 1..10), 1.49 beyond that
+RANDOM_INDEX = [0, 0, 0.58, 0.9, 1.12, 1.24, 1.32, 1.41, 1.45, 1.49]
+
+PRIORITY_METHODS = ("power", "geometric")
+
+
+def random_index(n: int) -> float:
+    return RANDOM_INDEX[n - 1] if n <= len(RANDOM_INDEX) else RANDOM_INDEX[-1]
+
+
+def consistency_ratio(lambda_max: np.ndarray, n: int) -> np.ndarray:
+    """CR = CI / RI with CI = (lambda_max - n) / (n - 1); 0 when RI is 0 (n <= 2)"""
+    ri = random_index(n)
+    if n < 2 or ri == 0:
+        return np.zeros_like(lambda_max)
+    # consistent matrices give lambda_max == n, clip float noise below that
+    return np.maximum(lambda_max - n, 0.0) / (n - 1) / ri
+
+
+def power_iteration(matrices: np.ndarray, tol: float = 1e-10,
+                    max_iter: int = 1000) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Principal eigenvector of each positive (k, n, n) matrix, normalized to sum 1
+    Returns (priorities (k, n), lambda_max (k,)); stops once every vector moved less than tol
+    """
+    k, n, _ = matrices.shape
+    w = np.full((k, n), 1.0 / n)
+    lambda_max = np.full(k, float(n))
+
+    for _ in range(max_iter):
+        v = np.einsum('kij,kj->ki', matrices, w)
+        # w sums to 1, so sum(A w) is the Rayleigh-style estimate of lambda_max
+        lambda_max = v.sum(axis=1)
+        w_next = v / lambda_max[:, None]
+        if np.abs(w_next - w).max() < tol:
+            w = w_next
+            break
+        w = w_next
+
+    return w, lambda_max
+
+
+def geometric_mean(matrices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row geometric mean (log-mean) priorities of each (k, n, n) matrix
+    lambda_max is estimated as mean((A w) / w), the usual approximation for the CR
+    """
+    w = np.exp(np.log(matrices).mean(axis=2))
+    w /= w.sum(axis=1, keepdims=True)
+    lambda_max = (np.einsum('kij,kj->ki', matrices, w) / w).mean(axis=1)
+    return w, lambda_max
+
+
+def solve_priorities(matrices, method: str = "power", tol: float = 1e-10,
+                     max_iter: int = 1000) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Priorities and consistency ratios in one call
+    matrices: (n, n) -> ((n,), scalar CR) or (k, n, n) -> ((k, n), (k,))
+    """
+    matrices = np.asarray(matrices, dtype=float)
+    single = matrices.ndim == 2
+    if single:
+        matrices = matrices[None]
+    if matrices.ndim != 3 or matrices.shape[1] != matrices.shape[2]:
+        raise ValueError(f"expected (n, n) or (k, n, n) matrices, got shape {matrices.shape}")
+
+    if method == "power":
+        priorities, lambda_max = power_iteration(matrices, tol, max_iter)
+    elif method == "geometric":
+        priorities, lambda_max = geometric_mean(matrices)
+    else:
+        raise ValueError(f"unknown priority method {method!r}, expected one of {PRIORITY_METHODS}")
+
+    crs = consistency_ratio(lambda_max, matrices.shape[1])
+    if single:
+        return priorities[0], float(crs[0])
+    return priorities, crs
@@ -0,0 +1,99 @@
+"""
+RENDER QUEUE
+Renders report figures on a process pool (Agg backend) off the request path
+submit() returns a future for the saved file right away; identical jobs share one future
+"""
+
+import hashlib
+import os
+import pickle
+from concurrent.futures import Future, ProcessPoolExecutor, wait as wait_all
+from typing import Dict, List, Optional
+
+# dpi / format per use: quick screen previews vs print-quality export
+RENDER_PROFILES = {
+    "preview": {"dpi": 72, "fmt": "png"},
+    "export": {"dpi": 300, "fmt": "png"},
+    "vector": {"dpi": 300, "fmt": "pdf"}
+}
+
+# per-process visualizer instances, keyed by (class, output_dir)
+_visualizers: Dict[tuple, object] = {}
+
+
+def _init_worker():
+    # no display in the workers, select Agg before pyplot is imported
+    os.environ["MPLBACKEND"] = "Agg"
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _render(visualizer_cls: type, output_dir: str, method: str, args: tuple, kwargs: Dict):
+    key = (visualizer_cls, output_dir)
+    if key not in _visualizers:
+        _visualizers[key] = visualizer_cls(output_dir=output_dir)
+    return getattr(_visualizers[key], method)(*args, **kwargs)
+
+
+def job_hash(visualizer_cls: type, output_dir: str, method: str, args: tuple, kwargs: Dict) -> str:
+    """Content hash of a render job: same visualizer, method, inputs and profile -> same file"""
+    payload = pickle.dumps((visualizer_cls.__module__, visualizer_cls.__qualname__, str(output_dir),
+                            method, args, sorted(kwargs.items())), protocol=4)
+    return hashlib.sha256(payload).hexdigest()
+
+
+class RenderQueue:
+    """
+    Process pool of figure renderers
+    profile: default RENDER_PROFILES entry, overridable per submit()
+    """
+
+    def __init__(self, workers: Optional[int] = None, profile: str = "export"):
+        if profile not in RENDER_PROFILES:
+            raise ValueError(f"unknown render profile {profile!r}, expected one of {list(RENDER_PROFILES)}")
+        self.profile = profile
+        self.workers = workers or min(os.cpu_count() or 1, 4)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self._jobs: Dict[str, Future] = {}
+        self.deduped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def shutdown(self, wait: bool = True):
+        self.pool.shutdown(wait=wait)
+
+    def submit(self, visualizer_cls: type, output_dir: str, method: str, *args,
+               profile: Optional[str] = None, **kwargs) -> Future:
+        """
+        Queue visualizer_cls(output_dir).method(*args, **kwargs, dpi=..., fmt=...)
+        The future resolves to whatever the method returns (the saved file path)
+        """
+        kwargs = {**RENDER_PROFILES[profile or self.profile], **kwargs}
+        key = job_hash(visualizer_cls, output_dir, method, args, kwargs)
+
+        # a failed job is retried, a pending or finished one is shared
+        existing = self._jobs.get(key)
+        if existing is not None and not (existing.done() and existing.exception() is not None):
+            self.deduped += 1
+            return existing
+
+        future = self.pool.submit(_render, visualizer_cls, str(output_dir), method, args, kwargs)
+        self._jobs[key] = future
+        return future
+
+    def wait(self, futures: Optional[List[Future]] = None) -> List:
+        """Block until the given (default: all queued) jobs finish, return their results; failures are reported, not raised"""
+        futures = list(self._jobs.values()) if futures is None else futures
+        wait_all(futures)
+        results = []
+        for future in futures:
+            if future.exception() is not None:
+                print(f"   ❌ Render failed: {future.exception()!r}")
+                results.append(None)
+            else:
+                results.append(future.result())
+        return results
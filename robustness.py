@@ -0,0 +1,117 @@
+"""
+ROBUSTNESS
+Monte Carlo ranking under weight uncertainty
+Weight vectors are drawn from a Dirichlet centred on the derived weights (tighter the more confident we are),
+every sample is scored in one float32 (samples x criteria) @ (criteria x products) matmul
+"""
+
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+from spec_scoring import ScoreMatrix, top_k_indices
+
+# confidence in history-derived weights: query-only floor, rising with purchases towards the ceiling
+CONFIDENCE_FLOOR = 0.3
+CONFIDENCE_CEILING = 0.95
+CONFIDENCE_HALF_PURCHASES = 5  # purchases at which we're halfway from floor to ceiling
+
+# Dirichlet concentration per unit of confidence odds (c / (1 - c)): 0.8 -> 40, 0.95 -> 190
+CONCENTRATION_SCALE = 10.0
+
+DEFAULT_SAMPLES = 2000
+
+# pilot products per ranked position used to bound which products can place at all
+PILOT_FACTOR = 4
+
+
+def confidence_from_purchases(total_purchases: int) -> float:
+    n = max(total_purchases, 0)
+    return CONFIDENCE_FLOOR + (CONFIDENCE_CEILING - CONFIDENCE_FLOOR) * n / (n + CONFIDENCE_HALF_PURCHASES)
+
+
+def concentration(confidence: float) -> float:
+    """Dirichlet total concentration: weight variance is w(1-w) / (concentration + 1)"""
+    confidence = min(max(confidence, 1e-3), 1 - 1e-3)
+    return CONCENTRATION_SCALE * confidence / (1 - confidence)
+
+
+def sample_weights(weights: np.ndarray, confidence: float, samples: int,
+                   rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """(samples, n) float32 weight vectors, each on the simplex, mean = weights"""
+    rng = rng or np.random.default_rng()
+    weights = np.asarray(weights, dtype=float)
+    # a zero weight would make an invalid (zero) Dirichlet parameter
+    alpha = np.maximum(weights / weights.sum(), 1e-6) * concentration(confidence)
+    return rng.dirichlet(alpha, size=samples).astype(np.float32)
+
+
+def robustness_analysis(product_scores: ScoreMatrix, criteria_weights: Dict[str, float],
+                        confidence: Union[float, Dict[str, float]] = 0.8, samples: int = DEFAULT_SAMPLES,
+                        max_rank: int = 10, seed: Optional[int] = None,
+                        chunk_elements: int = 4_000_000) -> Dict:
+    """
+    Rank distribution over `samples` Dirichlet weight draws
+    confidence: one value, or per criterion (combined weight-averaged, a Dirichlet has one concentration)
+    Returns p_top1 and rank_distribution (P(rank = 1..max_rank)) for every product that reached the
+    top max_rank in some sample, best first by p_top1
+    """
+    if not isinstance(product_scores, ScoreMatrix):
+        product_scores = ScoreMatrix.from_dict(product_scores)
+    ids = product_scores.product_ids
+    weights = product_scores.weight_vector(criteria_weights)
+    if isinstance(confidence, dict):
+        confidence = float(sum(confidence.get(c, 0.0) * w for c, w in zip(product_scores.criteria, weights)) / weights.sum())
+
+    values_t = np.ascontiguousarray(product_scores.values.T, dtype=np.float32)  # (criteria, products)
+    n_products = values_t.shape[1]
+    max_rank = min(max_rank, n_products)
+    draws = sample_weights(weights, confidence, samples, np.random.default_rng(seed))
+
+    # the max_rank-th best score among a few products strong at the centre weights bounds each sample's
+    # max_rank-th best score from below; products that never reach that bound can't place, only the rest get ranked
+    pilot = top_k_indices(product_scores.values @ weights, PILOT_FACTOR * max_rank)
+    pilot_scores = draws @ values_t[:, pilot]
+    thresholds = -np.partition(-pilot_scores, max_rank - 1, axis=1)[:, max_rank - 1]
+    # first cut before the big matmul: sample weights deviate from the centre by a zero-sum vector, so
+    # score_s(p) <= centre_p + |w_s - w| * |v_p - mean(v_p)| (Cauchy-Schwarz); slack covers float32 rounding
+    centre = product_scores.values @ (weights / weights.sum())
+    spread = np.linalg.norm(product_scores.values - product_scores.values.mean(axis=1, keepdims=True), axis=1)
+    radius = np.linalg.norm(draws - weights / weights.sum(), axis=1).max()
+    reachable = np.union1d(np.flatnonzero(centre + radius * spread >= thresholds.min() - 1e-5), pilot)
+    values_t = values_t[:, reachable]
+
+    rank_counts = np.zeros((n_products, max_rank), dtype=np.int64)
+    positions = np.arange(max_rank)
+
+    chunk = max(1, chunk_elements // max(len(reachable), 1))
+    for start in range(0, samples, chunk):
+        scores = draws[start:start + chunk] @ values_t  # (chunk, reachable products)
+        threshold = thresholds[start:start + chunk, None]
+        candidates = np.flatnonzero((scores >= threshold).any(axis=0))
+        sub = scores[:, candidates]
+        candidates = reachable[candidates]
+
+        if max_rank < len(candidates):
+            top = np.argpartition(-sub, max_rank - 1, axis=1)[:, :max_rank]
+        else:
+            top = np.broadcast_to(np.arange(len(candidates)), (len(sub), len(candidates)))
+        order = np.argsort(-np.take_along_axis(sub, top, axis=1), axis=1, kind="stable")
+        ranked = candidates[np.take_along_axis(top, order, axis=1)]  # (chunk, max_rank) product indices
+
+        flat = (ranked * max_rank + positions).ravel()
+        rank_counts += np.bincount(flat, minlength=n_products * max_rank).reshape(n_products, max_rank)
+
+    placed = np.flatnonzero(rank_counts.any(axis=1))
+    placed = placed[np.argsort(-rank_counts[placed, 0], kind="stable")]
+    distribution = rank_counts[placed] / samples
+
+    return {
+        "samples": samples,
+        "confidence": confidence,
+        "concentration": concentration(confidence),
+        "product_ids": [ids[i] for i in placed],
+        "p_top1": {ids[i]: float(p) for i, p in zip(placed, distribution[:, 0])},
+        "rank_distribution": {ids[i]: d.tolist() for i, d in zip(placed, distribution)},
+        "most_likely_top": ids[placed[0]] if len(placed) else None
+    }
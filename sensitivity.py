@@ -0,0 +1,127 @@
+"""
+SENSITIVITY ANALYSIS
+Closed-form one-at-a-time weight sensitivity for the weighted-sum AHP score
+Moving criterion c to weight t (others rescaled to keep the sum at 1) makes every score a line in t,
+so rank reversals are line intersections: exact, for every criterion and product, no grid sweep
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from spec_scoring import ScoreMatrix, top_k_indices
+
+
+def linear_coefficients(values: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    score[p](t) = intercept[p, c] + t * slope[p, c] when criterion c gets weight t
+    values: (P, n) criterion scores, weights: (n,) summing to 1
+    A criterion already holding all the weight (w_c = 1) leaves the others at 0: intercept 0
+    """
+    rest = (values @ weights)[:, None] - values * weights  # sum over the other criteria, (P, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        intercept = np.where(weights < 1.0, rest / (1.0 - weights), 0.0)
+    return intercept, values - intercept
+
+
+def crossover_weights(values: np.ndarray, weights: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    (k, k, n) weight of criterion c at which products i and j tie, nan when their lines
+    don't cross inside [0, 1]; rows picks the k products (default: all, mind the k^2 size)
+    """
+    intercept, slope = linear_coefficients(values, weights)
+    if rows is not None:
+        intercept, slope = intercept[rows], slope[rows]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (intercept[None, :, :] - intercept[:, None, :]) / (slope[:, None, :] - slope[None, :, :])
+    return np.where((t >= 0.0) & (t <= 1.0), t, np.nan)
+
+
+def stability_intervals(values: np.ndarray, weights: np.ndarray,
+                        top: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Per criterion, the weight interval [lower, upper] inside which product `top` (default: current
+    winner) stays ranked first, and which product takes over just past each end (-1 = none)
+    One (P, n) pass: only crossings against the top pick can change the top pick
+    """
+    if top is None:
+        top = int(top_k_indices(values @ weights, 1)[0])
+    intercept, slope = linear_coefficients(values, weights)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (intercept - intercept[top]) / (slope[top] - slope)
+    t[top] = np.nan
+    valid = (t >= 0.0) & (t <= 1.0)
+
+    below = np.where(valid & (t < weights), t, -np.inf)
+    above = np.where(valid & (t > weights), t, np.inf)
+    lower_rival = np.argmax(below, axis=0)
+    upper_rival = np.argmin(above, axis=0)
+    lower = below[lower_rival, np.arange(len(weights))]
+    upper = above[upper_rival, np.arange(len(weights))]
+
+    return {
+        "top": top,
+        "lower": np.where(np.isfinite(lower), lower, 0.0),
+        "upper": np.where(np.isfinite(upper), upper, 1.0),
+        "lower_rival": np.where(np.isfinite(lower), lower_rival, -1),
+        "upper_rival": np.where(np.isfinite(upper), upper_rival, -1)
+    }
+
+
+def analyze_sensitivity(product_scores: ScoreMatrix, criteria_weights: Dict[str, float],
+                        top_n: int = 5) -> Dict:
+    """
+    Sensitivity report for one ranking
+    stability: criterion -> weight interval that keeps the top pick and the rival past each end
+    min_perturbation: smallest single-weight change that changes the top pick (None if no change can)
+    crossovers: criterion -> [(product_a, product_b, weight)] rank swaps among the top_n products
+    """
+    if not isinstance(product_scores, ScoreMatrix):
+        product_scores = ScoreMatrix.from_dict(product_scores)
+    criteria = product_scores.criteria
+    weights = product_scores.weight_vector(criteria_weights)
+    total = weights.sum()
+    # scaling all weights doesn't change the ranking, work on the simplex
+    weights = weights / total if total > 0 else np.full(len(criteria), 1.0 / len(criteria))
+    values = product_scores.values
+    ids = product_scores.product_ids
+
+    intervals = stability_intervals(values, weights)
+    top = intervals["top"]
+
+    stability = {}
+    best: Optional[Dict] = None
+    for j, criterion in enumerate(criteria):
+        entry = {
+            "weight": float(weights[j]),
+            "lower": float(intervals["lower"][j]),
+            "upper": float(intervals["upper"][j]),
+            "lower_rival": ids[intervals["lower_rival"][j]] if intervals["lower_rival"][j] >= 0 else None,
+            "upper_rival": ids[intervals["upper_rival"][j]] if intervals["upper_rival"][j] >= 0 else None
+        }
+        stability[criterion] = entry
+        for bound, rival in (("lower", entry["lower_rival"]), ("upper", entry["upper_rival"])):
+            if rival is None:
+                continue
+            delta = entry[bound] - entry["weight"]
+            if best is None or abs(delta) < abs(best["delta"]):
+                best = {"criterion": criterion, "delta": delta, "new_weight": entry[bound], "new_top": rival}
+
+    rows = top_k_indices(values @ weights, top_n)
+    pairwise = crossover_weights(values, weights, rows)
+    crossovers: Dict[str, List[Tuple[str, str, float]]] = {c: [] for c in criteria}
+    for a, b, j in zip(*np.nonzero(np.isfinite(pairwise))):
+        if a < b:  # the tensor is symmetric in (a, b)
+            crossovers[criteria[j]].append((ids[rows[a]], ids[rows[b]], float(pairwise[a, b, j])))
+    for swaps in crossovers.values():
+        swaps.sort(key=lambda swap: swap[2])
+
+    return {
+        "criteria": list(criteria),
+        "weights": dict(zip(criteria, weights.tolist())),
+        "top_product": ids[top],
+        "stability": stability,
+        "min_perturbation": best,
+        "crossovers": crossovers
+    }
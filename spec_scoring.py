@@ -0,0 +1,250 @@
+"""
+SPEC SCORING ENGINE
+Deterministic, vectorized criterion scores computed from Product.specs
+Only criteria that can't be derived from specs are left for the LLM
+"""
+
+import numpy as np
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+from models import Product
+
+# ordinal scales for categorical spec values
+GPU_TIERS = {
+    "integrated": 0.0,
+    "rtx 3050": 1.0,
+    "rtx 3050 ti": 1.5,
+    "rtx a2000": 2.0,
+    "rtx 4050": 2.0,
+    "rtx 4060": 3.0,
+    "rtx 3000 ada": 3.0,
+    "rtx 4070": 4.0,
+    "rtx 3080 ti": 4.0,
+    "rtx 4080": 5.0,
+    "rtx 5000 ada": 5.0,
+    "rtx 4090": 6.0
+}
+
+CUSHIONING_LEVELS = {
+    "low": 1.0,
+    "medium": 2.0,
+    "high": 3.0,
+    "very_high": 4.0,
+    "maximum": 5.0
+}
+
+# criteria -> [(spec_key, direction)], direction -1 means lower raw value is better
+# price is handled for every category (read from base_price, not specs)
+SPEC_CRITERIA = {
+    "laptops": {
+        "performance": [("ram_gb", 1), ("storage_gb", 1), ("gpu", 1)],
+        "battery_life": [("battery_hours", 1)],
+        "portability": [("weight_kg", -1)]
+    },
+    "smartphones": {
+        "camera_quality": [("camera_mp", 1)],
+        "battery_life": [("battery_mah", 1)],
+        "performance": [("ram_gb", 1)],
+        "storage_capacity": [("storage_gb", 1)]
+    },
+    "coffee": {
+        "organic_certification": [("is_organic", 1)],
+        "flavor_complexity": [("flavor_notes", 1)]
+    },
+    "sneakers": {
+        "comfort": [("cushioning", 1), ("weight_grams", -1)]
+    }
+}
+
+PRICE_FEATURE = ("base_price", 1)
+
+
+def _parse_gpu(value) -> Optional[float]:
+    tier = GPU_TIERS.get(str(value).strip().lower())
+    if tier is None and "rtx" in str(value).lower():
+        return 2.0  # unknown discrete gpu, assume mid tier
+    return tier
+
+
+def _parse_number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# spec keys that need more than float() to become a number
+SPEC_PARSERS = {
+    "gpu": _parse_gpu,
+    "cushioning": lambda v: CUSHIONING_LEVELS.get(str(v).lower()),
+    "flavor_notes": lambda v: float(len(v)) if isinstance(v, list) else None
+}
+
+
+def minmax_normalize(column: np.ndarray) -> np.ndarray:
+    """Scale to 0-1 over the products in this set, NaN stays NaN"""
+    valid = ~np.isnan(column)
+    if not valid.any():
+        return column
+    lo, hi = column[valid].min(), column[valid].max()
+    if hi == lo:
+        return np.where(valid, 0.5, np.nan)
+    return (column - lo) / (hi - lo)
+
+
+def rank_normalize(column: np.ndarray) -> np.ndarray:
+    """Average-rank scaled to 0-1, robust to outliers (ties share a rank)"""
+    valid = ~np.isnan(column)
+    n = int(valid.sum())
+    if n == 0:
+        return column
+    if n == 1:
+        return np.where(valid, 0.5, np.nan)
+    ordered = np.sort(column[valid])
+    below = np.searchsorted(ordered, column, side="left")
+    upto = np.searchsorted(ordered, column, side="right")
+    ranks = (below + upto - 1) / 2.0 / (n - 1)
+    return np.where(valid, ranks, np.nan)
+
+
+NORMALIZERS = {
+    "minmax": minmax_normalize,
+    "rank": rank_normalize
+}
+
+
+def top_k_indices(scores: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first (ties keep input order)
+    argpartition first, so only the k winners get sorted
+    """
+    n = len(scores)
+    if k is None or k >= n:
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    winners = np.sort(np.argpartition(-scores, k - 1)[:k])
+    return winners[np.argsort(-scores[winners], kind="stable")]
+
+
+class ScoreMatrix(Mapping):
+    """
+    Dense (products x criteria) criterion scores
+    Fixed criteria column order + product_id -> row index
+
+    Reads like the old {product_id: {criterion: score}} dict (visualizers, RankedProduct),
+    but aggregation is one matrix-vector product over .values
+    """
+
+    def __init__(self, product_ids: List[str], criteria: List[str], values: np.ndarray,
+                 dtype=np.float64):
+        self.product_ids = list(product_ids)
+        self.criteria = list(criteria)
+        self.values = np.ascontiguousarray(values, dtype=dtype)
+        self.index = {pid: i for i, pid in enumerate(self.product_ids)}
+
+    @classmethod
+    def from_dict(cls, scores: Dict[str, Dict[str, float]], criteria: Optional[List[str]] = None,
+                  default: float = 0.0, dtype=np.float64) -> "ScoreMatrix":
+        """Build from the nested-dict format, criteria default to first-seen order"""
+        if criteria is None:
+            criteria = list(dict.fromkeys(c for row in scores.values() for c in row))
+        values = np.array([[row.get(c, default) for c in criteria] for row in scores.values()],
+                          dtype=dtype).reshape(len(scores), len(criteria))
+        return cls(list(scores.keys()), criteria, values, dtype)
+
+    def __getitem__(self, product_id: str) -> Dict[str, float]:
+        return dict(zip(self.criteria, self.values[self.index[product_id]].tolist()))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.product_ids)
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def __contains__(self, product_id) -> bool:
+        return product_id in self.index
+
+    def column(self, criterion: str) -> np.ndarray:
+        return self.values[:, self.criteria.index(criterion)]
+
+    def rows(self, product_ids: List[str]) -> np.ndarray:
+        return np.fromiter((self.index[pid] for pid in product_ids), dtype=np.intp, count=len(product_ids))
+
+    def weight_vector(self, criteria_weights: Dict[str, float]) -> np.ndarray:
+        """Weights in column order, criteria without a weight count as 0"""
+        return np.array([criteria_weights.get(c, 0.0) for c in self.criteria], dtype=self.values.dtype)
+
+    def weighted(self, criteria_weights: Dict[str, float]) -> np.ndarray:
+        """Final AHP score per row: values @ w"""
+        return self.values @ self.weight_vector(criteria_weights)
+
+
+class SpecScorer:
+    """
+    Scores products on spec-derivable criteria without calling the LLM
+
+    Scores follow the same convention as the LLM scorer:
+    higher raw value = higher score, cost criteria are inverted by the caller
+    """
+
+    def __init__(self, normalization: str = "minmax"):
+        if normalization not in NORMALIZERS:
+            raise ValueError(f"Unknown normalization '{normalization}', use one of {list(NORMALIZERS)}")
+        self.normalization = normalization
+
+    def features_for(self, category: str, criteria: List[str]) -> Dict[str, List[Tuple[str, int]]]:
+        """Map each derivable criterion to its spec features"""
+        spec_map = SPEC_CRITERIA.get(category, {})
+        features = {}
+        for c in criteria:
+            if c == "price":
+                features[c] = [PRICE_FEATURE]
+            elif c in spec_map:
+                features[c] = spec_map[c]
+        return features
+
+    def feature_matrix(self, products: List[Product], keys: List[str]) -> np.ndarray:
+        """Raw numeric values, shape (products, keys), NaN where a spec is missing"""
+        matrix = np.full((len(products), len(keys)), np.nan)
+        for j, key in enumerate(keys):
+            parse = SPEC_PARSERS.get(key, _parse_number)
+            if key == "base_price":
+                matrix[:, j] = [p.base_price for p in products]
+                continue
+            for i, p in enumerate(products):
+                if key in p.specs:
+                    value = parse(p.specs[key])
+                    if value is not None:
+                        matrix[i, j] = value
+        return matrix
+
+    def score(self, products: List[Product], category: str,
+              criteria: List[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        Returns: (derived_criteria, scores) where scores has shape (products, derived_criteria)
+        Missing specs score a neutral 0.5
+        """
+        features = self.features_for(category, criteria)
+        derived = list(features.keys())
+        if not products or not derived:
+            return derived, np.zeros((len(products), len(derived)))
+
+        keys = sorted({key for spec_list in features.values() for key, _ in spec_list})
+        raw = self.feature_matrix(products, keys)
+        normalize = NORMALIZERS[self.normalization]
+        normalized = {key: normalize(raw[:, j]) for j, key in enumerate(keys)}
+
+        scores = np.empty((len(products), len(derived)))
+        for j, c in enumerate(derived):
+            columns = [normalized[key] if direction > 0 else 1.0 - normalized[key]
+                       for key, direction in features[c]]
+            stacked = np.column_stack(columns)
+            has_value = ~np.isnan(stacked)
+            counts = has_value.sum(axis=1)
+            sums = np.where(has_value, stacked, 0.0).sum(axis=1)
+            scores[:, j] = np.where(counts > 0, sums / np.maximum(counts, 1), 0.5)
+
+        return derived, scores
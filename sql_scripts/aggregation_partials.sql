@@ -0,0 +1,11 @@
+-- ============================================
+-- AGGREGATION PARTIALS
+-- Mergeable sums/counts behind each product_aggregate_insights / vendor_strategic_insights row
+-- (aggregation.PartialAggregate) so incremental runs only fold in new events
+-- Run after aggregation_tables.sql
+-- ============================================
+
+ALTER TABLE product_aggregate_insights ADD COLUMN IF NOT EXISTS partial_aggregates JSONB;
+
+-- same for vendor_strategic_insights (aggregation.VendorAggregator), one partial per (vendor, category)
+ALTER TABLE vendor_strategic_insights ADD COLUMN IF NOT EXISTS partial_aggregates JSONB;
@@ -0,0 +1,32 @@
+-- ============================================
+-- AGGREGATION PIPELINE TABLES
+-- Raw view events + job watermarks for aggregation.py
+-- Safe to re-run (IF NOT EXISTS everywhere)
+-- Run after macro_synthesized_seed.sql
+-- ============================================
+
+-- one row per product page view (written by the storefront / tracking)
+CREATE TABLE IF NOT EXISTS product_view_events (
+    event_id VARCHAR(50) PRIMARY KEY,
+    user_id VARCHAR(50),
+    product_id VARCHAR(50) NOT NULL,
+    vendor_id VARCHAR(50) NOT NULL,
+    viewed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (product_id) REFERENCES products(product_id),
+    FOREIGN KEY (vendor_id) REFERENCES vendors(vendor_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_view_events_time ON product_view_events(viewed_at);
+CREATE INDEX IF NOT EXISTS idx_purchase_history_date ON purchase_history(purchase_date);
+
+-- high-water mark per aggregation job: events before it are already folded in
+CREATE TABLE IF NOT EXISTS aggregation_watermarks (
+    job_name VARCHAR(100) PRIMARY KEY,
+    watermark TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- aggregates are upserted per (product, vendor)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_product_insights_product_vendor
+    ON product_aggregate_insights(product_id, vendor_id);
@@ -0,0 +1,64 @@
+-- ============================================
+-- ORBIT BASE SCHEMA
+-- Core tables used by products_seed.sql
+-- Run this first (Postgres/Supabase and SQLite both accept it)
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS categories (
+    category_id VARCHAR(50) PRIMARY KEY,
+    category_name VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id VARCHAR(50) PRIMARY KEY,
+    username VARCHAR(100) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS vendors (
+    vendor_id VARCHAR(50) PRIMARY KEY,
+    vendor_name VARCHAR(100) NOT NULL,
+    vendor_rating DECIMAL(3,2),
+    avg_shipping_days INT,
+    return_policy_days INT
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    product_id VARCHAR(50) PRIMARY KEY,
+    product_name VARCHAR(255) NOT NULL,
+    category_id VARCHAR(50) NOT NULL,
+    brand VARCHAR(100) NOT NULL,
+    model VARCHAR(255),
+    base_price DECIMAL(10,2) NOT NULL,
+    specs JSONB NOT NULL,
+    description TEXT,
+
+    FOREIGN KEY (category_id) REFERENCES categories(category_id)
+);
+
+CREATE TABLE IF NOT EXISTS vendor_inventory (
+    inventory_id VARCHAR(50) PRIMARY KEY,
+    vendor_id VARCHAR(50) NOT NULL,
+    product_id VARCHAR(50) NOT NULL,
+    vendor_price DECIMAL(10,2) NOT NULL,
+    stock_quantity INT DEFAULT 0,
+    shipping_days INT,
+    shipping_cost DECIMAL(10,2) DEFAULT 0,
+    is_available BOOLEAN DEFAULT TRUE,
+
+    FOREIGN KEY (vendor_id) REFERENCES vendors(vendor_id),
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
+);
+
+CREATE TABLE IF NOT EXISTS purchase_history (
+    purchase_id VARCHAR(50) PRIMARY KEY,
+    user_id VARCHAR(50) NOT NULL,
+    inventory_id VARCHAR(50) NOT NULL,
+    purchase_date TIMESTAMP NOT NULL,
+    quantity INT DEFAULT 1,
+    total_paid DECIMAL(10,2) NOT NULL,
+
+    FOREIGN KEY (user_id) REFERENCES users(user_id),
+    FOREIGN KEY (inventory_id) REFERENCES vendor_inventory(inventory_id)
+);
@@ -0,0 +1,8 @@
+-- ============================================
+-- USER PREFERENCE STATS
+-- Running per-(user, category) purchase statistics (user_profiles.PreferenceStats)
+-- Welford price mean/M2, brand counts, spec sums - updated in O(1) per purchase
+-- Run after macro_synthesized_seed.sql
+-- ============================================
+
+ALTER TABLE user_criteria_preferences ADD COLUMN IF NOT EXISTS preference_stats JSONB;
@@ -0,0 +1,26 @@
+-- ============================================
+-- VENDOR STRATEGY RANKINGS
+-- Output of the nightly fleet run (ORBITMacroAgent.run_fleet_analysis)
+-- One row per (vendor, category, strategic alternative), bulk upserted
+-- Run after macro_synthesized_seed.sql
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS vendor_strategy_rankings (
+    vendor_id VARCHAR(50) NOT NULL,
+    category_id VARCHAR(50) NOT NULL,
+    alternative_id VARCHAR(50) NOT NULL,
+
+    strategy_rank INT NOT NULL,
+    ahp_score DECIMAL(8,6) NOT NULL,
+
+    -- per-criterion priority of this alternative
+    criteria_scores JSONB,
+
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (vendor_id, category_id, alternative_id),
+    FOREIGN KEY (vendor_id) REFERENCES vendors(vendor_id),
+    FOREIGN KEY (category_id) REFERENCES categories(category_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_strategy_rankings_category ON vendor_strategy_rankings(category_id, strategy_rank);
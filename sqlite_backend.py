@@ -0,0 +1,464 @@
+"""
+SQLITE BACKEND
+Local, dependency-free DatabaseBackend seeded from sql_scripts/
+Same models and filters as the Supabase backend, so tests and benchmarks run offline
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from db import DatabaseBackend, to_enriched_purchase, to_vendor_profile, to_product_insight
+from models import User, Product, Vendor, VendorInventory, EnrichedPurchase, VendorProfile, ProductAggregateInsight
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql_scripts")
+
+# run in this order on an empty database
+SEED_SCRIPTS = [
+    "base_schema.sql",
+    "products_seed.sql",
+    "macro_synthesized_seed.sql"
+]
+
+# (table, column, type) added by later sql_scripts with ALTER TABLE ... ADD COLUMN IF NOT EXISTS,
+# which sqlite doesn't support, so they are applied here instead
+COLUMN_MIGRATIONS = [
+    ("user_criteria_preferences", "preference_stats", "JSONB"),
+    ("product_aggregate_insights", "partial_aggregates", "JSONB"),
+    ("vendor_strategic_insights", "partial_aggregates", "JSONB")
+]
+
+# later sql_scripts that only CREATE ... IF NOT EXISTS, safe to run against any database
+SCHEMA_SCRIPTS = [
+    "vendor_strategy_rankings.sql",
+    "aggregation_tables.sql"
+]
+
+# JSONB columns come back from sqlite as text
+JSON_COLUMNS = {
+    "specs",
+    "criteria_weights",
+    "avg_criteria_weights",
+    "segment_breakdown",
+    "customer_segments",
+    "avg_customer_criteria",
+    "preference_stats",
+    "criteria_scores",
+    "partial_aggregates"
+}
+
+# sqlite compares timestamps as text, so params must match the seed format
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _now() -> str:
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+
+class SQLiteBackend(DatabaseBackend):
+    """
+    sqlite3 implementation of DatabaseBackend
+    path=':memory:' gives a fresh seeded database per instance
+    """
+
+    def __init__(self, path: str = ":memory:", seed: bool = True, scripts_dir: str = SQL_DIR):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_function("NOW", 0, _now)  # postgres-ism used by the macro seed
+        self._lock = threading.Lock()
+        self._column_cache: Dict[str, List[str]] = {}
+
+        if seed and not self.is_seeded():
+            self.seed(scripts_dir)
+        self.migrate(scripts_dir)
+
+    def is_seeded(self) -> bool:
+        row = self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'products'"
+        ).fetchone()
+        return row is not None
+
+    def seed(self, scripts_dir: str = SQL_DIR):
+        """Create the schema and load the demo data"""
+        for name in SEED_SCRIPTS:
+            path = os.path.join(scripts_dir, name)
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                script = f.read()
+            with self._lock:
+                self.conn.executescript(script)
+        self._column_cache.clear()
+        print(f"🗄️  Seeded SQLite database ({self.path})")
+
+    def migrate(self, scripts_dir: str = SQL_DIR):
+        """Add tables and columns from later sql_scripts that an older database file is missing"""
+        if self.is_seeded():
+            for name in SCHEMA_SCRIPTS:
+                path = os.path.join(scripts_dir, name)
+                if os.path.exists(path):
+                    with open(path, encoding="utf-8") as f, self._lock:
+                        self.conn.executescript(f.read())
+        
+        for table, column, column_type in COLUMN_MIGRATIONS:
+            columns = self._columns(table)
+            if columns and column not in columns:
+                with self._lock:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+                    self.conn.commit()
+                self._column_cache.pop(table, None)
+
+    # ----- helpers -----
+
+    def _columns(self, table: str) -> List[str]:
+        if table not in self._column_cache:
+            self._column_cache[table] = [r["name"] for r in self.conn.execute(f"PRAGMA table_info({table})")]
+        return self._column_cache[table]
+
+    def _select(self, tables: Dict[str, str]) -> str:
+        """alias -> table, every column prefixed 'alias__' so joined rows can be split apart"""
+        return ", ".join(
+            f"{alias}.{col} AS {alias}__{col}"
+            for alias, table in tables.items()
+            for col in self._columns(table)
+        )
+
+    @staticmethod
+    def _decode(row: Dict) -> Dict:
+        for key in JSON_COLUMNS & row.keys():
+            if isinstance(row[key], str):
+                row[key] = json.loads(row[key])
+        if "is_available" in row and row["is_available"] is not None:
+            row["is_available"] = bool(row["is_available"])
+        return row
+
+    @classmethod
+    def _split(cls, row: sqlite3.Row, aliases: List[str]) -> Dict[str, Dict]:
+        parts = {alias: {} for alias in aliases}
+        for key in row.keys():
+            alias, col = key.split("__", 1)
+            parts[alias][col] = row[key]
+        return {alias: cls._decode(values) for alias, values in parts.items()}
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    # ----- DatabaseBackend -----
+
+    def get_user(self, user_id: str) -> Optional[User]:
+        rows = self._query("SELECT * FROM users WHERE user_id = ?", (user_id,))
+        return User(**dict(rows[0])) if rows else None
+
+    def get_user_purchase_history(self, user_id: str, category_id: Optional[str] = None,
+                                  start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                                  limit: Optional[int] = None, offset: int = 0) -> List[EnrichedPurchase]:
+        tables = {"ph": "purchase_history", "vi": "vendor_inventory", "p": "products", "v": "vendors"}
+        sql = f"""
+            SELECT {self._select(tables)}
+            FROM purchase_history ph
+            JOIN vendor_inventory vi ON vi.inventory_id = ph.inventory_id
+            JOIN products p ON p.product_id = vi.product_id
+            JOIN vendors v ON v.vendor_id = vi.vendor_id
+            WHERE ph.user_id = ?
+        """
+        params = [user_id]
+        if category_id:
+            sql += " AND p.category_id = ?"
+            params.append(category_id)
+        if start_date:
+            sql += " AND ph.purchase_date >= ?"
+            params.append(start_date.strftime(TIMESTAMP_FORMAT))
+        if end_date:
+            sql += " AND ph.purchase_date < ?"
+            params.append(end_date.strftime(TIMESTAMP_FORMAT))
+
+        sql += " ORDER BY ph.purchase_date DESC, ph.purchase_id"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+
+        history = []
+        for row in self._query(sql, tuple(params)):
+            parts = self._split(row, list(tables))
+            history.append(to_enriched_purchase({
+                **parts["ph"],
+                "vendor_inventory": {**parts["vi"], "products": parts["p"], "vendors": parts["v"]}
+            }))
+        return history
+
+    def search_products(self, category_id: str, query: Optional[str] = None,
+                        brand: Optional[str] = None, max_price: Optional[float] = None) -> List[Product]:
+        sql = "SELECT * FROM products WHERE category_id = ?"
+        params = [category_id]
+        if brand:
+            sql += " AND brand = ?"
+            params.append(brand)
+        if max_price:
+            sql += " AND base_price <= ?"
+            params.append(max_price)
+        if query:
+            # LIKE is case-insensitive for ascii in sqlite, same as ilike
+            sql += " AND product_name LIKE ?"
+            params.append(f"%{query}%")
+
+        return [Product(**self._decode(dict(r))) for r in self._query(sql, tuple(params))]
+
+    def _inventory_for(self, product_ids: List[str]) -> Dict[str, List[tuple[VendorInventory, Vendor]]]:
+        tables = {"vi": "vendor_inventory", "v": "vendors"}
+        placeholders = ", ".join("?" for _ in product_ids)
+        sql = f"""
+            SELECT {self._select(tables)}
+            FROM vendor_inventory vi
+            JOIN vendors v ON v.vendor_id = vi.vendor_id
+            WHERE vi.product_id IN ({placeholders}) AND vi.is_available
+        """
+        inventory: Dict[str, List[tuple[VendorInventory, Vendor]]] = {}
+        for row in self._query(sql, tuple(product_ids)):
+            parts = self._split(row, list(tables))
+            inventory.setdefault(parts["vi"]["product_id"], []).append(
+                (VendorInventory(**parts["vi"]), Vendor(**parts["v"]))
+            )
+        return inventory
+
+    def get_product_inventory(self, product_id: str) -> List[tuple[VendorInventory, Vendor]]:
+        return self._inventory_for([product_id]).get(product_id, [])
+
+    def get_products_with_inventory(self, product_ids: List[str]) -> List[tuple[Product, List[tuple[VendorInventory, Vendor]]]]:
+        placeholders = ", ".join("?" for _ in product_ids)
+        rows = self._query(f"SELECT * FROM products WHERE product_id IN ({placeholders})", tuple(product_ids))
+        inventory = self._inventory_for(product_ids)
+
+        results = []
+        for r in rows:
+            product = Product(**self._decode(dict(r)))
+            results.append((product, inventory.get(product.product_id, [])))
+        return results
+
+    def get_vendor_profile(self, vendor_id: str, category_id: str) -> Optional[VendorProfile]:
+        tables = {"vsi": "vendor_strategic_insights", "v": "vendors"}
+        rows = self._query(f"""
+            SELECT {self._select(tables)}
+            FROM vendor_strategic_insights vsi
+            JOIN vendors v ON v.vendor_id = vsi.vendor_id
+            WHERE vsi.vendor_id = ? AND vsi.category_id = ?
+        """, (vendor_id, category_id))
+        if not rows:
+            return None
+        parts = self._split(rows[0], list(tables))
+        return to_vendor_profile({**parts["vsi"], "vendors": parts["v"]})
+
+    def get_product_insights(self, vendor_id: str, category_id: str) -> List[ProductAggregateInsight]:
+        tables = {"pai": "product_aggregate_insights", "p": "products"}
+        rows = self._query(f"""
+            SELECT {self._select(tables)}
+            FROM product_aggregate_insights pai
+            LEFT JOIN products p ON p.product_id = pai.product_id
+            WHERE pai.vendor_id = ? AND pai.category_id = ?
+        """, (vendor_id, category_id))
+
+        insights = []
+        for row in rows:
+            parts = self._split(row, list(tables))
+            insights.append(to_product_insight({**parts["pai"], "products": parts["p"]}))
+        return insights
+
+    def get_vendor_profiles(self, category_id: str) -> List[VendorProfile]:
+        tables = {"vsi": "vendor_strategic_insights", "v": "vendors"}
+        rows = self._query(f"""
+            SELECT {self._select(tables)}
+            FROM vendor_strategic_insights vsi
+            JOIN vendors v ON v.vendor_id = vsi.vendor_id
+            WHERE vsi.category_id = ?
+            ORDER BY vsi.vendor_id
+        """, (category_id,))
+        profiles = []
+        for row in rows:
+            parts = self._split(row, list(tables))
+            profiles.append(to_vendor_profile({**parts["vsi"], "vendors": parts["v"]}))
+        return profiles
+
+    def save_strategy_rankings(self, rows: List[Dict]):
+        with self._lock:
+            self.conn.executemany("""
+                INSERT INTO vendor_strategy_rankings
+                    (vendor_id, category_id, alternative_id, strategy_rank, ahp_score, criteria_scores, computed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (vendor_id, category_id, alternative_id)
+                DO UPDATE SET strategy_rank = excluded.strategy_rank, ahp_score = excluded.ahp_score,
+                              criteria_scores = excluded.criteria_scores, computed_at = excluded.computed_at
+            """, [
+                (r["vendor_id"], r["category_id"], r["alternative_id"], r["strategy_rank"], r["ahp_score"],
+                 json.dumps(r.get("criteria_scores") or {}), _now())
+                for r in rows
+            ])
+            self.conn.commit()
+
+    def _time_range(self, column: str, start: Optional[datetime], end: Optional[datetime]):
+        clauses, params = [], []
+        if start:
+            clauses.append(f"{column} >= ?")
+            params.append(start.strftime(TIMESTAMP_FORMAT))
+        if end:
+            clauses.append(f"{column} < ?")
+            params.append(end.strftime(TIMESTAMP_FORMAT))
+        return (" AND " + " AND ".join(clauses) if clauses else ""), params
+
+    def get_purchase_events(self, start: Optional[datetime], end: Optional[datetime],
+                            limit: int, offset: int = 0) -> List[Dict]:
+        where, params = self._time_range("ph.purchase_date", start, end)
+        rows = self._query(f"""
+            SELECT ph.purchase_id, ph.user_id, ph.purchase_date, ph.total_paid,
+                   vi.product_id, vi.vendor_id, p.category_id
+            FROM purchase_history ph
+            JOIN vendor_inventory vi ON vi.inventory_id = ph.inventory_id
+            JOIN products p ON p.product_id = vi.product_id
+            WHERE 1 = 1{where}
+            ORDER BY ph.purchase_date, ph.purchase_id
+            LIMIT ? OFFSET ?
+        """, (*params, limit, offset))
+        return [dict(r) for r in rows]
+
+    def get_view_events(self, start: Optional[datetime], end: Optional[datetime],
+                        limit: int, offset: int = 0) -> List[Dict]:
+        where, params = self._time_range("e.viewed_at", start, end)
+        rows = self._query(f"""
+            SELECT e.event_id, e.user_id, e.viewed_at, e.product_id, e.vendor_id, p.category_id
+            FROM product_view_events e
+            JOIN products p ON p.product_id = e.product_id
+            WHERE 1 = 1{where}
+            ORDER BY e.viewed_at, e.event_id
+            LIMIT ? OFFSET ?
+        """, (*params, limit, offset))
+        return [dict(r) for r in rows]
+
+    def get_criteria_preferences(self, user_ids: List[str]) -> List[Dict]:
+        if not user_ids:
+            return []
+        rows = self._query(f"""
+            SELECT user_id, category_id, criteria_weights, user_segment
+            FROM user_criteria_preferences
+            WHERE user_id IN ({", ".join("?" * len(user_ids))})
+        """, tuple(user_ids))
+        return [self._decode(dict(r)) for r in rows]
+
+    def get_product_aggregates(self, product_ids: List[str]) -> List[Dict]:
+        if not product_ids:
+            return []
+        rows = self._query(f"""
+            SELECT * FROM product_aggregate_insights
+            WHERE product_id IN ({", ".join("?" * len(product_ids))})
+        """, tuple(product_ids))
+        return [self._decode(dict(r)) for r in rows]
+
+    def save_product_aggregates(self, rows: List[Dict]):
+        with self._lock:
+            self.conn.executemany("""
+                INSERT INTO product_aggregate_insights
+                    (insight_id, product_id, vendor_id, category_id, avg_criteria_weights, total_views,
+                     total_purchases, conversion_rate, segment_breakdown, primary_segment, partial_aggregates,
+                     last_computed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (product_id, vendor_id)
+                DO UPDATE SET avg_criteria_weights = excluded.avg_criteria_weights,
+                              total_views = excluded.total_views,
+                              total_purchases = excluded.total_purchases,
+                              conversion_rate = excluded.conversion_rate,
+                              segment_breakdown = excluded.segment_breakdown,
+                              primary_segment = excluded.primary_segment,
+                              partial_aggregates = excluded.partial_aggregates,
+                              last_computed = excluded.last_computed
+            """, [
+                (r["insight_id"], r["product_id"], r["vendor_id"], r["category_id"],
+                 json.dumps(r["avg_criteria_weights"]), r["total_views"], r["total_purchases"],
+                 r["conversion_rate"], json.dumps(r["segment_breakdown"]), r["primary_segment"],
+                 json.dumps(r["partial_aggregates"]), _now())
+                for r in rows
+            ])
+            self.conn.commit()
+
+    def get_vendor_aggregates(self, category_ids: List[str]) -> List[Dict]:
+        rows = self._query(f"""
+            SELECT * FROM vendor_strategic_insights
+            WHERE category_id IN ({", ".join("?" * len(category_ids))})
+        """, tuple(category_ids))
+        return [self._decode(dict(r)) for r in rows]
+
+    def save_vendor_aggregates(self, rows: List[Dict]):
+        with self._lock:
+            self.conn.executemany("""
+                INSERT INTO vendor_strategic_insights
+                    (insight_id, vendor_id, category_id, market_share, total_products, total_sales,
+                     avg_conversion_rate, customer_segments, price_competitiveness_rank, selection_rank,
+                     avg_customer_criteria, partial_aggregates, last_computed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (vendor_id, category_id)
+                DO UPDATE SET market_share = excluded.market_share,
+                              total_products = excluded.total_products,
+                              total_sales = excluded.total_sales,
+                              avg_conversion_rate = excluded.avg_conversion_rate,
+                              customer_segments = excluded.customer_segments,
+                              price_competitiveness_rank = excluded.price_competitiveness_rank,
+                              selection_rank = excluded.selection_rank,
+                              avg_customer_criteria = excluded.avg_customer_criteria,
+                              partial_aggregates = excluded.partial_aggregates,
+                              last_computed = excluded.last_computed
+            """, [
+                (r["insight_id"], r["vendor_id"], r["category_id"], r["market_share"], r["total_products"],
+                 r["total_sales"], r["avg_conversion_rate"], json.dumps(r["customer_segments"]),
+                 r["price_competitiveness_rank"], r["selection_rank"], json.dumps(r["avg_customer_criteria"]),
+                 json.dumps(r["partial_aggregates"]), _now())
+                for r in rows
+            ])
+            self.conn.commit()
+
+    def get_vendor_catalog_stats(self, category_ids: List[str]) -> List[Dict]:
+        rows = self._query(f"""
+            SELECT vi.vendor_id, p.category_id,
+                   COUNT(DISTINCT vi.product_id) AS total_products, AVG(vi.vendor_price) AS avg_price
+            FROM vendor_inventory vi
+            JOIN products p ON p.product_id = vi.product_id
+            WHERE p.category_id IN ({", ".join("?" * len(category_ids))})
+            GROUP BY vi.vendor_id, p.category_id
+        """, tuple(category_ids))
+        return [dict(r) for r in rows]
+
+    def get_last_computed(self, table: str) -> Optional[datetime]:
+        rows = self._query(f"SELECT MAX(last_computed) AS last_computed FROM {table}")
+        return datetime.strptime(rows[0]["last_computed"], TIMESTAMP_FORMAT) if rows and rows[0]["last_computed"] else None
+
+    def get_watermark(self, job_name: str) -> Optional[datetime]:
+        rows = self._query("SELECT watermark FROM aggregation_watermarks WHERE job_name = ?", (job_name,))
+        return datetime.strptime(rows[0]["watermark"], TIMESTAMP_FORMAT) if rows else None
+
+    def save_watermark(self, job_name: str, watermark: datetime):
+        with self._lock:
+            self.conn.execute("""
+                INSERT INTO aggregation_watermarks (job_name, watermark, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (job_name) DO UPDATE SET watermark = excluded.watermark, updated_at = excluded.updated_at
+            """, (job_name, watermark.strftime(TIMESTAMP_FORMAT), _now()))
+            self.conn.commit()
+
+    def get_preference_stats(self, user_id: str, category_id: str) -> Optional[Dict]:
+        rows = self._query(
+            "SELECT preference_stats FROM user_criteria_preferences WHERE user_id = ? AND category_id = ?",
+            (user_id, category_id)
+        )
+        if not rows or rows[0]["preference_stats"] is None:
+            return None
+        return json.loads(rows[0]["preference_stats"])
+
+    def save_preference_stats(self, user_id: str, category_id: str, stats: Dict):
+        with self._lock:
+            # criteria_weights is NOT NULL, only filled in for brand-new rows
+            self.conn.execute("""
+                INSERT INTO user_criteria_preferences (preference_id, user_id, category_id, criteria_weights, preference_stats, last_updated)
+                VALUES (?, ?, ?, '{}', ?, ?)
+                ON CONFLICT (user_id, category_id)
+                DO UPDATE SET preference_stats = excluded.preference_stats, last_updated = excluded.last_updated
+            """, (f"pref_{user_id}_{category_id}", user_id, category_id, json.dumps(stats), _now()))
+            self.conn.commit()
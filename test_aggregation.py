@@ -0,0 +1,87 @@
+"""
+TEST AGGREGATION
+Aggregation runs on freshly seeded SQLite data
+Seeded rows carry views no event table backs, a run must not turn them into 0 views / 0% conversion
+(vendor conversion and market share feed competitive_position, so a zeroed rate reorders every strategy)
+"""
+
+import contextlib
+import io
+
+from aggregation import ProductAggregator, VendorAggregator
+from db import Database
+from sqlite_backend import SQLiteBackend
+
+PRODUCT_FIELDS = ("total_views", "total_purchases", "conversion_rate")
+VENDOR_FIELDS = ("total_sales", "avg_conversion_rate", "market_share")
+
+
+def seeded_db() -> Database:
+    return Database(backend=SQLiteBackend())
+
+
+def run_quietly(aggregator, full: bool = False):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return aggregator.run(full=full)
+
+
+def product_rows(db: Database) -> dict:
+    product_ids = [r['product_id'] for r in db.backend._query("SELECT DISTINCT product_id FROM product_aggregate_insights")]
+    return {(r['product_id'], r['vendor_id']): r for r in db.get_product_aggregates(product_ids)}
+
+
+def test_first_product_run_keeps_seeded_rows():
+    db = seeded_db()
+    seeded = product_rows(db)
+    run_quietly(ProductAggregator(db))
+
+    after = product_rows(db)
+    for key, before in seeded.items():
+        for field in PRODUCT_FIELDS:
+            assert after[key][field] == before[field], f"{key} {field}: {before[field]} → {after[key][field]}"
+
+
+def test_full_product_run_keeps_seeded_views():
+    db = seeded_db()
+    seeded = product_rows(db)
+    run_quietly(ProductAggregator(db), full=True)
+
+    for key, row in product_rows(db).items():
+        if key in seeded:
+            assert row['total_views'] == seeded[key]['total_views'], f"{key}: views zeroed"
+            assert row['conversion_rate'], f"{key}: conversion zeroed"
+
+
+def vendor_rows(db: Database) -> dict:
+    category_ids = [r['category_id'] for r in db.backend._query("SELECT DISTINCT category_id FROM vendor_strategic_insights")]
+    return {(r['vendor_id'], r['category_id']): r for r in db.get_vendor_aggregates(category_ids)}
+
+
+def test_first_vendor_run_keeps_seeded_conversion():
+    db = seeded_db()
+    seeded = vendor_rows(db)
+    run_quietly(VendorAggregator(db))
+
+    after = vendor_rows(db)
+    for key, before in seeded.items():
+        for field in VENDOR_FIELDS:
+            assert after[key][field] == before[field], f"{key} {field}: {before[field]} → {after[key][field]}"
+
+
+def test_full_vendor_run_keeps_seeded_conversion():
+    db = seeded_db()
+    seeded = vendor_rows(db)
+    run_quietly(VendorAggregator(db), full=True)
+
+    for key, row in vendor_rows(db).items():
+        if key in seeded and seeded[key]['avg_conversion_rate']:
+            assert row['avg_conversion_rate'], f"{key}: conversion zeroed"
+            assert row['partial_aggregates']['views'], f"{key}: views zeroed"
+
+
+if __name__ == "__main__":
+    tests = [test_first_product_run_keeps_seeded_rows, test_full_product_run_keeps_seeded_views,
+             test_first_vendor_run_keeps_seeded_conversion, test_full_vendor_run_keeps_seeded_conversion]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,79 @@
+"""
+TEST IMPORT TIME
+Cold-start budget per entry point: each module is imported in a fresh interpreter,
+timed, and checked for heavy dependencies that should only load on first use
+"""
+
+import json
+import subprocess
+import sys
+
+# seconds allowed for a cold `import <module>`
+IMPORT_BUDGETS = {
+    "main": 1.0,
+    "marco_main": 1.0,
+    "aggregation": 1.0,
+    "executor": 1.0,
+    "render_queue": 0.5,
+    "visualizer": 1.0,
+    "macro_visualizer": 1.0
+}
+
+# must not be imported just by importing an entry point
+HEAVY_MODULES = ("matplotlib", "seaborn", "pandas", "google.generativeai", "supabase")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, runs: int = 3) -> dict:
+    """Best of `runs` cold imports (a fresh interpreter each time, so nothing is cached in-process)"""
+    results = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            return {"seconds": None, "loaded": [], "error": proc.stderr.strip().splitlines()[-1]}
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return min(results, key=lambda r: r["seconds"])
+
+
+def check_import_time() -> bool:
+    print("=" * 70)
+    print("⏱️  ORBIT IMPORT-TIME BUDGET")
+    print("=" * 70)
+    print(f"{'Module':<20} {'Import (s)':<12} {'Budget (s)':<12} {'Result'}")
+    print("-" * 70)
+
+    passed = True
+    for module, budget in IMPORT_BUDGETS.items():
+        result = measure(module)
+        if result["seconds"] is None:
+            status, ok = f"❌ import failed: {result['error']}", False
+        elif result["loaded"]:
+            status, ok = f"❌ eagerly loads {', '.join(result['loaded'])}", False
+        elif result["seconds"] > budget:
+            status, ok = "❌ over budget", False
+        else:
+            status, ok = "✅", True
+        seconds = f"{result['seconds']:.3f}" if result["seconds"] is not None else "-"
+        print(f"{module:<20} {seconds:<12} {budget:<12.2f} {status}")
+        passed = passed and ok
+
+    print(f"\n{'✅ All entry points within budget' if passed else '❌ Import-time budget exceeded'}")
+    return passed
+
+
+def test_import_time():
+    assert check_import_time(), "import-time budget exceeded (see table above)"
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_import_time() else 1)
@@ -30,31 +30,12 @@ def test_macro():
     
     print("\n📊 Fetching vendor data...")
     
-    result = db.supabase.table('vendor_strategic_insights').select(
-        '*, vendors(*)'
-    ).eq('vendor_id', vendor_id).eq('category_id', category).execute()
+    vendor_profile = db.get_vendor_profile(vendor_id, category)
     
-    if not result.data:
+    if vendor_profile is None:
         print("❌ No vendor data found!")
         return
     
-    insight = result.data[0]
-    vendor_name = insight['vendors']['vendor_name'] if insight.get('vendors') else vendor_id
-    
-    from models import VendorProfile
-    
-    vendor_profile = VendorProfile(
-        vendor_id=vendor_id,
-        vendor_name=vendor_name,
-        category_id=category,
-        market_share=float(insight['market_share']),
-        avg_conversion_rate=float(insight['avg_conversion_rate']),
-        total_products=insight['total_products'],
-        total_sales=insight['total_sales'],
-        avg_customer_criteria=insight['avg_customer_criteria'],
-        customer_segments=insight['customer_segments']
-    )
-    
     print(f"   Vendor: {vendor_profile.vendor_name}")
     print(f"   Market Share: {vendor_profile.market_share*100:.1f}%")
     
@@ -0,0 +1,31 @@
+"""
+STAGE TIMER
+Wall-clock time per named pipeline stage
+Agents record into one of these, the benchmark harness reads it back
+"""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StageTimer:
+    """Accumulates seconds per stage name until reset()"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = defaultdict(float)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+
+    def reset(self):
+        self.timings.clear()
+
+    def snapshot(self) -> Dict[str, float]:
+        return dict(self.timings)
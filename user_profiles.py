@@ -0,0 +1,109 @@
+"""
+USER PREFERENCE PROFILES
+Running statistics per (user, category) so a query never has to re-read the full purchase history
+Welford mean/variance for price, brand counts, spec sums - O(1) per new purchase
+"""
+
+import math
+from typing import Dict, Iterable, Optional
+
+from models import EnrichedPurchase
+
+# spec averages the micro engine looks at, per parsed category: (spec key, profile key)
+SPEC_PREFERENCES = {
+    "laptops": ("ram_gb", "avg_ram"),
+    "smartphones": ("camera_mp", "avg_camera")
+}
+
+TRACKED_SPECS = {key for key, _ in SPEC_PREFERENCES.values()}
+
+
+class PreferenceStats:
+    """
+    Running purchase statistics for one (user, category)
+    to_profile() gives the same dict analyze_user_history used to compute from scratch
+    """
+
+    def __init__(self, count: int = 0, mean_price: float = 0.0, m2: float = 0.0,
+                 brand_counts: Optional[Dict[str, int]] = None,
+                 spec_sums: Optional[Dict[str, float]] = None,
+                 spec_counts: Optional[Dict[str, int]] = None):
+        self.count = count
+        self.mean_price = mean_price
+        self.m2 = m2  # sum of squared deviations from the mean
+        self.brand_counts = dict(brand_counts or {})
+        self.spec_sums = dict(spec_sums or {})
+        self.spec_counts = dict(spec_counts or {})
+
+    @classmethod
+    def from_purchases(cls, purchases: Iterable[EnrichedPurchase]) -> "PreferenceStats":
+        stats = cls()
+        for p in purchases:
+            stats.add_purchase(p)
+        return stats
+
+    def add_purchase(self, purchase: EnrichedPurchase):
+        self.update(purchase.purchase.total_paid, purchase.product.brand, purchase.product.specs)
+
+    def update(self, price: float, brand: str, specs: Optional[Dict] = None):
+        """Fold in one purchase (Welford update for mean/variance)"""
+        self.count += 1
+        delta = price - self.mean_price
+        self.mean_price += delta / self.count
+        self.m2 += delta * (price - self.mean_price)
+
+        self.brand_counts[brand] = self.brand_counts.get(brand, 0) + 1
+
+        for key in TRACKED_SPECS & (specs or {}).keys():
+            value = specs[key]
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.spec_sums[key] = self.spec_sums.get(key, 0.0) + value
+                self.spec_counts[key] = self.spec_counts.get(key, 0) + 1
+
+    @property
+    def price_std(self) -> float:
+        """Population std (same as np.std)"""
+        return math.sqrt(self.m2 / self.count) if self.count > 1 else 0.0
+
+    def to_profile(self, category: str) -> Dict:
+        """Preference profile in the shape the agent expects"""
+        if self.count == 0:
+            return {
+                "price_sensitivity": 0.5,
+                "brand_loyalty": {},
+                "avg_price": 0,
+                "spec_preferences": {},
+                "total_purchases": 0
+            }
+
+        avg_price = self.mean_price
+        # low variance = consistent budget = high sensitivity
+        price_sensitivity = 1 - min(self.price_std / avg_price, 1.0) if avg_price > 0 else 0.5
+
+        spec_preferences = {}
+        if category in SPEC_PREFERENCES:
+            key, name = SPEC_PREFERENCES[category]
+            if self.spec_counts.get(key):
+                spec_preferences[name] = self.spec_sums[key] / self.spec_counts[key]
+
+        return {
+            "price_sensitivity": price_sensitivity,
+            "brand_loyalty": {brand: n / self.count for brand, n in self.brand_counts.items()},
+            "avg_price": avg_price,
+            "spec_preferences": spec_preferences,
+            "total_purchases": self.count
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean_price": self.mean_price,
+            "m2": self.m2,
+            "brand_counts": self.brand_counts,
+            "spec_sums": self.spec_sums,
+            "spec_counts": self.spec_counts
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "PreferenceStats":
+        return cls(**(data or {}))
@@ -1,17 +1,25 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
-import pandas as pd
-from typing import Dict, List
+from typing import Dict, List, Optional
 from models import RankedProduct, UserProfile
 from ahp_matrix_viz import AHPMatrixVisualizer
+from chart_cache import cached_chart
+# matplotlib / seaborn / pandas load on first use (shared, styled proxies), importing this module stays cheap
+from lazy_modules import plt, sns, pd
+from sensitivity import crossover_weights, linear_coefficients, stability_intervals
 import os
 
+_matrix_viz: Optional[AHPMatrixVisualizer] = None
 
-# set style
-sns.set_style("whitegrid")
-plt.rcParams['figure.figsize'] = (12, 8)
-matrix_viz = AHPMatrixVisualizer()
+
+def get_matrix_viz() -> AHPMatrixVisualizer:
+    """Shared AHPMatrixVisualizer, built (and ./output created) on the first report"""
+    global _matrix_viz
+    if _matrix_viz is None:
+        _matrix_viz = AHPMatrixVisualizer()
+    return _matrix_viz
+
+# ahp_matrices entries AHPMatrixVisualizer reads
+MATRIX_VIZ_KEYS = ('criteria', 'criteria_weights', 'product_scores', 'final_scores', 'query_context')
 
 
 class ORBITVisualizer:
@@ -24,7 +32,9 @@ class ORBITVisualizer:
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
     
-    def plot_criteria_weights(self, user_profile: UserProfile, user_name: str):
+    @cached_chart
+    def plot_criteria_weights(self, user_profile: UserProfile, user_name: str,
+                              dpi: int = 300, fmt: str = "png"):
         """
         Bar chart showing what the user values
         E.g., Budget Bob has 60% price weight
@@ -56,12 +66,16 @@ class ORBITVisualizer:
         
         ax.legend()
         plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/{user_name}_criteria_weights.png', dpi=300, bbox_inches='tight')
+        filename = f'{self.output_dir}/{user_name}_criteria_weights.{fmt}'
+        plt.savefig(filename, dpi=dpi, bbox_inches='tight')
         plt.close()
         
-        print(f"   📊 Saved: {user_name}_criteria_weights.png")
+        print(f"   📊 Saved: {os.path.basename(filename)}")
+        return filename
     
-    def plot_ahp_comparison_matrix(self, ranked_products: List[RankedProduct], user_name: str):
+    @cached_chart
+    def plot_ahp_comparison_matrix(self, ranked_products: List[RankedProduct], user_name: str,
+                                   dpi: int = 300, fmt: str = "png"):
         """
         Heatmap showing how products compare on each criteria
         Classic AHP visualization
@@ -90,12 +104,16 @@ class ORBITVisualizer:
         ax.set_ylabel('Products', fontsize=12, fontweight='bold')
         
         plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/{user_name}_comparison_matrix.png', dpi=300, bbox_inches='tight')
+        filename = f'{self.output_dir}/{user_name}_comparison_matrix.{fmt}'
+        plt.savefig(filename, dpi=dpi, bbox_inches='tight')
         plt.close()
         
-        print(f"   📊 Saved: {user_name}_comparison_matrix.png")
+        print(f"   📊 Saved: {os.path.basename(filename)}")
+        return filename
     
-    def plot_final_rankings(self, ranked_products: List[RankedProduct], user_name: str):
+    @cached_chart
+    def plot_final_rankings(self, ranked_products: List[RankedProduct], user_name: str,
+                            dpi: int = 300, fmt: str = "png"):
         """
         Horizontal bar chart showing final AHP scores
         Color coded to show clear winner
@@ -130,13 +148,17 @@ class ORBITVisualizer:
         bars[0].set_linewidth(3)
         
         plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/{user_name}_final_rankings.png', dpi=300, bbox_inches='tight')
+        filename = f'{self.output_dir}/{user_name}_final_rankings.{fmt}'
+        plt.savefig(filename, dpi=dpi, bbox_inches='tight')
         plt.close()
         
-        print(f"   📊 Saved: {user_name}_final_rankings.png")
+        print(f"   📊 Saved: {os.path.basename(filename)}")
+        return filename
     
+    @cached_chart
     def plot_sensitivity_analysis(self, ranked_products: List[RankedProduct], 
-                                  user_profile: UserProfile, user_name: str):
+                                  user_profile: UserProfile, user_name: str,
+                                  dpi: int = 300, fmt: str = "png"):
         """
         Shows how rankings change if we tweak criteria weights
         "What if price was more/less important?"
@@ -151,28 +173,23 @@ class ORBITVisualizer:
         
         # pick main criteria to vary (usually first one with high weight)
         main_criteria = max(user_profile.criteria_weights, key=lambda x: x.weight).criteria_name
-        original_weight = next(w.weight for w in user_profile.criteria_weights if w.criteria_name == main_criteria)
+        criteria = [w.criteria_name for w in user_profile.criteria_weights]
+        weights = np.array([w.weight for w in user_profile.criteria_weights])
+        weights = weights / weights.sum()
+        j = criteria.index(main_criteria)
+        original_weight = weights[j]
         
         # vary weight from 0.1 to 0.9
         weight_range = np.linspace(0.1, 0.9, 20)
         
-        # recalculate scores for each weight
-        sensitivity_scores = {name: [] for name in product_names}
-        
-        for new_weight in weight_range:
-            # adjust other weights proportionally
-            remaining = 1 - new_weight
-            other_criteria = [w for w in user_profile.criteria_weights if w.criteria_name != main_criteria]
-            total_other = sum(w.weight for w in other_criteria)
-            
-            # calculate new scores
-            for prod in top_products:
-                score = new_weight * prod.criteria_scores.get(main_criteria, 0)
-                for crit in other_criteria:
-                    adjusted_weight = (crit.weight / total_other) * remaining if total_other > 0 else 0
-                    score += adjusted_weight * prod.criteria_scores.get(crit.criteria_name, 0)
-                
-                sensitivity_scores[prod.product.product_name[:15]].append(score)
+        # every score is a line in the varied weight (others rescaled proportionally),
+        # so the curves, the crossings and the stable range come straight from its coefficients
+        values = np.array([[p.criteria_scores.get(c, 0) for c in criteria] for p in ranked_products])
+        intercept, slope = linear_coefficients(values, weights)
+        curves = intercept[:5, j, None] + slope[:5, j, None] * weight_range
+        sensitivity_scores = dict(zip(product_names, curves))
+        stable = stability_intervals(values, weights, top=0)
+        crossings = crossover_weights(values[:5], weights)[:, :, j]
         
         # plot
         fig, ax = plt.subplots(figsize=(12, 8))
@@ -184,6 +201,15 @@ class ORBITVisualizer:
         ax.axvline(original_weight, color='red', linestyle='--', linewidth=2, 
                   label=f'Current Weight: {original_weight:.2f}', alpha=0.7)
         
+        # range where the current #1 stays on top, and the exact rank swaps among the top 5
+        ax.axvspan(stable['lower'][j], stable['upper'][j], color='green', alpha=0.08,
+                  label=f"#1 stable: {stable['lower'][j]:.2f} - {stable['upper'][j]:.2f}")
+        a, b = np.nonzero(np.triu(np.isfinite(crossings), k=1))
+        if len(a):
+            t = crossings[a, b]
+            ax.scatter(t, intercept[a, j] + slope[a, j] * t, marker='x', s=80, color='black',
+                      zorder=5, label='Rank swap')
+        
         ax.set_xlabel(f'{main_criteria.capitalize()} Weight', fontsize=12, fontweight='bold')
         ax.set_ylabel('AHP Score', fontsize=12, fontweight='bold')
         ax.set_title(f'{user_name} - Sensitivity Analysis\n(How rankings change if "{main_criteria}" weight varies)', 
@@ -192,12 +218,16 @@ class ORBITVisualizer:
         ax.grid(True, alpha=0.3)
         
         plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/{user_name}_sensitivity.png', dpi=300, bbox_inches='tight')
+        filename = f'{self.output_dir}/{user_name}_sensitivity.{fmt}'
+        plt.savefig(filename, dpi=dpi, bbox_inches='tight')
         plt.close()
         
-        print(f"   📊 Saved: {user_name}_sensitivity.png")
+        print(f"   📊 Saved: {os.path.basename(filename)}")
+        return filename
     
-    def plot_criteria_radar(self, ranked_products: List[RankedProduct], user_name: str):
+    @cached_chart
+    def plot_criteria_radar(self, ranked_products: List[RankedProduct], user_name: str,
+                            dpi: int = 300, fmt: str = "png"):
         """
         Radar chart comparing top 3 products across all criteria
         Looks sick, judges love these
@@ -236,12 +266,16 @@ class ORBITVisualizer:
         ax.legend(loc='upper right', bbox_to_anchor=(1.3, 1.1), fontsize=10)
         
         plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/{user_name}_radar.png', dpi=300, bbox_inches='tight')
+        filename = f'{self.output_dir}/{user_name}_radar.{fmt}'
+        plt.savefig(filename, dpi=dpi, bbox_inches='tight')
         plt.close()
         
-        print(f"   📊 Saved: {user_name}_radar.png")
+        print(f"   📊 Saved: {os.path.basename(filename)}")
+        return filename
     
-    def plot_price_vs_score(self, ranked_products: List[RankedProduct], user_name: str):
+    @cached_chart
+    def plot_price_vs_score(self, ranked_products: List[RankedProduct], user_name: str,
+                            dpi: int = 300, fmt: str = "png"):
         """
         Scatter plot: AHP score vs price
         Shows value-for-money sweet spot
@@ -275,26 +309,54 @@ class ORBITVisualizer:
         ax.grid(True, alpha=0.3)
         
         plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/{user_name}_value_analysis.png', dpi=300, bbox_inches='tight')
+        filename = f'{self.output_dir}/{user_name}_value_analysis.{fmt}'
+        plt.savefig(filename, dpi=dpi, bbox_inches='tight')
         plt.close()
         
-        print(f"   📊 Saved: {user_name}_value_analysis.png")
+        print(f"   📊 Saved: {os.path.basename(filename)}")
+        return filename
     
     def generate_full_report(self, ranked_products: List[RankedProduct], 
-                           user_profile: UserProfile, user_name: str, ahp_matrices: Dict):
+                           user_profile: UserProfile, user_name: str, ahp_matrices: Dict,
+                           queue=None, profile: str = "export"):
         """
         Generate all visualizations for a user
         Call this once and get all the graphs
+        queue: a render_queue.RenderQueue -> returns futures right away instead of rendering inline
         """
+        from render_queue import RENDER_PROFILES
+        
+        if queue is not None:
+            # only the plain-data part of ahp_matrices is picklable (ranked_pages is a generator)
+            matrices = {k: ahp_matrices[k] for k in MATRIX_VIZ_KEYS if k in ahp_matrices}
+            jobs = [
+                ('plot_criteria_weights', (user_profile, user_name)),
+                ('plot_ahp_comparison_matrix', (ranked_products, user_name)),
+                ('plot_final_rankings', (ranked_products, user_name)),
+                ('plot_sensitivity_analysis', (ranked_products, user_profile, user_name)),
+                ('plot_criteria_radar', (ranked_products, user_name)),
+                ('plot_price_vs_score', (ranked_products, user_name))
+            ]
+            futures = [queue.submit(ORBITVisualizer, self.output_dir, method, *args, profile=profile)
+                       for method, args in jobs]
+            futures.append(queue.submit(AHPMatrixVisualizer, str(get_matrix_viz().output_dir), 'generate_all_matrices',
+                                        matrices, user_name, profile=profile))
+            print(f"\n📈 Queued {len(futures)} visualizations for {user_name} ({profile})")
+            return futures
+        
         print(f"\n📈 Generating visualizations for {user_name}...")
         
-        self.plot_criteria_weights(user_profile, user_name)
-        self.plot_ahp_comparison_matrix(ranked_products, user_name)
-        self.plot_final_rankings(ranked_products, user_name)
-        self.plot_sensitivity_analysis(ranked_products, user_profile, user_name)
-        self.plot_criteria_radar(ranked_products, user_name)
-        self.plot_price_vs_score(ranked_products, user_name)
-        matrix_viz.generate_all_matrices(ahp_matrices, user_name)
+        options = RENDER_PROFILES[profile]
+        files = [
+            self.plot_criteria_weights(user_profile, user_name, **options),
+            self.plot_ahp_comparison_matrix(ranked_products, user_name, **options),
+            self.plot_final_rankings(ranked_products, user_name, **options),
+            self.plot_sensitivity_analysis(ranked_products, user_profile, user_name, **options),
+            self.plot_criteria_radar(ranked_products, user_name, **options),
+            self.plot_price_vs_score(ranked_products, user_name, **options)
+        ]
+        files.extend(get_matrix_viz().generate_all_matrices(ahp_matrices, user_name, **options))
         
         print(f"✅ All visualizations saved to {self.output_dir}/")
-        print(f"   Open them to see the AHP magic!\n")
\ No newline at end of file
+        print(f"   Open them to see the AHP magic!\n")
+        return [f for f in files if f]